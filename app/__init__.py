@@ -1,11 +1,15 @@
-from flask import Flask
-from dotenv import load_dotenv
+# 包级别不导入 Flask 与各扩展：独立采集服务（app.capture_service）只需 app.protocol，保持启动快、占用内存小
 
-from .extensions import db, migrate, login_manager, csrf, limiter, create_redis_client
-from .models import User
 
+def create_app(role=None):
+    """role 为 web / ingest / worker，默认取 APP_ROLE"""
+    from flask import Flask
+    from dotenv import load_dotenv
+
+    from .extensions import db, migrate, login_manager, csrf, limiter, create_redis_client, engine_options
+    from . import metrics, replicas
+    from .models import User
 
-def create_app():
     load_dotenv()
     app = Flask(
         __name__,
@@ -13,6 +17,11 @@ def create_app():
         static_folder='../static',
     )
     app.config.from_object('config.Config')
+    if role:
+        app.config['APP_ROLE'] = role
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, app.config['APP_ROLE'])
+    # 只读副本注册为 replica_0、replica_1 …… 绑定
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **replicas.binds(app.config))
 
     # Extensions
     db.init_app(app)
@@ -25,17 +34,27 @@ def create_app():
 
     # Redis client
     app.redis = create_redis_client(app)
+    # RQ 以 pickle 保存任务，需要不解码响应的独立连接
+    app.rq_redis = create_redis_client(app, decode_responses=False)
+
+    # 请求、SQL 与 Redis 计时，/metrics
+    metrics.init_app(app)
 
     # Blueprints
     from .blueprints.auth import auth_bp
     from .blueprints.admin import admin_bp
     from .blueprints.api import api_bp
     from .blueprints.settings import settings_bp
+    from .blueprints.health import health_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(settings_bp, url_prefix='/admin')
+    app.register_blueprint(health_bp)
+
+    # 传感器接口使用 HMAC 签名鉴权，不走表单 CSRF 校验
+    csrf.exempt(api_bp)
 
     @login_manager.user_loader
     def load_user(user_id):
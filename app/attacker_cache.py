@@ -0,0 +1,167 @@
+"""
+攻击者档案缓存
+
+两级 IP -> (档案ID, 国家) 缓存：进程内带 TTL 的有界 LRU，其后是 Redis Hash。
+档案的新建/修改/删除通过 ORM 事件自动失效，Core 批量更新/删除需显式调用 invalidate。
+失效同时递增 Redis 中的版本号，其他进程在 ATTACKER_CACHE_SYNC_INTERVAL 秒内发现变化并清空本地 LRU。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from . import metrics
+from .models import AttackerProfile
+
+
+class LRUCache:
+    """线程安全的有界 LRU，条目在 ttl 秒后过期"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class AttackerCache:
+    def __init__(self, app):
+        self.redis = app.redis
+        self.key = app.config['ATTACKER_CACHE_KEY']
+        self.local = LRUCache(app.config['ATTACKER_CACHE_SIZE'], app.config['ATTACKER_CACHE_TTL'])
+        self.version_key = f'{self.key}:version'
+        self.sync_interval = app.config['ATTACKER_CACHE_SYNC_INTERVAL']
+        self.version = None
+        self.synced_at = None
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def sync(self) -> None:
+        """其他进程失效过缓存（版本号变化）时清空本地 LRU；每 sync_interval 秒最多检查一次"""
+        now = time.monotonic()
+        if self.synced_at is not None and now - self.synced_at < self.sync_interval:
+            return
+        self.synced_at = now
+        version = self.redis.get(self.version_key)
+        if version != self.version:
+            self.local.clear()
+            self.version = version
+
+    def get_many(self, ips) -> dict:
+        """返回已缓存的 ip -> (档案ID, 国家)；未命中的 IP 不在结果中"""
+        self.sync()
+        found, remote = {}, []
+        for ip in ips:
+            entry = self.local.get(ip)
+            if entry is None:
+                remote.append(ip)
+            else:
+                found[ip] = entry
+        local_hits = len(found)
+        self.local_hits += local_hits
+        metrics.cache_lookup('attacker', 'local', local_hits)
+        if remote:
+            for ip, value in zip(remote, self.redis.hmget(self.key, remote)):
+                if value is not None:
+                    attacker_id, _, country = value.partition('|')
+                    entry = found[ip] = (int(attacker_id), country or None)
+                    self.local.set(ip, entry)
+            redis_hits = len(found) - local_hits
+            self.redis_hits += redis_hits
+            self.misses += len(remote) - redis_hits
+            metrics.cache_lookup('attacker', 'redis', redis_hits)
+            metrics.cache_lookup('attacker', 'miss', len(remote) - redis_hits)
+        return found
+
+    def remember(self, mapping: dict) -> None:
+        """mapping: ip -> (档案ID, 国家)"""
+        if not mapping:
+            return
+        for ip, entry in mapping.items():
+            self.local.set(ip, entry)
+        self.redis.hset(self.key, mapping={
+            ip: f"{attacker_id}|{country or ''}" for ip, (attacker_id, country) in mapping.items()
+        })
+
+    def invalidate(self, *ips) -> None:
+        if not ips:
+            return
+        for ip in ips:
+            self.local.pop(ip)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hdel(self.key, *ips)
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+    def clear(self) -> None:
+        self.local.clear()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(self.key)
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            'local_hits': self.local_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else None,
+            'local_size': len(self.local),
+        }
+
+
+def get_cache() -> AttackerCache:
+    cache = current_app.extensions.get('attacker_cache')
+    if cache is None:
+        cache = current_app.extensions['attacker_cache'] = AttackerCache(current_app)
+    return cache
+
+
+def invalidate(*ips) -> None:
+    get_cache().invalidate(*ips)
+
+
+@event.listens_for(AttackerProfile, 'after_insert')
+@event.listens_for(AttackerProfile, 'after_delete')
+def _invalidate_profile(mapper, connection, target):
+    invalidate(target.ip_address)
+
+
+@event.listens_for(AttackerProfile, 'after_update')
+def _invalidate_updated_profile(mapper, connection, target):
+    history = inspect(target).attrs.ip_address.history
+    invalidate(target.ip_address, *(history.deleted or ()))
@@ -1,123 +1,348 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, make_response, jsonify,
+                   current_app, Response, stream_with_context)
 from flask_login import login_required  # pyright: ignore[reportMissingImports]
 
+from .. import attacker_cache, counters, dbstats, detection, jobs, live, metrics, replicas, rollups, touches, view_cache
 from ..extensions import db
+from ..iputil import classify_ip_filter
+from ..pagination import keyset_page
 from ..models import AttackEvent, AttackerProfile
-from datetime import datetime
+from datetime import datetime, timedelta
+import csv
+import hashlib
+import io
+import json
 import random
 
 
 admin_bp = Blueprint('admin', __name__)
 
 
+def recent_events(limit: int) -> list:
+    """最新事件：先限定时间窗口（分区表可裁剪到最新分区），不足时再放开"""
+    since = datetime.utcnow() - timedelta(days=current_app.config['RECENT_EVENTS_WINDOW_DAYS'])
+    newest_first = (AttackEvent.timestamp.desc(), AttackEvent.id.desc())
+    events = AttackEvent.query.filter(AttackEvent.timestamp >= since).order_by(*newest_first).limit(limit).all()
+    if len(events) < limit:
+        events = AttackEvent.query.order_by(*newest_first).limit(limit).all()
+    return events
+
+
+def event_summary(event) -> dict:
+    return {
+        'timestamp': event.timestamp.isoformat() if event.timestamp else None,
+        'ip_address': event.ip_address,
+        'method': event.method,
+        'path': event.path,
+        'severity': event.severity,
+        'count': event.count,
+    }
+
+
+def restore_timestamps(events) -> list:
+    """缓存中的事件摘要时间为 ISO 字符串，渲染前还原为 datetime"""
+    return [
+        dict(e, timestamp=datetime.fromisoformat(e['timestamp']) if e['timestamp'] else None)
+        for e in events
+    ]
+
+
+def dashboard_data() -> dict:
+    totals = counters.get_totals()
+    return {
+        'total_attacks': totals['total_attacks'],
+        'unique_attackers': totals['unique_attackers'],
+        'recent_attacks': [event_summary(e) for e in recent_events(20)],
+        # 攻击类型、地区、严重级别统计均读取预聚合表
+        'attack_types': rollups.totals_by('honeypot_service'),
+        'country_stats': rollups.totals_by('country'),
+        'severity_stats': rollups.totals_by('severity'),
+    }
+
+
 @admin_bp.route('/dashboard')
 @login_required
+@replicas.read_only
 def dashboard():
-    total_attacks = AttackEvent.query.count()
-    unique_attackers = AttackerProfile.query.count()
-    recent_attacks = AttackEvent.query.order_by(AttackEvent.timestamp.desc()).limit(20).all()
-    
-    # 获取攻击类型统计
-    attack_types = db.session.query(
-        AttackEvent.honeypot_service,
-        db.func.count(AttackEvent.id).label('count')
-    ).group_by(AttackEvent.honeypot_service).all()
-    
-    # 获取地区统计
-    country_stats = db.session.query(
-        AttackerProfile.country,
-        db.func.count(AttackEvent.id).label('count')
-    ).join(AttackEvent, AttackerProfile.id == AttackEvent.attacker_id).group_by(AttackerProfile.country).all()
-    
-    # 获取严重级别统计
-    severity_stats = db.session.query(
-        AttackEvent.severity,
-        db.func.count(AttackEvent.id).label('count')
-    ).group_by(AttackEvent.severity).all()
+    data = view_cache.cached('dashboard', dashboard_data)
+    recent_attacks = restore_timestamps(data['recent_attacks'])
     
     # 获取最新更新时间
-    latest_update = AttackEvent.query.order_by(AttackEvent.timestamp.desc()).first()
+    latest_update = recent_attacks[0] if recent_attacks else None
     
     return render_template('dashboard.html', 
-                         total_attacks=total_attacks, 
-                         unique_attackers=unique_attackers, 
+                         total_attacks=data['total_attacks'], 
+                         unique_attackers=data['unique_attackers'], 
                          recent_attacks=recent_attacks,
-                         attack_types=attack_types,
-                         country_stats=country_stats,
-                         severity_stats=severity_stats,
+                         attack_types=data['attack_types'],
+                         country_stats=data['country_stats'],
+                         severity_stats=data['severity_stats'],
                          latest_update=latest_update)
 
 
+@admin_bp.route('/live')
+@login_required
+def live_events():
+    # 仪表盘实时推送（Server-Sent Events）
+    # 推送只读 Redis：先归还登录校验借出的数据库连接，长连接期间不占用连接池
+    db.session.remove()
+    return Response(
+        stream_with_context(live.stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+ATTACKER_SORTS = {
+    'last_seen': AttackerProfile.last_seen,
+    'first_seen': AttackerProfile.first_seen,
+}
+EXPORT_COLUMNS = ('id', 'ip_address', 'user_agent', 'asn', 'isp', 'country', 'city', 'tags', 'first_seen', 'last_seen')
+
+
+def filter_attackers(country: str | None, asn: str | None, tag: str | None):
+    query = AttackerProfile.query
+    if country:
+        query = query.filter(AttackerProfile.country == country)
+    if asn:
+        query = query.filter(AttackerProfile.asn == asn)
+    if tag:
+        if db.session.get_bind().dialect.name == 'mysql':
+            query = query.filter(db.func.json_contains(AttackerProfile.tags, json.dumps(tag)))
+        else:
+            query = query.filter(db.cast(AttackerProfile.tags, db.Text).contains(json.dumps(tag)))
+    return query
+
+
+def attacker_args():
+    return {
+        'country': request.args.get('country') or None,
+        'asn': request.args.get('asn') or None,
+        'tag': request.args.get('tag') or None,
+    }
+
+
 @admin_bp.route('/attackers')
 @login_required
+@replicas.read_only
 def attackers():
-    profiles = AttackerProfile.query.order_by(AttackerProfile.last_seen.desc()).all()
-    return render_template('attackers.html', profiles=profiles)
+    touches.ensure_fresh()
+    filters = attacker_args()
+    sort = request.args.get('sort') if request.args.get('sort') in ATTACKER_SORTS else 'last_seen'
+    order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+    per_page = min(max(request.args.get('per_page', default=50, type=int), 1), 500)
 
+    page = keyset_page(
+        filter_attackers(**filters),
+        [ATTACKER_SORTS[sort], AttackerProfile.id],
+        per_page,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=order == 'desc',
+    )
+    return render_template('attackers.html', profiles=page.items, pagination=page,
+                           filters=filters, sort=sort, order=order)
 
-@admin_bp.route('/attacks')
+
+def _export_row(profile) -> dict:
+    row = {name: getattr(profile, name) for name in EXPORT_COLUMNS}
+    row['first_seen'] = profile.first_seen.isoformat() if profile.first_seen else None
+    row['last_seen'] = profile.last_seen.isoformat() if profile.last_seen else None
+    return row
+
+
+@admin_bp.route('/attackers/export')
 @login_required
-def attacks():
-    page = request.args.get('page', default=1, type=int)
-    per_page = request.args.get('per_page', default=20, type=int)
-    ip = request.args.get('ip')
-    method = request.args.get('method')
+@replicas.read_only
+def export_attackers():
+    """流式导出攻击者画像：逐批读取、逐行输出，内存占用与表大小无关"""
+    touches.ensure_fresh()
+    fmt = 'ndjson' if request.args.get('format') == 'ndjson' else 'csv'
+    query = filter_attackers(**attacker_args()).order_by(AttackerProfile.id).yield_per(1000)
+
+    def generate():
+        # 响应体在视图返回后才逐块生成，需重新进入只读作用域
+        with replicas.use_replica():
+            yield from rows()
+
+    def rows():
+        if fmt == 'csv':
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(EXPORT_COLUMNS)
+            for profile in query:
+                row = _export_row(profile)
+                row['tags'] = json.dumps(row['tags'], ensure_ascii=False) if row['tags'] is not None else ''
+                writer.writerow([row[name] for name in EXPORT_COLUMNS])
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        else:
+            for profile in query:
+                yield json.dumps(_export_row(profile), ensure_ascii=False) + '\n'
+
+    filename = datetime.utcnow().strftime(f'attackers-%Y%m%d-%H%M%S.{fmt}')
+    resp = Response(stream_with_context(generate()),
+                    mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return resp
+
 
+def filter_attacks(ip: str | None, method: str | None, since=None, until=None):
+    """IP 支持精确、前缀与 CIDR 三种筛选，均可命中索引；时间为半开区间 [since, until)，可裁剪分区"""
     query = AttackEvent.query
+    if since:
+        query = query.filter(AttackEvent.timestamp >= since)
+    if until:
+        query = query.filter(AttackEvent.timestamp < until)
     if ip:
-        query = query.filter(AttackEvent.ip_address.contains(ip))
+        kind, value = classify_ip_filter(ip)
+        if kind == 'cidr':
+            query = query.filter(AttackEvent.ip_packed.between(*value))
+        elif kind == 'exact':
+            query = query.filter(AttackEvent.ip_address == value)
+        else:
+            query = query.filter(AttackEvent.ip_address.startswith(value, autoescape=True))
     if method:
         query = query.filter(AttackEvent.method == method)
+    return query
+
+
+def count_attacks(query, filters: dict):
+    """攻击次数（折叠行按 count 计）。无筛选时读计数器；有筛选时只统计前 ATTACKS_COUNT_CAP 行并缓存，
+    返回 (次数, 是否超出上限)"""
+    if not any(filters.values()):
+        return counters.get_totals()['total_attacks'], False
+    cap = current_app.config['ATTACKS_COUNT_CAP']
+    # 按键排序的 (名称, 值) 序列化后取哈希：值中含分隔符也不会与其他筛选组合冲突
+    normalized = json.dumps(sorted(filters.items()), ensure_ascii=False, separators=(',', ':'), default=str)
+    key = f"{current_app.config['ATTACKS_COUNT_KEY']}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+    cached = current_app.redis.get(key)
+    if cached is None:
+        limited = query.with_entities(AttackEvent.count).order_by(None).limit(cap + 1).subquery()
+        rows, hits = db.session.query(db.func.count(), db.func.sum(limited.c.count)).select_from(limited).one()
+        cached = f'{hits or 0}:{int(rows > cap)}'
+        current_app.redis.set(key, cached, ex=current_app.config['ATTACKS_COUNT_TTL'])
+    hits, capped = cached.split(':')
+    return int(hits), capped == '1'
+
+
+def attacks_page():
+    """/attacks 与 /api/attacks 共用的参数解析与键集分页；参数非法时抛出 ValueError"""
+    per_page = min(max(request.args.get('per_page', default=20, type=int), 1), 200)
+    filters = {
+        'ip': (request.args.get('ip') or '').strip() or None,
+        'method': request.args.get('method') or None,
+        'since': request.args.get('since') or None,
+        'until': request.args.get('until') or None,
+    }
+    # until 按天包含当天，转换为次日零点的开区间上界
+    since = datetime.fromisoformat(filters['since']) if filters['since'] else None
+    until = datetime.fromisoformat(filters['until']) + timedelta(days=1) if filters['until'] else None
+
+    query = filter_attacks(filters['ip'], filters['method'], since, until)
+    page = keyset_page(
+        query,
+        [AttackEvent.timestamp, AttackEvent.id],
+        per_page,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+    )
+    # 缓存键使用解析后的时间，同一时刻的不同写法共用一份计数
+    page.extra['total'], page.extra['total_capped'] = count_attacks(query, dict(filters, since=since, until=until))
+    return page, filters
+
 
-    pagination = query.order_by(AttackEvent.timestamp.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return render_template('attacks.html', events=pagination.items, pagination=pagination, ip=ip or '', method=method or '')
+@admin_bp.route('/attacks')
+@login_required
+@replicas.read_only
+def attacks():
+    try:
+        page, filters = attacks_page()
+    except ValueError as e:
+        flash(f'筛选条件无效: {e}', 'error')
+        return redirect(url_for('admin.attacks'))
+    return render_template('attacks.html', events=page.items, pagination=page,
+                           filters={k: v or '' for k, v in filters.items()})
+
+
+@admin_bp.route('/api/attacks')
+@login_required
+@replicas.read_only
+def attacks_json():
+    try:
+        page, _ = attacks_page()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    return jsonify({
+        'items': [e.to_dict() for e in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'total': page.extra['total'],
+        'total_capped': page.extra['total_capped'],
+    })
 
 
 @admin_bp.route('/stats')
 @login_required
+@replicas.read_only
 def stats():
     # 数据统计模块
-    total_events = AttackEvent.query.count()
-    total_attackers = AttackerProfile.query.count()
-    latest_event = AttackEvent.query.order_by(AttackEvent.timestamp.desc()).first()
-    return render_template('stats.html', total_events=total_events, total_attackers=total_attackers, latest_event=latest_event)
+    def compute():
+        totals = counters.get_totals()
+        return {
+            'total_events': totals['total_attacks'],
+            'total_attackers': totals['unique_attackers'],
+            'latest_event': [event_summary(e) for e in recent_events(1)],
+        }
+
+    data = view_cache.cached('stats', compute)
+    latest_event = next(iter(restore_timestamps(data['latest_event'])), None)
+    return render_template('stats.html', total_events=data['total_events'], total_attackers=data['total_attackers'], latest_event=latest_event)
 
 
 @admin_bp.route('/database')
 @login_required
 def database():
-    # 数据库页面：展示各表与行数
-    tables = []
+    # 数据库页面：行数估计、大小与碎片、索引基数、慢查询热点，只读元数据
+    tables, indexes, hotspots, counts = [], [], None, {}
     try:
-        # 获取表名
-        result = db.session.execute(db.text('SHOW TABLES'))
-        table_names = [row[0] for row in result]
-        for name in table_names:
-            try:
-                count = db.session.execute(db.text(f'SELECT COUNT(*) FROM `{name}`')).scalar() or 0
-            except Exception:
-                count = 'N/A'
-            tables.append({'name': name, 'rows': count})
+        tables = dbstats.table_stats()
+        indexes = dbstats.index_stats()
+        counts = dbstats.exact_counts()
     except Exception as e:
-        tables = []
         flash(f'读取数据库结构失败: {e}', 'error')
-    return render_template('database.html', tables=tables)
+    try:
+        hotspots = dbstats.slow_queries()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.info('performance_schema unavailable: %s', e)
+    return render_template('database.html', tables=tables, indexes=indexes, hotspots=hotspots, counts=counts)
+
+
+@admin_bp.route('/database/count', methods=['POST'])
+@login_required
+def count_table():
+    # 精确行数按表手动触发，在后台任务中执行
+    name = request.form.get('table', '')
+    if name not in dbstats.table_names():
+        flash(f'未知数据表: {name}', 'error')
+    else:
+        jobs.enqueue('count-table', name)
+        flash(f'已提交 {name} 的精确计数任务，完成后刷新页面查看', 'success')
+    return redirect(url_for('admin.database'))
 
 
 @admin_bp.route('/map')
 @login_required
+@replicas.read_only
 def map():
     # 获取攻击数据用于地图显示
-    rows = (
-        db.session.query(
-            AttackerProfile.country,
-            db.func.count(AttackEvent.id).label('count')
-        )
-        .join(AttackEvent, AttackerProfile.id == AttackEvent.attacker_id)
-        .group_by(AttackerProfile.country)
-        .all()
-    )
-    attacks_by_country = [{'country': r[0] or 'Unknown', 'count': int(r[1] or 0)} for r in rows]
+    def compute():
+        rows = rollups.totals_by('country')
+        return [{'country': country or 'Unknown', 'count': count} for country, count in rows]
+
+    attacks_by_country = view_cache.cached('map', compute)
 
     return render_template('map.html', attacks_by_country=attacks_by_country)
 
@@ -132,6 +357,7 @@ def simulate_attack():
     severity = request.form.get('severity') or random.choice(['low','medium','high'])
 
     profile = AttackerProfile.query.filter_by(ip_address=ip).first()
+    is_new = profile is None
     if not profile:
         profile = AttackerProfile(ip_address=ip, user_agent=ua, country=country, city='', first_seen=datetime.utcnow(), last_seen=datetime.utcnow())
         db.session.add(profile)
@@ -152,32 +378,41 @@ def simulate_attack():
     )
     db.session.add(event)
     db.session.commit()
+    counters.incr(total_attacks=1, unique_attackers=int(is_new))
+    fields = [{
+        'timestamp': event.timestamp,
+        'ip_address': ip,
+        'method': event.method,
+        'path': event.path,
+        'honeypot_service': event.honeypot_service,
+        'severity': severity,
+        'signature': event.signature,
+    }]
+    rollups.record_events(fields, {ip: profile.country})
+    live.publish(fields, {ip: profile.country}, int(is_new))
+    view_cache.tick()
     flash('已生成一条模拟攻击数据', 'success')
     return redirect(url_for('admin.dashboard'))
 
 
 @admin_bp.route('/export-stats')
 @login_required
+@replicas.read_only
 def export_stats():
     # 导出简要统计为txt
-    total_events = AttackEvent.query.count()
-    total_attackers = AttackerProfile.query.count()
-    by_country = (
-        db.session.query(AttackerProfile.country, db.func.count(AttackEvent.id))
-        .join(AttackEvent, AttackerProfile.id == AttackEvent.attacker_id)
-        .group_by(AttackerProfile.country)
-        .all()
-    )
+    def compute():
+        totals = counters.get_totals()
+        lines = [
+            f"Total Events: {totals['total_attacks']}",
+            f"Total Attackers: {totals['unique_attackers']}",
+            "By Country:",
+        ]
+        for c, cnt in rollups.totals_by('country'):
+            lines.append(f"  {c or 'Unknown'}: {cnt}")
+        return lines
+
     now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
-    lines = [
-        f"Export Time: {now}",
-        f"Total Events: {total_events}",
-        f"Total Attackers: {total_attackers}",
-        "By Country:",
-    ]
-    for c, cnt in by_country:
-        lines.append(f"  {c or 'Unknown'}: {cnt}")
-    content = "\n".join(lines)
+    content = "\n".join([f"Export Time: {now}"] + view_cache.cached('export_stats', compute))
     resp = make_response(content)
     filename = datetime.utcnow().strftime('stats-%Y%m%d-%H%M%S.txt')
     resp.headers['Content-Type'] = 'text/plain; charset=utf-8'
@@ -188,4 +423,64 @@ def export_stats():
 @admin_bp.route('/settings')
 @login_required
 def settings():
-    return render_template('settings.html')
\ No newline at end of file
+    return render_template('settings.html')
+
+
+@admin_bp.route('/cache-stats')
+@login_required
+def cache_stats():
+    # 当前进程的缓存命中统计
+    return jsonify({
+        'attacker_cache': attacker_cache.get_cache().stats(),
+        'view_cache': view_cache.get_cache().stats(),
+    })
+
+
+@admin_bp.route('/slow-requests')
+@login_required
+def slow_requests():
+    # PROFILE_ENABLED 时记录的最慢请求及其 SQL
+    return jsonify({
+        'enabled': current_app.config['PROFILE_ENABLED'],
+        'requests': metrics.slow_requests(),
+    })
+
+
+@admin_bp.route('/detection-stats')
+@login_required
+def detection_stats():
+    # 各检测规则的累计命中次数与平均正则耗时
+    return jsonify(detection.rule_stats())
+
+
+@admin_bp.route('/jobs')
+@login_required
+def job_list():
+    try:
+        queues = jobs.job_status()
+    except Exception as e:
+        queues = []
+        flash(f'读取任务队列失败: {e}', 'error')
+    return render_template('jobs.html', queues=queues, job_names=[n for n in jobs.JOBS if n not in jobs.ARGUMENT_JOBS])
+
+
+@admin_bp.route('/jobs/run', methods=['POST'])
+@login_required
+def run_job():
+    name = request.form.get('name', '')
+    if name not in jobs.JOBS or name in jobs.ARGUMENT_JOBS:
+        flash(f'未知任务: {name}', 'error')
+        return redirect(url_for('admin.job_list'))
+    job = jobs.enqueue(name)
+    flash(f'已入队 {name}（{job.id}）', 'success')
+    return redirect(url_for('admin.job_list'))
+
+
+@admin_bp.route('/jobs/<job_id>')
+@login_required
+def job_detail(job_id):
+    try:
+        job = jobs.Job.fetch(job_id, connection=current_app.rq_redis)
+    except jobs.NoSuchJobError:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(jobs.job_info(job))
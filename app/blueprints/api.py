@@ -1,85 +1,81 @@
-from datetime import datetime
-import hmac
-import hashlib
-import time
-
 from flask import Blueprint, request, jsonify, current_app
-from ..extensions import db, limiter
-from ..models import AttackEvent, AttackerProfile
+from .. import signing
+from ..extensions import limiter
+from ..ingest import enqueue_event, enqueue_events, lookup_event_id, write_batch
+# 事件规范化与独立采集服务共用
+from ..protocol import normalize_bulk_item, normalize_event, parse_bulk_body
 
 
 api_bp = Blueprint('api', __name__)
 
 
-def verify_api_signature():
-    """验证API签名"""
-    signature = request.headers.get('X-API-Signature')
-    timestamp = request.headers.get('X-API-Timestamp')
-    
-    if not signature or not timestamp:
-        return False
-    
-    # 检查时间戳（5分钟内有效）
-    try:
-        ts = int(timestamp)
-        if abs(time.time() - ts) > 300:  # 5分钟
-            return False
-    except ValueError:
-        return False
-    
-    # 验证签名
-    secret = current_app.config.get('API_SECRET_KEY', 'default-secret')
-    expected_signature = hmac.new(
-        secret.encode(),
-        f"{timestamp}{request.get_data()}".encode(),
-        hashlib.sha256
-    ).hexdigest()
-    
-    return hmac.compare_digest(signature, expected_signature)
-
-
-def get_or_create_attacker(ip_address: str, user_agent: str | None):
-    profile = AttackerProfile.query.filter_by(ip_address=ip_address).first()
-    if profile:
-        profile.last_seen = datetime.utcnow()
-        if user_agent:
-            profile.user_agent = user_agent
-        return profile
-    profile = AttackerProfile(
-        ip_address=ip_address,
-        user_agent=user_agent or '',
-        first_seen=datetime.utcnow(),
-        last_seen=datetime.utcnow(),
-    )
-    db.session.add(profile)
-    return profile
+@api_bp.before_request
+def require_signature():
+    """所有传感器接口先校验签名：在解析 JSON 与访问数据库之前拒绝非法请求；只读请求不做重放检查"""
+    error = signing.verify(request.headers, request.get_data(cache=True), check_replay=request.method != 'GET')
+    if error:
+        return jsonify({'error': error}), 401
 
 
 @api_bp.route('/capture', methods=['POST'])
 @limiter.limit("100 per minute")
 def capture():
-    # 验证API签名
-    if not verify_api_signature():
-        return jsonify({'error': 'Invalid signature'}), 401
     ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
-    user_agent = request.headers.get('User-Agent')
     json_payload = request.get_json(silent=True) or {}
+    fields = normalize_event(ip_address, request.method, request.path, dict(request.headers), json_payload)
+
+    # 缓冲模式：入队即返回，由 flusher 批量落库
+    if current_app.config['INGEST_MODE'] == 'buffered':
+        ingest_id = enqueue_event(fields)
+        return jsonify({'status': 'queued', 'ingest_id': ingest_id}), 202
 
-    profile = get_or_create_attacker(ip_address, user_agent)
+    # 档案ID命中缓存时不再 SELECT；新 IP 以 INSERT IGNORE 幂等创建
+    event_id = write_batch([fields])[0]
+    return jsonify({'status': 'ok', 'event_id': event_id})
+
+
+@api_bp.route('/capture/<ingest_id>', methods=['GET'])
+def capture_status(ingest_id):
+    """查询缓冲模式下受理ID对应的事件ID"""
+    event_id = lookup_event_id(ingest_id)
+    return jsonify({
+        'status': 'stored' if event_id else 'queued',
+        'ingest_id': ingest_id,
+        'event_id': event_id,
+    })
+
+
+@api_bp.route('/capture/bulk', methods=['POST'])
+@limiter.limit("20 per minute")
+def capture_bulk():
+    """批量捕获：一次签名校验，攻击者批量 upsert，事件多行 INSERT"""
+    try:
+        items = parse_bulk_body(request.get_data(), request.content_type)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid body: {e}'}), 400
+    if len(items) > current_app.config['BULK_CAPTURE_MAX_ITEMS']:
+        return jsonify({'error': 'Too many items', 'max_items': current_app.config['BULK_CAPTURE_MAX_ITEMS']}), 413
 
-    event = AttackEvent(
-        ip_address=ip_address,
-        method=request.method,
-        path=request.path,
-        headers=dict(request.headers),
-        payload=json_payload,
-        honeypot_service=json_payload.get('service') or 'web',
-        signature=json_payload.get('signature'),
-        severity=json_payload.get('severity') or 'low',
-        attacker=profile,
-    )
-    db.session.add(event)
-    db.session.commit()
-    return jsonify({'status': 'ok', 'event_id': event.id})
+    results, events, positions = [], [], []
+    for index, item in enumerate(items):
+        try:
+            events.append(normalize_bulk_item(item))
+            positions.append(index)
+            results.append({'index': index, 'status': 'ok'})
+        except ValueError as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
 
+    if events:
+        if current_app.config['INGEST_MODE'] == 'buffered':
+            for index, ingest_id in zip(positions, enqueue_events(events)):
+                results[index].update(status='queued', ingest_id=ingest_id)
+        else:
+            for index, event_id in zip(positions, write_batch(events)):
+                results[index]['event_id'] = event_id
 
+    accepted = len(events)
+    return jsonify({
+        'accepted': accepted,
+        'rejected': len(items) - accepted,
+        'results': results,
+    }), 200 if accepted else 400
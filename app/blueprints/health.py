@@ -0,0 +1,52 @@
+import logging
+import time
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+
+from .. import replicas
+from ..extensions import db
+
+
+health_bp = Blueprint('health', __name__)
+
+logger = logging.getLogger(__name__)
+
+
+@health_bp.route('/healthz')
+def healthz():
+    # 存活检查：进程能处理请求即可，不访问依赖
+    return jsonify({'status': 'ok', 'role': current_app.config['APP_ROLE']})
+
+
+def _check_mysql():
+    db.session.execute(text('SELECT 1'))
+
+
+def _check_redis():
+    current_app.redis.ping()
+
+
+@health_bp.route('/readyz')
+def readyz():
+    # 就绪检查：MySQL 与 Redis 均可用时返回 200，否则 503，负载均衡据此摘除实例
+    checks = {}
+    for name, check in (('mysql', _check_mysql), ('redis', _check_redis)):
+        started = time.perf_counter()
+        try:
+            check()
+            checks[name] = {'ok': True, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            logger.warning('就绪检查 %s 失败: %s', name, e)
+            # 只返回异常类型，避免把连接信息暴露给外部
+            checks[name] = {'ok': False, 'error': type(e).__name__}
+    ready = all(check['ok'] for check in checks.values())
+    body = {
+        'status': 'ready' if ready else 'unavailable',
+        'role': current_app.config['APP_ROLE'],
+        'checks': checks,
+    }
+    # 副本不可用时读请求回退主库，只展示状态，不影响就绪
+    if current_app.config['DB_REPLICA_URLS']:
+        body['replicas'] = replicas.status()
+    return jsonify(body), 200 if ready else 503
@@ -0,0 +1,239 @@
+"""
+独立采集服务
+
+只提供传感器接口 /api/capture、/api/capture/bulk 与 /api/capture/<ingest_id>，不加载 Flask 应用与后台页面。
+签名校验、事件规范化与 Stream 条目编码与 API 蓝图共用 app.protocol；事件一律写入缓冲写入 Stream 并返回 202，
+由 flusher（python -m app.ingest）批量落库，因此需同时运行 flusher。
+基于 aiohttp 与 redis.asyncio，慢速上传只占用一个协程；传感器独立密钥通过 aiomysql 查询并在进程内缓存。
+安装 uvloop 时自动使用。限流交给 nginx（limit_req）。
+
+    python -m app.capture_service                          # 默认 0.0.0.0:5002
+    python -m app.capture_service --port 5001 --reuse-port  # 多个实例共享同一端口
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import redis.asyncio as aioredis
+from aiohttp import web
+
+from . import protocol
+
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureService:
+    def __init__(self, config):
+        self.config = config
+        self.redis = aioredis.Redis(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            password=config.REDIS_PASSWORD,
+            decode_responses=True,
+            socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+        )
+        # MySQL 只用于查询传感器密钥，首次遇到 X-API-Key-Id 时才建立连接池
+        self.mysql = None
+        self._mysql_lock = asyncio.Lock()
+        # key id -> (密钥, 过期时间)；未知 key id 以空值缓存
+        self.keys = {}
+
+    async def _mysql_pool(self):
+        async with self._mysql_lock:
+            if self.mysql is None:
+                import aiomysql
+
+                config = self.config
+                self.mysql = await aiomysql.create_pool(
+                    host=config.MYSQL_HOST, port=config.MYSQL_PORT, user=config.MYSQL_USER,
+                    password=config.MYSQL_PASSWORD, db=config.MYSQL_DB, charset='utf8mb4',
+                    minsize=0, maxsize=config.CAPTURE_DB_POOL_SIZE, pool_recycle=config.DB_POOL_RECYCLE,
+                    connect_timeout=config.DB_CONNECT_TIMEOUT, autocommit=True,
+                )
+        return self.mysql
+
+    async def get_secret(self, key_id: str | None):
+        """与 signing.get_secret 相同：key id -> 密钥 bytes，未知或已停用时返回 None"""
+        if not key_id:
+            return self.config.API_SECRET_KEY.encode() or None
+        now = time.monotonic()
+        cached = self.keys.get(key_id)
+        if cached is not None and cached[1] > now:
+            return cached[0] or None
+        pool = await self._mysql_pool()
+        async with pool.acquire() as conn, conn.cursor() as cursor:
+            await cursor.execute('SELECT secret FROM sensor_keys WHERE key_id = %s AND enabled = 1', (key_id,))
+            row = await cursor.fetchone()
+        secret = row[0].encode() if row and row[0] else b''
+        if len(self.keys) >= self.config.API_KEY_CACHE_SIZE:
+            self.keys.clear()
+        self.keys[key_id] = (secret, now + self.config.API_KEY_CACHE_TTL)
+        return secret or None
+
+    async def verify(self, headers, body: bytes, check_replay: bool = True) -> str | None:
+        """与 signing.verify 相同的校验顺序与错误原因"""
+        window = self.config.API_SIGNATURE_WINDOW
+        error, timestamp, age = protocol.check_timestamp(headers, window)
+        if error:
+            return error
+
+        key_id = headers.get('X-API-Key-Id')
+        secret = await self.get_secret(key_id)
+        signature = headers['X-API-Signature']
+        if secret is None or not protocol.signature_matches(secret, timestamp, body, signature):
+            return 'Invalid signature'
+
+        if check_replay:
+            key = protocol.nonce_key(self.config.API_NONCE_KEY, key_id, signature)
+            if not await self.redis.set(key, 1, nx=True, ex=protocol.nonce_ttl(window, age)):
+                return 'Replayed request'
+        return None
+
+    async def enqueue(self, events) -> list:
+        """写入缓冲写入 Stream（单次 pipeline 往返），返回受理ID列表"""
+        pipe = self.redis.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(self.config.INGEST_STREAM, {'event': protocol.encode_event(event)})
+        return await pipe.execute()
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+        if self.mysql is not None:
+            self.mysql.close()
+            await self.mysql.wait_closed()
+
+
+SERVICE = web.AppKey('service', CaptureService)
+
+
+@web.middleware
+async def require_signature(request, handler):
+    """所有 /api 请求先校验签名，再解析请求体"""
+    if request.path.startswith('/api/'):
+        body = await request.read()
+        error = await request.app[SERVICE].verify(request.headers, body, check_replay=request.method != 'GET')
+        if error:
+            return web.json_response({'error': error}, status=401)
+    return await handler(request)
+
+
+def _json_payload(body: bytes, content_type: str):
+    # 与 Flask 的 get_json(silent=True) 一致：只解析 JSON 类型的请求体，失败时为 None；非对象由 normalize_event 处理
+    if content_type != 'application/json' and not content_type.endswith('+json'):
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def capture(request):
+    body = await request.read()
+    ip_address = request.headers.get('X-Forwarded-For', request.remote)
+    fields = protocol.normalize_event(ip_address, request.method, request.path, dict(request.headers),
+                                      _json_payload(body, request.content_type))
+    ingest_id = (await request.app[SERVICE].enqueue([fields]))[0]
+    return web.json_response({'status': 'queued', 'ingest_id': ingest_id}, status=202)
+
+
+async def capture_bulk(request):
+    service = request.app[SERVICE]
+    try:
+        items = protocol.parse_bulk_body(await request.read(), request.content_type)
+    except ValueError as e:
+        return web.json_response({'error': f'Invalid body: {e}'}, status=400)
+    max_items = service.config.BULK_CAPTURE_MAX_ITEMS
+    if len(items) > max_items:
+        return web.json_response({'error': 'Too many items', 'max_items': max_items}, status=413)
+
+    results, events, positions = [], [], []
+    for index, item in enumerate(items):
+        try:
+            events.append(protocol.normalize_bulk_item(item))
+            positions.append(index)
+            results.append({'index': index, 'status': 'ok'})
+        except ValueError as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+
+    if events:
+        for index, ingest_id in zip(positions, await service.enqueue(events)):
+            results[index].update(status='queued', ingest_id=ingest_id)
+
+    accepted = len(events)
+    return web.json_response({
+        'accepted': accepted,
+        'rejected': len(items) - accepted,
+        'results': results,
+    }, status=200 if accepted else 400)
+
+
+async def capture_status(request):
+    service = request.app[SERVICE]
+    ingest_id = request.match_info['ingest_id']
+    value = await service.redis.get(protocol.ingest_id_key(service.config.INGEST_STREAM, ingest_id))
+    event_id = int(value) if value else None
+    return web.json_response({
+        'status': 'stored' if event_id else 'queued',
+        'ingest_id': ingest_id,
+        'event_id': event_id,
+    })
+
+
+async def healthz(request):
+    return web.json_response({'status': 'ok', 'role': 'capture'})
+
+
+async def readyz(request):
+    # 事件只写入 Redis，Redis 可用即就绪
+    try:
+        await request.app[SERVICE].redis.ping()
+    except Exception as e:
+        logger.warning('就绪检查 redis 失败: %s', e)
+        return web.json_response({'status': 'unavailable', 'checks': {'redis': {'ok': False}}}, status=503)
+    return web.json_response({'status': 'ready', 'checks': {'redis': {'ok': True}}})
+
+
+def build_app(config) -> web.Application:
+    app = web.Application(middlewares=[require_signature], client_max_size=config.CAPTURE_MAX_BODY)
+    app[SERVICE] = CaptureService(config)
+    app.router.add_post('/api/capture', capture)
+    app.router.add_post('/api/capture/bulk', capture_bulk)
+    app.router.add_get('/api/capture/{ingest_id}', capture_status)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+
+    async def close_service(app):
+        await app[SERVICE].close()
+
+    app.on_cleanup.append(close_service)
+    return app
+
+
+def main(argv=None) -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='独立采集服务')
+    parser.add_argument('--host', default=Config.CAPTURE_SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=Config.CAPTURE_SERVICE_PORT)
+    parser.add_argument('--reuse-port', action='store_true', help='SO_REUSEPORT，多个实例监听同一端口')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    web.run_app(build_app(Config), host=args.host, port=args.port, reuse_port=args.reuse_port or None,
+                access_log=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+全局计数器
+
+total_attacks / unique_attackers 的精确值保存在 Redis Hash 中：采集时递增，清理时递减，
+缺失时从数据库重建；reconcile 用于定期检测并修正漂移。
+"""
+from flask import current_app
+
+from .extensions import db
+from .models import AttackEvent, AttackerProfile
+
+
+FIELDS = ('total_attacks', 'unique_attackers')
+
+
+def _key() -> str:
+    return current_app.config['COUNTERS_KEY']
+
+
+def incr(total_attacks: int = 0, unique_attackers: int = 0) -> None:
+    """负数即递减"""
+    pipe = current_app.redis.pipeline(transaction=False)
+    if total_attacks:
+        pipe.hincrby(_key(), 'total_attacks', total_attacks)
+    if unique_attackers:
+        pipe.hincrby(_key(), 'unique_attackers', unique_attackers)
+    pipe.execute()
+
+
+def count_from_db() -> dict:
+    return {
+        # 折叠后的一行代表 count 次攻击
+        'total_attacks': int(db.session.query(db.func.sum(AttackEvent.count)).scalar() or 0),
+        'unique_attackers': db.session.query(db.func.count(AttackerProfile.id)).scalar() or 0,
+    }
+
+
+def rebuild() -> dict:
+    totals = count_from_db()
+    current_app.redis.hset(_key(), mapping=totals)
+    return totals
+
+
+def get_totals() -> dict:
+    """O(1) 读取计数；Redis 中尚无计数时先从数据库重建"""
+    values = current_app.redis.hmget(_key(), FIELDS)
+    if any(v is None for v in values):
+        return rebuild()
+    return {field: int(v) for field, v in zip(FIELDS, values)}
+
+
+def reconcile(fix: bool = True) -> dict:
+    """对比 Redis 计数与数据库实际值，返回各字段漂移量（Redis - DB）"""
+    cached = get_totals()
+    actual = count_from_db()
+    drift = {field: cached[field] - actual[field] for field in FIELDS}
+    if fix and any(drift.values()):
+        # 按漂移量反向修正，而非直接覆盖，避免吞掉统计期间的并发递增
+        incr(**{field: -n for field, n in drift.items()})
+    return drift
@@ -0,0 +1,131 @@
+"""
+数据库概况
+
+表的行数估计、数据/索引大小与碎片率来自 information_schema.TABLES 的一次查询，
+索引基数来自 information_schema.STATISTICS，慢查询热点来自 performance_schema 的语句摘要；
+均只读元数据，不扫描业务表。精确行数需按表手动触发，由后台任务执行 COUNT(*) 并缓存结果。
+非 MySQL 数据库只列出表名。
+"""
+import json
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from .extensions import db
+
+
+STAT_FIELDS = ('engine', 'rows_estimate', 'avg_row_length', 'data_length', 'index_length', 'data_free',
+               'fragmentation', 'partitioned', 'update_time')
+
+
+def is_mysql() -> bool:
+    return db.session.get_bind().dialect.name == 'mysql'
+
+
+def table_names() -> list:
+    return sorted(db.inspect(db.session.get_bind()).get_table_names())
+
+
+def table_stats() -> list:
+    if not is_mysql():
+        return [dict(dict.fromkeys(STAT_FIELDS), name=name) for name in table_names()]
+    rows = db.session.execute(db.text("""
+        SELECT TABLE_NAME, ENGINE, TABLE_ROWS, AVG_ROW_LENGTH, DATA_LENGTH, INDEX_LENGTH, DATA_FREE,
+               CREATE_OPTIONS, UPDATE_TIME
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+        ORDER BY DATA_LENGTH + INDEX_LENGTH DESC
+    """)).all()
+    tables = []
+    for name, engine, est_rows, avg_row, data, index, free, options, updated in rows:
+        allocated = (data or 0) + (index or 0) + (free or 0)
+        tables.append({
+            'name': name,
+            'engine': engine,
+            'rows_estimate': est_rows,
+            'avg_row_length': avg_row,
+            'data_length': data or 0,
+            'index_length': index or 0,
+            'data_free': free or 0,
+            'fragmentation': round((free or 0) / allocated, 4) if allocated else 0,
+            'partitioned': 'partitioned' in (options or ''),
+            'update_time': updated,
+        })
+    return tables
+
+
+def index_stats() -> list:
+    """[{table, index, columns, unique, cardinality}]，cardinality 为整个索引前缀的基数估计"""
+    if not is_mysql():
+        return []
+    rows = db.session.execute(db.text("""
+        SELECT TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, CARDINALITY, NON_UNIQUE
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """)).all()
+    indexes = {}
+    for table, index, _, column, cardinality, non_unique in rows:
+        entry = indexes.setdefault((table, index), {
+            'table': table, 'index': index, 'columns': [], 'unique': not non_unique, 'cardinality': None,
+        })
+        entry['columns'].append(column)
+        entry['cardinality'] = cardinality
+    return list(indexes.values())
+
+
+def slow_queries(limit: int = 10) -> list:
+    """本库中总耗时最高的语句摘要；performance_schema 未开启或无权限时抛出异常"""
+    if not is_mysql():
+        return []
+    rows = db.session.execute(db.text("""
+        SELECT DIGEST_TEXT, COUNT_STAR, SUM_TIMER_WAIT, AVG_TIMER_WAIT, MAX_TIMER_WAIT,
+               SUM_ROWS_EXAMINED, SUM_ROWS_SENT, SUM_NO_INDEX_USED, LAST_SEEN
+        FROM performance_schema.events_statements_summary_by_digest
+        WHERE SCHEMA_NAME = DATABASE() AND DIGEST_TEXT IS NOT NULL
+        ORDER BY SUM_TIMER_WAIT DESC
+        LIMIT :limit
+    """), {'limit': limit * 5}).all()
+    # 只保留涉及本应用表的语句
+    ours = [f'`{name}`' for name in db.metadata.tables]
+    hotspots = []
+    for text, calls, total, avg, peak, examined, sent, no_index, last_seen in rows:
+        if not any(name in text for name in ours):
+            continue
+        hotspots.append({
+            'query': text,
+            'calls': calls,
+            # 计时单位为皮秒
+            'total_ms': round(total / 1e9, 1),
+            'avg_ms': round(avg / 1e9, 3),
+            'max_ms': round(peak / 1e9, 3),
+            'rows_examined': examined,
+            'rows_sent': sent,
+            'no_index_used': no_index,
+            'last_seen': last_seen,
+        })
+        if len(hotspots) >= limit:
+            break
+    return hotspots
+
+
+def exact_counts() -> dict:
+    """已缓存的精确行数：表名 -> {count, seconds, computed_at}"""
+    raw = current_app.redis.hgetall(current_app.config['DBSTATS_COUNTS_KEY'])
+    return {name: json.loads(value) for name, value in raw.items()}
+
+
+def count_table(name: str) -> int:
+    """精确统计一张表的行数并缓存；只接受数据库中实际存在的表名"""
+    if name not in table_names():
+        raise ValueError(f'unknown table: {name}')
+    table = db.table(name)
+    started = time.perf_counter()
+    count = db.session.execute(db.select(db.func.count()).select_from(table)).scalar()
+    current_app.redis.hset(current_app.config['DBSTATS_COUNTS_KEY'], name, json.dumps({
+        'count': count,
+        'seconds': round(time.perf_counter() - started, 2),
+        'computed_at': datetime.utcnow().isoformat(timespec='seconds'),
+    }))
+    return count
@@ -0,0 +1,330 @@
+"""
+服务端攻击特征检测
+
+规则集（JSON，见 rules/detection.json）编译为组合匹配器，而不是逐条尝试：
+- 全部字面量（不区分大小写）构建一个 Aho-Corasick 自动机，每个目标文本只扫描一遍；
+- 带 prefilter 字面量的正则只在对应字面量命中后才执行；
+- 其余正则按目标合并为一个交替正则做整体预检，命中后再逐条确认。
+命中多条规则时取严重级别最高者，写入事件的 signature / severity。
+规则文件 mtime 变化后自动重新编译；编译失败时保留旧规则。
+每条规则的命中次数与正则确认耗时先在进程内累加，定期合并到 Redis。
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import unquote_plus
+
+from flask import current_app
+
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ('path', 'headers', 'user_agent', 'payload')
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+SEVERITY_RANK = {name: rank for rank, name in enumerate(SEVERITIES)}
+
+
+class AhoCorasick:
+    """多模式字面量匹配，search 返回文本中出现的全部模式下标（含重叠）。
+    构建时把失败链接展开为完整的转移表，扫描时每个字符只做一次字典查找"""
+
+    def __init__(self, words):
+        goto = [{}]
+        out = [()]
+        for index, word in enumerate(words):
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] += (index,)
+
+        # 按 BFS 顺序展开：每个状态继承其失败状态的全部转移，再以自身的 goto 覆盖
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                out[nxt] += out[fail[nxt]]
+                queue.append(nxt)
+        self.delta = delta
+        self.out = out
+
+    def search(self, text: str) -> set:
+        delta, out = self.delta, self.out
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class Rule:
+    def __init__(self, spec: dict):
+        self.id = spec['id']
+        self.severity = spec.get('severity', 'medium')
+        if self.severity not in SEVERITY_RANK:
+            raise ValueError(f'rule {self.id}: unknown severity {self.severity}')
+        self.targets = tuple(spec.get('targets') or TARGETS)
+        unknown = set(self.targets) - set(TARGETS)
+        if unknown:
+            raise ValueError(f'rule {self.id}: unknown targets {sorted(unknown)}')
+        self.literals = [s.lower() for s in spec.get('literals', ())]
+        self.prefilter = [s.lower() for s in spec.get('prefilter', ())]
+        self.pattern = re.compile(spec['pattern'], re.IGNORECASE) if spec.get('pattern') else None
+        if self.pattern is None and not self.literals:
+            raise ValueError(f'rule {self.id}: needs literals or pattern')
+
+
+class Engine:
+    """编译后的规则集，只读，可被多线程共享"""
+
+    def __init__(self, specs):
+        self.rules = [Rule(spec) for spec in specs]
+        ids = [rule.id for rule in self.rules]
+        if len(ids) != len(set(ids)):
+            raise ValueError('duplicate rule ids')
+
+        # 字面量 -> [(规则下标, 是否为正则的 prefilter)]
+        words, owners = [], []
+        index_of = {}
+        for rule_index, rule in enumerate(self.rules):
+            for word, is_prefilter in [(w, False) for w in rule.literals] + [(w, True) for w in rule.prefilter]:
+                if word not in index_of:
+                    index_of[word] = len(words)
+                    words.append(word)
+                    owners.append([])
+                owners[index_of[word]].append((rule_index, is_prefilter))
+        self.automaton = AhoCorasick(words)
+        self.owners = owners
+
+        # 无 prefilter 的正则按目标合并为一个预检正则
+        self.gated = {}
+        for target in TARGETS:
+            members = [i for i, rule in enumerate(self.rules)
+                       if rule.pattern is not None and not rule.prefilter and target in rule.targets]
+            if members:
+                merged = re.compile('|'.join(f'(?:{self.rules[i].pattern.pattern})' for i in members), re.IGNORECASE)
+                self.gated[target] = (merged, members)
+
+    def match(self, texts: dict, stats=None) -> list:
+        """texts: 目标 -> 已解码文本，返回命中的规则列表"""
+        rules = self.rules
+        matched = set()
+        # 同一规则的多个 prefilter 字面量命中同一文本时只计一次
+        candidates = set()
+        for target, text in texts.items():
+            if not text:
+                continue
+            lowered = text.lower()
+            for word_index in self.automaton.search(lowered):
+                for rule_index, is_prefilter in self.owners[word_index]:
+                    rule = rules[rule_index]
+                    if target not in rule.targets or rule_index in matched:
+                        continue
+                    if is_prefilter:
+                        candidates.add((rule_index, target))
+                    else:
+                        matched.add(rule_index)
+            gate = self.gated.get(target)
+            if gate is not None and gate[0].search(text):
+                candidates.update((rule_index, target) for rule_index in gate[1])
+
+        # 耗时先记在本地，每个事件只加一次锁合并
+        evaluations, latency_ns = Counter(), Counter()
+        for rule_index, target in sorted(candidates):
+            if rule_index in matched:
+                continue
+            started = time.perf_counter()
+            hit = rules[rule_index].pattern.search(texts[target]) is not None
+            rule_id = rules[rule_index].id
+            evaluations[rule_id] += 1
+            latency_ns[rule_id] += int((time.perf_counter() - started) * 1e9)
+            if hit:
+                matched.add(rule_index)
+        if stats is not None and evaluations:
+            stats.record_latencies(evaluations, latency_ns)
+        return [rules[i] for i in sorted(matched)]
+
+
+def event_texts(event: dict) -> dict:
+    """从事件中取出各检测目标的文本，路径与载荷做一次 URL 解码"""
+    headers = event.get('headers') or {}
+    payload = event.get('payload')
+    if isinstance(payload, (dict, list)):
+        payload = json.dumps(payload, ensure_ascii=False)
+    user_agent = next((v for k, v in headers.items() if k.lower() == 'user-agent'), '')
+    return {
+        'path': unquote_plus(event.get('path') or ''),
+        'headers': '\n'.join(f'{k}: {v}' for k, v in headers.items()),
+        'user_agent': str(user_agent),
+        'payload': unquote_plus(payload or ''),
+    }
+
+
+class DetectionStats:
+    """进程内的规则命中与耗时计数，定期合并到 Redis Hash"""
+
+    def __init__(self):
+        self.hits = Counter()
+        self.latency_ns = Counter()
+        self.evaluations = Counter()
+        self.flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record_hit(self, rule_id: str) -> None:
+        with self._lock:
+            self.hits[rule_id] += 1
+
+    def record_latencies(self, evaluations: Counter, latency_ns: Counter) -> None:
+        """合并一个事件内各规则的执行次数与耗时"""
+        with self._lock:
+            self.evaluations.update(evaluations)
+            self.latency_ns.update(latency_ns)
+
+    def record_event(self, seconds: float) -> None:
+        with self._lock:
+            self.evaluations['_events'] += 1
+            self.latency_ns['_events'] += int(seconds * 1e9)
+
+    def flush(self, redis_client, key: str) -> None:
+        with self._lock:
+            fields = Counter()
+            for prefix, counter in (('hits', self.hits), ('evals', self.evaluations), ('ns', self.latency_ns)):
+                for rule_id, n in counter.items():
+                    fields[f'{prefix}:{rule_id}'] += n
+            self.hits, self.evaluations, self.latency_ns = Counter(), Counter(), Counter()
+            self.flushed_at = time.monotonic()
+        if fields:
+            pipe = redis_client.pipeline(transaction=False)
+            for field, n in fields.items():
+                pipe.hincrby(key, field, n)
+            pipe.execute()
+
+
+class Detector:
+    """持有当前规则引擎，按 mtime 热加载规则文件"""
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self.engine = None
+        self.mtime = None
+        self.checked_at = None
+        self.stats = DetectionStats()
+        self._lock = threading.Lock()
+
+    def get_engine(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return self.engine
+        with self._lock:
+            self.checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self.mtime:
+                self.mtime = mtime
+                if mtime is None:
+                    self.engine = None
+                else:
+                    try:
+                        with open(self.path, encoding='utf-8') as f:
+                            self.engine = Engine(json.load(f))
+                        logger.info('loaded %d detection rules from %s', len(self.engine.rules), self.path)
+                    except (OSError, ValueError, KeyError, re.error) as e:
+                        logger.error('failed to load detection rules from %s, keeping previous rules: %s', self.path, e)
+        return self.engine
+
+    def classify(self, event: dict) -> list:
+        engine = self.get_engine()
+        if engine is None:
+            return []
+        started = time.perf_counter()
+        rules = engine.match(event_texts(event), self.stats)
+        self.stats.record_event(time.perf_counter() - started)
+        for rule in rules:
+            self.stats.record_hit(rule.id)
+        return rules
+
+
+def get_detector() -> Detector:
+    detector = current_app.extensions.get('detector')
+    if detector is None:
+        config = current_app.config
+        detector = current_app.extensions['detector'] = Detector(
+            config['DETECTION_RULES'], config['DETECTION_RELOAD_INTERVAL']
+        )
+    return detector
+
+
+def apply(events) -> int:
+    """就地为一批事件设置 signature / severity，返回命中的事件数。
+    命中时 signature 取严重级别最高的规则，severity 取规则与传感器上报两者中较高的"""
+    config = current_app.config
+    if not config['DETECTION_ENABLED']:
+        return 0
+    detector = get_detector()
+    matched = 0
+    for event in events:
+        rules = detector.classify(event)
+        if not rules:
+            continue
+        top = max(rules, key=lambda rule: SEVERITY_RANK[rule.severity])
+        event['signature'] = top.id
+        reported = event.get('severity')
+        if SEVERITY_RANK.get(reported, -1) < SEVERITY_RANK[top.severity]:
+            event['severity'] = top.severity
+        matched += 1
+    if time.monotonic() - detector.stats.flushed_at >= config['DETECTION_STATS_INTERVAL']:
+        detector.stats.flush(current_app.redis, config['DETECTION_STATS_KEY'])
+    return matched
+
+
+def rule_stats() -> dict:
+    """已检测事件数、单事件平均耗时，以及各规则累计命中次数与平均正则确认耗时（微秒）"""
+    detector = get_detector()
+    config = current_app.config
+    detector.stats.flush(current_app.redis, config['DETECTION_STATS_KEY'])
+    raw = current_app.redis.hgetall(config['DETECTION_STATS_KEY'])
+    totals = {}
+    for field, value in raw.items():
+        kind, _, rule_id = field.partition(':')
+        totals.setdefault(rule_id, Counter())[kind] += int(value)
+
+    def avg_us(counts):
+        return round(counts['ns'] / counts['evals'] / 1000, 2) if counts['evals'] else None
+
+    events = totals.pop('_events', Counter())
+    engine = detector.get_engine()
+    severities = {rule.id: rule.severity for rule in engine.rules} if engine else {}
+    rows = [
+        {
+            'rule': rule_id,
+            'severity': severities.get(rule_id),
+            'hits': counts['hits'],
+            'evaluations': counts['evals'],
+            'avg_us': avg_us(counts),
+        }
+        for rule_id, counts in totals.items()
+    ]
+    return {
+        'events': events['evals'],
+        'avg_us': avg_us(events),
+        'rules': sorted(rows, key=lambda row: row['hits'], reverse=True),
+    }
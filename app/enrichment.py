@@ -0,0 +1,200 @@
+"""
+攻击者 GeoIP / ASN 补全
+
+离线读取本地 GeoLite2 City / ASN 数据库（MODE_MMAP），由后台任务按主键顺序批量处理
+country 为空的新档案，不在 /api/capture 请求路径上执行。
+查询结果按 IP 和所在 /24（IPv6 为 /48）网段缓存在 Redis 中；数据库文件被替换（mtime 变化）
+后自动重新打开，无需重启。补全后用 Core 批量更新档案，同步修正汇总表中的国家维度，
+并使攻击者缓存失效。
+"""
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import geoip2.database
+import geoip2.errors
+from flask import current_app
+from maxminddb import MODE_MMAP
+
+from . import attacker_cache, rollups, view_cache
+from .extensions import db
+from .models import AttackerProfile
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('country', 'city', 'asn', 'isp')
+
+
+class GeoIPDatabase:
+    """按需打开 mmdb 文件；每隔 check_interval 秒检查 mtime，变化时重新打开"""
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self.reader = None
+        self.mtime = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return self.reader
+        with self._lock:
+            self.checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self.mtime:
+                old, self.reader = self.reader, None
+                if mtime is not None:
+                    self.reader = geoip2.database.Reader(self.path, mode=MODE_MMAP)
+                    logger.info('loaded GeoIP database %s', self.path)
+                self.mtime = mtime
+                if old is not None:
+                    old.close()
+        return self.reader
+
+
+def _databases():
+    databases = current_app.extensions.get('geoip')
+    if databases is None:
+        config = current_app.config
+        interval = config['GEOIP_RELOAD_INTERVAL']
+        databases = current_app.extensions['geoip'] = (
+            GeoIPDatabase(config['GEOIP_CITY_DB'], interval),
+            GeoIPDatabase(config['GEOIP_ASN_DB'], interval),
+        )
+    return databases
+
+
+def is_available() -> bool:
+    return any(database.get() is not None for database in _databases())
+
+
+def lookup(ip: str) -> dict:
+    """直接查询 mmdb，返回 {country, city, asn, isp} 中能解析出的字段"""
+    city_db, asn_db = (database.get() for database in _databases())
+    info = {}
+    if city_db is not None:
+        try:
+            response = city_db.city(ip)
+            info['country'] = response.country.iso_code
+            info['city'] = response.city.names.get('zh-CN') or response.city.name
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+    if asn_db is not None:
+        try:
+            response = asn_db.asn(ip)
+            if response.autonomous_system_number:
+                info['asn'] = f'AS{response.autonomous_system_number}'
+            info['isp'] = response.autonomous_system_organization
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+    return {key: value for key, value in info.items() if value}
+
+
+def network_of(ip: str) -> str | None:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+def resolve_many(ips) -> dict:
+    """批量解析 IP：先查 IP 缓存，再查网段缓存，最后查 mmdb；未解析出的 IP 结果为空字典"""
+    config = current_app.config
+    prefix, ttl = config['GEOIP_CACHE_KEY'], config['GEOIP_CACHE_TTL']
+    ips = list(ips)
+    networks = [network_of(ip) for ip in ips]
+    keys = [f'{prefix}:ip:{ip}' for ip in ips] + [f'{prefix}:net:{net}' for net in networks]
+    cached = current_app.redis.mget(keys)
+    by_ip, by_net = cached[:len(ips)], cached[len(ips):]
+
+    results, resolved_nets = {}, {}
+    pipe = current_app.redis.pipeline(transaction=False)
+    for ip, net, ip_value, net_value in zip(ips, networks, by_ip, by_net):
+        if ip_value is not None:
+            results[ip] = json.loads(ip_value)
+            continue
+        if net_value is not None:
+            info = json.loads(net_value)
+        elif net in resolved_nets:
+            info = resolved_nets[net]
+        else:
+            info = lookup(ip)
+            if net is not None:
+                resolved_nets[net] = info
+                pipe.set(f'{prefix}:net:{net}', json.dumps(info), ex=ttl)
+        # 空结果同样缓存，私有地址等不会被反复查询
+        pipe.set(f'{prefix}:ip:{ip}', json.dumps(info), ex=ttl)
+        results[ip] = info
+    pipe.execute()
+    return results
+
+
+def enrich_profiles(rows) -> int:
+    """rows: [(档案ID, IP)]，补全并写回，返回更新的档案数（调用方负责提交）"""
+    infos = resolve_many(ip for _, ip in rows)
+    updates = [
+        {'b_id': attacker_id, **{field: infos[ip].get(field) for field in FIELDS}}
+        for attacker_id, ip in rows if infos[ip]
+    ]
+    if not updates:
+        return 0
+    table = AttackerProfile.__table__
+    db.session.execute(
+        table.update().where(table.c.id == db.bindparam('b_id')).values(
+            {field: db.bindparam(field) for field in FIELDS}
+        ),
+        updates,
+    )
+    # 补全前落库的事件在汇总表中记在空国家下，移到新国家
+    countries = {ip: infos[ip]['country'] for _, ip in rows if infos[ip].get('country')}
+    if countries:
+        since = datetime.utcnow() - timedelta(days=current_app.config['ROLLUP_MINUTE_RETENTION_DAYS'])
+        rollups.reattribute(countries, since)
+    return len(updates)
+
+
+def run(rescan: bool = False, batch_size: int | None = None) -> int:
+    """处理 country 为空的档案，默认从上次的检查点继续；rescan 从头重新检查，返回更新的档案数"""
+    config = current_app.config
+    batch_size = batch_size or config['ENRICH_BATCH_SIZE']
+    if not is_available():
+        logger.warning('no GeoIP database found at %s / %s', config['GEOIP_CITY_DB'], config['GEOIP_ASN_DB'])
+        return 0
+
+    checkpoint_key = config['ENRICH_CHECKPOINT_KEY']
+    last_id = 0 if rescan else int(current_app.redis.get(checkpoint_key) or 0)
+    rollups.flush_rollups()
+    table = AttackerProfile.__table__
+    total = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.ip_address)
+            .where(table.c.id > last_id, table.c.country.is_(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        updated = enrich_profiles(rows)
+        db.session.commit()
+        if updated:
+            # Core 更新不会触发 ORM 事件，缓存中的国家需显式失效
+            attacker_cache.invalidate(*[ip for _, ip in rows])
+        total += updated
+        last_id = rows[-1].id
+        current_app.redis.set(checkpoint_key, max(last_id, int(current_app.redis.get(checkpoint_key) or 0)))
+    if total:
+        view_cache.tick()
+    return total
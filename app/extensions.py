@@ -6,22 +6,54 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import redis
 
+from .replicas import RoutingSession
 
-db = SQLAlchemy()
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 limiter = Limiter(key_func=get_remote_address)
 
 
-def create_redis_client(app):
+def create_redis_client(app, decode_responses=True):
     pool = redis.ConnectionPool(
         host=app.config['REDIS_HOST'],
         port=app.config['REDIS_PORT'],
         db=app.config['REDIS_DB'],
         password=app.config['REDIS_PASSWORD'],
-        decode_responses=True,
+        decode_responses=decode_responses,
+        socket_connect_timeout=app.config['REDIS_CONNECT_TIMEOUT'],
     )
     return redis.Redis(connection_pool=pool)
 
 
+def _role_value(value: str, role: str):
+    """解析 "角色:数值,..."，返回 role 对应的整数"""
+    for item in value.split(','):
+        name, _, number = item.strip().partition(':')
+        if name == role and number:
+            return int(number)
+    return None
+
+
+def engine_options(config, role: str) -> dict:
+    """按进程角色生成 SQLALCHEMY_ENGINE_OPTIONS；SQLite 沿用 Flask-SQLAlchemy 的默认设置"""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return options
+    pool_size = _role_value(config['DB_POOL_SIZE'], role)
+    max_overflow = _role_value(config['DB_MAX_OVERFLOW'], role)
+    if pool_size is not None:
+        options.setdefault('pool_size', pool_size)
+    if max_overflow is not None:
+        options.setdefault('max_overflow', max_overflow)
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('mysql'):
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('connect_timeout', config['DB_CONNECT_TIMEOUT'])
+    return options
+
+
@@ -0,0 +1,112 @@
+"""
+重复事件折叠
+
+FOLD_ENABLED 时，同一 IP、方法、路径、载荷与服务的事件在 FOLD_WINDOW 秒窗口内合并为一行：
+窗口内首次出现时插入一行，之后只递增该行的 count 并更新 last_timestamp，不再插入新行。
+窗口按事件时间计算，起点为该行的 timestamp；窗口状态保存在 Redis，
+键为事件指纹，值为 "事件ID|起点时间"，随窗口结束过期。
+全局计数器、预聚合计数与实时推送仍按每次命中计数，不受折叠影响。
+"""
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .extensions import db
+from .models import AttackEvent
+
+
+def is_enabled() -> bool:
+    return current_app.config['FOLD_ENABLED']
+
+
+def fingerprint(event: dict) -> str:
+    parts = [event['ip_address'], event.get('method'), event.get('path'), event.get('payload'),
+             event.get('honeypot_service')]
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def _key(digest: str) -> str:
+    return f"{current_app.config['FOLD_KEY']}:{digest}"
+
+
+def _parse_state(value):
+    if not value:
+        return None
+    event_id, start = value.split('|', 1)
+    return int(event_id), datetime.fromisoformat(start)
+
+
+def fold(rows):
+    """把一批待插入的事件行按指纹折叠。
+
+    返回 (新行, 各输入行的去向, 对已有行的递增, 新开窗口)：
+    去向为 ('new', 新行下标) 或 ('row', 已有事件ID)；递增为 事件ID -> UPDATE 参数；
+    新开窗口为 指纹 -> 新行下标，落库提交后交给 remember。
+    """
+    window = timedelta(seconds=current_app.config['FOLD_WINDOW'])
+    groups = defaultdict(list)
+    for index, row in enumerate(rows):
+        groups[fingerprint(row)].append(index)
+    digests = list(groups)
+    states = current_app.redis.mget([_key(digest) for digest in digests])
+
+    new_rows, targets, updates, opened = [], [None] * len(rows), {}, {}
+    for digest, state in zip(digests, states):
+        current = None
+        state = _parse_state(state)
+        if state is not None:
+            current = ('row', state[0], state[1])
+        for index in sorted(groups[digest], key=lambda i: rows[i]['timestamp']):
+            timestamp = rows[index]['timestamp']
+            if current is None or not current[2] <= timestamp < current[2] + window:
+                new_rows.append(dict(rows[index], count=1, last_timestamp=timestamp))
+                current = ('new', len(new_rows) - 1, timestamp)
+                opened[digest] = current[1]
+            elif current[0] == 'new':
+                row = new_rows[current[1]]
+                row['count'] += 1
+                row['last_timestamp'] = max(row['last_timestamp'], timestamp)
+            else:
+                update = updates.setdefault(current[1], {
+                    'b_id': current[1], 'b_timestamp': current[2], 'b_count': 0, 'b_last': timestamp,
+                })
+                update['b_count'] += 1
+                update['b_last'] = max(update['b_last'], timestamp)
+            targets[index] = current[:2]
+    return new_rows, targets, updates, opened
+
+
+def apply_updates(updates: dict) -> None:
+    """递增已有行的 count；条件带上 timestamp 以便分区裁剪（调用方负责提交）"""
+    if not updates:
+        return
+    table = AttackEvent.__table__
+    last = db.bindparam('b_last')
+    db.session.execute(
+        table.update()
+        .where(table.c.id == db.bindparam('b_id'), table.c.timestamp == db.bindparam('b_timestamp'))
+        .values(
+            count=table.c.count + db.bindparam('b_count'),
+            last_timestamp=db.case(
+                (db.or_(table.c.last_timestamp.is_(None), table.c.last_timestamp < last), last),
+                else_=table.c.last_timestamp,
+            ),
+        ),
+        list(updates.values()),
+    )
+
+
+def remember(opened: dict, new_rows: list, event_ids: list) -> None:
+    """记录提交后新开的窗口；窗口按事件时间已结束的（如补传的历史事件）不再记录"""
+    window = current_app.config['FOLD_WINDOW']
+    now = datetime.utcnow()
+    pipe = current_app.redis.pipeline(transaction=False)
+    for digest, index in opened.items():
+        start = new_rows[index]['timestamp']
+        ttl = int((start - now).total_seconds() + window)
+        if ttl > 0:
+            pipe.set(_key(digest), f'{event_ids[index]}|{start.isoformat()}', ex=ttl)
+    pipe.execute()
@@ -0,0 +1,426 @@
+"""
+缓冲写入模块
+
+buffered 模式下 capture 只把规范化后的事件写入 Redis Stream 并立即返回 202，
+由独立的 flusher 进程按批读取，用多行 INSERT 批量落库。
+
+运行 flusher:  python -m app.ingest
+"""
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+
+import redis
+from flask import current_app
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, StatementError
+
+from . import attacker_cache, counters, detection, folding, live, rollups, storage, touches, view_cache
+from .extensions import db
+from .models import AttackEvent, AttackerProfile, HeaderSet
+from .protocol import decode_event, encode_event, ingest_id_key, user_agent
+
+
+GROUP = 'flushers'
+
+# PyMySQL 把部分数据错误报告为 OperationalError：1292 非法日期时间、1366 非法字符串值、1406 超长、1264 越界
+ROW_ERROR_CODES = {1264, 1265, 1292, 1366, 1406}
+
+logger = logging.getLogger(__name__)
+
+
+class StaleAttackerIds(Exception):
+    """缓存中的档案ID已被清理任务删除"""
+
+
+def _id_key(ingest_id: str) -> str:
+    return ingest_id_key(current_app.config['INGEST_STREAM'], ingest_id)
+
+
+def enqueue_event(event: dict) -> str:
+    """写入 Redis Stream，返回条目ID作为受理ID"""
+    return current_app.redis.xadd(current_app.config['INGEST_STREAM'], {'event': encode_event(event)})
+
+
+def enqueue_events(events) -> list:
+    """批量入队（单次 pipeline 往返），返回受理ID列表"""
+    stream = current_app.config['INGEST_STREAM']
+    pipe = current_app.redis.pipeline(transaction=False)
+    for event in events:
+        pipe.xadd(stream, {'event': encode_event(event)})
+    return pipe.execute()
+
+
+def lookup_event_id(ingest_id: str):
+    """受理ID -> 数据库事件ID；尚未落库（或已过期）时返回 None"""
+    value = current_app.redis.get(_id_key(ingest_id))
+    return int(value) if value else None
+
+
+def insert_missing_attackers(latest: dict) -> int:
+    """INSERT IGNORE：依赖 ip_address 唯一索引，并发首次命中时不会产生重复档案；返回实际新建数"""
+    table = AttackerProfile.__table__
+    stmt = (
+        table.insert()
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+        .values([
+            {
+                'ip_address': ip,
+                'user_agent': ua or '',
+                'first_seen': seen,
+                'last_seen': seen,
+            }
+            for ip, (seen, ua) in latest.items()
+        ])
+    )
+    return db.session.execute(stmt).rowcount
+
+
+def upsert_attackers(events, use_cache: bool = True):
+    """批量确保攻击者档案存在并刷新 last_seen/UA，返回 (ip -> (profile id, country), 新建档案数)"""
+    latest = {}
+    for event in events:
+        ua = user_agent(event.get('headers'))
+        seen, prev_ua = latest.get(event['ip_address'], (event['timestamp'], None))
+        latest[event['ip_address']] = (max(seen, event['timestamp']), ua or prev_ua)
+
+    cache = attacker_cache.get_cache()
+    ids = cache.get_many(latest) if use_cache else {}
+    cached = [ip for ip in latest if ip in ids]
+
+    table = AttackerProfile.__table__
+    select_ids = db.select(table.c.ip_address, table.c.id, table.c.country)
+
+    def lookup(ips):
+        rows = db.session.execute(select_ids.where(table.c.ip_address.in_(ips)))
+        return {ip: (attacker_id, country) for ip, attacker_id, country in rows}
+
+    uncached = [ip for ip in latest if ip not in ids]
+    created, created_count = [], 0
+    if uncached:
+        found = lookup(uncached)
+        created = [ip for ip in uncached if ip not in found]
+        if created:
+            created_count = insert_missing_attackers({ip: latest[ip] for ip in created})
+            found.update(lookup(created))
+        ids.update(found)
+        cache.remember(found)
+
+    known = [ip for ip in latest if ip not in created]
+    if known and current_app.config['ATTACKER_TOUCH_COALESCE']:
+        if cached:
+            # attacker_id 没有外键：确认缓存的档案仍存在，共享锁使清理任务在本事务提交前无法删除它们
+            wanted = {ids[ip][0] for ip in cached}
+            existing = db.session.execute(
+                db.select(table.c.id).where(table.c.id.in_(wanted)).with_for_update(read=True)
+            ).scalars().all()
+            if len(existing) != len(wanted):
+                raise StaleAttackerIds()
+        touches.record_touches({ip: latest[ip] for ip in known})
+    elif known:
+        # UPDATE 匹配的行数即可确认档案仍存在（PyMySQL 默认返回匹配行数）
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('b_id'))
+            .values(
+                last_seen=db.bindparam('b_last_seen'),
+                user_agent=db.func.coalesce(db.bindparam('b_user_agent'), table.c.user_agent),
+            ),
+            [
+                {'b_id': ids[ip][0], 'b_last_seen': latest[ip][0], 'b_user_agent': latest[ip][1]}
+                for ip in known
+            ],
+        )
+        if result.rowcount != len(known):
+            raise StaleAttackerIds()
+    return ids, created_count
+
+
+def insert_header_sets(sets: dict) -> None:
+    """相同内容的请求头集合只保存一份；已存在的刷新 last_used，清理任务据此跳过仍在使用的集合"""
+    now = datetime.utcnow()
+    table = HeaderSet.__table__
+    rows = [{'hash': digest, 'headers': headers, 'created_at': now, 'last_used': now}
+            for digest, headers in sets.items()]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(last_used=stmt.inserted.last_used)
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=['hash'], set_={'last_used': stmt.excluded.last_used})
+    else:
+        raise NotImplementedError(f'header set upsert is not supported on {dialect}')
+    db.session.execute(stmt, rows)
+
+
+def consecutive_ids() -> bool:
+    """单条多行 INSERT 的自增ID是否保证连续：auto_increment_increment 为 1（Galera / 多主复制通常大于 1），
+    且 innodb_autoinc_lock_mode 不是 2（交错模式下并发插入的ID可能穿插）。每个进程只查询一次"""
+    cached = current_app.extensions.get('consecutive_ids')
+    if cached is None:
+        increment, lock_mode = db.session.execute(
+            db.text('SELECT @@auto_increment_increment, @@innodb_autoinc_lock_mode')
+        ).one()
+        cached = int(increment) == 1 and int(lock_mode) != 2
+        if not cached:
+            logger.warning('自增ID不保证连续（auto_increment_increment=%s, innodb_autoinc_lock_mode=%s），'
+                           '事件改为逐行插入', increment, lock_mode)
+        current_app.extensions['consecutive_ids'] = cached
+    return cached
+
+
+def insert_events(rows) -> list:
+    """单条多行 INSERT 写入事件，返回与 rows 顺序一致的事件ID"""
+    if not rows:
+        return []
+    table = AttackEvent.__table__
+    if db.engine.dialect.insert_returning:
+        return [row[0] for row in db.session.execute(table.insert().values(rows).returning(table.c.id))]
+    if consecutive_ids():
+        # 此时 MySQL 为单条多行 INSERT 分配连续自增ID，lastrowid 为首行ID
+        first_id = db.session.execute(table.insert().values(rows)).lastrowid
+        return list(range(first_id, first_id + len(rows)))
+    return [db.session.execute(table.insert().values(row)).lastrowid for row in rows]
+
+
+def write_batch(events) -> list:
+    """一次事务内批量写入一组规范化事件，返回事件ID列表"""
+    # 服务端特征检测在落库前统一执行：同步、批量与缓冲模式共用
+    detection.apply(events)
+    try:
+        return _write_batch(events, use_cache=True)
+    except (IntegrityError, StaleAttackerIds):
+        # 缓存中的档案ID可能已被清理任务删除（其他进程的本地缓存尚未过期）：失效后绕过缓存重试一次
+        db.session.rollback()
+        attacker_cache.invalidate(*{event['ip_address'] for event in events})
+        return _write_batch(events, use_cache=False)
+
+
+def _write_batch(events, use_cache: bool) -> list:
+    attackers, created_count = upsert_attackers(events, use_cache=use_cache)
+    rows = [dict(event, attacker_id=attackers[event['ip_address']][0]) for event in events]
+    fold_enabled = folding.is_enabled()
+    if fold_enabled:
+        # 窗口内的重复事件只递增已有行的 count
+        rows, targets, updates, opened = folding.fold(rows)
+    stored, header_sets = storage.compact_rows(rows)
+    if header_sets:
+        insert_header_sets(header_sets)
+    # 按批拆分，避免单条语句超过 max_allowed_packet
+    batch_size = current_app.config['INGEST_BATCH_SIZE']
+    event_ids = []
+    for start in range(0, len(stored), batch_size):
+        event_ids.extend(insert_events(stored[start:start + batch_size]))
+    if fold_enabled:
+        folding.apply_updates(updates)
+    db.session.commit()
+    if fold_enabled:
+        folding.remember(opened, rows, event_ids)
+        # 每个输入事件对应其所在行的事件ID
+        event_ids = [event_ids[ref] if kind == 'new' else ref for kind, ref in targets]
+    after_commit(events, attackers, created_count)
+    return event_ids
+
+
+def after_commit(events, attackers: dict, created_count: int) -> None:
+    """事件落库后的增量维护：全局计数、预聚合计数、仪表盘实时推送与视图缓存版本"""
+    countries = {ip: country for ip, (_, country) in attackers.items()}
+    counters.incr(total_attacks=len(events), unique_attackers=created_count)
+    rollups.record_events(events, countries)
+    live.publish(events, countries, created_count)
+    view_cache.tick()
+
+
+def ensure_group():
+    try:
+        current_app.redis.xgroup_create(
+            current_app.config['INGEST_STREAM'], GROUP, id='0', mkstream=True
+        )
+    except redis.exceptions.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def stream_backlog() -> dict:
+    """Stream 长度、已投递未确认条数，以及最早一条尚未落库条目（未确认或未投递）的等待秒数"""
+    r = current_app.redis
+    stream = current_app.config['INGEST_STREAM']
+    length = r.xlen(stream)
+    if not length:
+        return {'length': 0, 'pending': 0, 'lag_seconds': 0.0}
+    group = next((info for info in r.xinfo_groups(stream) if info['name'] == GROUP), None)
+    pending, oldest = 0, []
+    if group is None:
+        # flusher 从未启动：所有条目都未投递
+        oldest = [entry_id for entry_id, _ in r.xrange(stream, count=1)]
+    else:
+        pending = group['pending']
+        if pending:
+            oldest.append(r.xpending(stream, GROUP)['min'])
+        oldest += [entry_id for entry_id, _ in r.xrange(stream, min=f"({group['last-delivered-id']}", count=1)]
+    lag = 0.0
+    if oldest:
+        # 条目ID前半段为写入时的毫秒时间戳
+        first_ms = min(int(entry_id.split('-')[0]) for entry_id in oldest)
+        lag = max(0.0, time.time() - first_ms / 1000)
+    return {'length': length, 'pending': pending, 'lag_seconds': round(lag, 3)}
+
+
+def warn_backlog() -> None:
+    """积压超过 INGEST_BACKLOG_ALERT 条时记录警告；Stream 不按长度截断，积压只会等待落库而不会被丢弃"""
+    length = current_app.redis.xlen(current_app.config['INGEST_STREAM'])
+    if length > current_app.config['INGEST_BACKLOG_ALERT']:
+        logger.warning('缓冲写入积压 %s 条，超过告警阈值 %s', length, current_app.config['INGEST_BACKLOG_ALERT'])
+
+
+def claim_stale(consumer: str, min_idle_ms: int = 60000) -> None:
+    """接管已退出 flusher 遗留的未确认条目"""
+    stream = current_app.config['INGEST_STREAM']
+    start = '0-0'
+    while True:
+        start, claimed = current_app.redis.xautoclaim(
+            stream, GROUP, consumer, min_idle_ms, start_id=start, count=1000
+        )[:2]
+        if not claimed or start == '0-0':
+            break
+
+
+def read_entries(consumer: str, count: int, block_ms=None, pending: bool = False) -> list:
+    """pending=True 时读取本消费者未确认的条目（上次写库失败的批次）"""
+    resp = current_app.redis.xreadgroup(
+        GROUP,
+        consumer,
+        {current_app.config['INGEST_STREAM']: '0' if pending else '>'},
+        count=count,
+        block=None if pending else block_ms,
+    )
+    return resp[0][1] if resp else []
+
+
+def rejects_rows(error) -> bool:
+    """数据库因行内容拒绝写入（超长、类型不符、约束冲突等）；连接、锁等错误返回 False，整批留待重试"""
+    if isinstance(error, (DataError, IntegrityError)):
+        return True
+    if isinstance(error, DBAPIError):
+        code = (getattr(error.orig, 'args', None) or (None,))[0]
+        return code in ROW_ERROR_CODES
+    # 参数绑定阶段的错误（如无法序列化的值）
+    return isinstance(error, StatementError)
+
+
+def write_or_split(events) -> list:
+    """写入一批事件，返回与 events 顺序一致的事件ID；因行内容失败时二分重试，
+    被拒绝的单个事件对应位置为异常对象。其余错误向上抛出"""
+    try:
+        return write_batch(events)
+    except Exception as e:
+        db.session.rollback()
+        if not rejects_rows(e):
+            raise
+        if len(events) == 1:
+            return [e]
+    middle = len(events) // 2
+    return write_or_split(events[:middle]) + write_or_split(events[middle:])
+
+
+def dead_letter(pipe, ingest_id: str, raw, error: str) -> None:
+    config = current_app.config
+    logger.warning('条目 %s 写入失败，移入死信 Stream: %s', ingest_id, error)
+    pipe.xadd(
+        config['INGEST_DEAD_STREAM'],
+        {'ingest_id': ingest_id, 'event': raw if raw is not None else '', 'error': error[:500]},
+        maxlen=config['INGEST_DEAD_MAXLEN'],
+        approximate=True,
+    )
+
+
+def flush_entries(entries) -> int:
+    """把一批 Stream 条目写入数据库并确认，返回写入条数；数据库拒绝的条目移入死信 Stream"""
+    if not entries:
+        return 0
+    config = current_app.config
+    stream = config['INGEST_STREAM']
+    pipe = current_app.redis.pipeline(transaction=False)
+
+    events, ingest_ids, raws, done = [], [], [], []
+    for ingest_id, fields in entries:
+        try:
+            events.append(decode_event(fields['event']))
+            ingest_ids.append(ingest_id)
+            raws.append(fields['event'])
+        except (KeyError, TypeError, ValueError) as e:
+            dead_letter(pipe, ingest_id, fields.get('event'), f'无法解析: {e}')
+            done.append(ingest_id)
+
+    results = write_or_split(events) if events else []
+
+    written = 0
+    for ingest_id, raw, result in zip(ingest_ids, raws, results):
+        if isinstance(result, Exception):
+            # 只保留驱动的错误信息，不含 SQL 与参数
+            dead_letter(pipe, ingest_id, raw, f'{type(result).__name__}: {getattr(result, "orig", result)}')
+        else:
+            pipe.set(_id_key(ingest_id), result, ex=config['INGEST_ID_TTL'])
+            written += 1
+        done.append(ingest_id)
+    # 确认后即删除：Stream 中只保留尚未落库的条目
+    pipe.xack(stream, GROUP, *done)
+    pipe.xdel(stream, *done)
+    pipe.execute()
+    return written
+
+
+def collect_batch(consumer: str) -> list:
+    """凑满 INGEST_BATCH_SIZE 条或等待满 INGEST_FLUSH_INTERVAL 秒后返回"""
+    batch_size = current_app.config['INGEST_BATCH_SIZE']
+    interval = current_app.config['INGEST_FLUSH_INTERVAL']
+
+    entries = read_entries(consumer, batch_size, pending=True)
+    if entries:
+        return entries
+
+    deadline = time.monotonic() + interval
+    entries = read_entries(consumer, batch_size, block_ms=int(interval * 1000))
+    while entries and len(entries) < batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        more = read_entries(consumer, batch_size - len(entries), block_ms=max(1, int(remaining * 1000)))
+        if not more:
+            break
+        entries.extend(more)
+    return entries
+
+
+def run_flusher():
+    from . import create_app
+
+    app = create_app(role='worker')
+    with app.app_context():
+        consumer = f"{socket.gethostname()}-{os.getpid()}"
+        ensure_group()
+        claim_stale(consumer)
+        print(f"flusher {consumer} 已启动，批大小 {app.config['INGEST_BATCH_SIZE']}，"
+              f"刷新间隔 {app.config['INGEST_FLUSH_INTERVAL']}s")
+        warned_at = 0.0
+        while True:
+            if time.monotonic() - warned_at >= 60:
+                warn_backlog()
+                warned_at = time.monotonic()
+            entries = collect_batch(consumer)
+            try:
+                flush_entries(entries)
+                touches.flush_if_older_than(app.config['ATTACKER_TOUCH_FLUSH_INTERVAL'])
+                rollups.flush_if_older_than(app.config['ROLLUP_FLUSH_INTERVAL'])
+            except Exception:
+                logger.exception('批量写入失败，%s 秒后重试', app.config['INGEST_FLUSH_INTERVAL'])
+                time.sleep(app.config['INGEST_FLUSH_INTERVAL'])
+
+
+if __name__ == '__main__':
+    run_flusher()
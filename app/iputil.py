@@ -0,0 +1,34 @@
+"""
+IP 地址工具
+
+ip_packed 列统一存储 16 字节形式（IPv4 映射为 ::ffff:a.b.c.d），
+使 IPv4/IPv6 的 CIDR 查询都能转换为同一索引上的字节区间扫描。
+"""
+import ipaddress
+
+
+def pack_ip(value):
+    """返回 16 字节打包形式；无法解析（如多级代理串）时返回 None"""
+    try:
+        ip = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b'\x00' * 10 + b'\xff\xff' + ip.packed)
+    return ip.packed
+
+
+def cidr_range(value):
+    """CIDR -> (起始, 结束) 打包字节，闭区间；非法时抛出 ValueError"""
+    network = ipaddress.ip_network(value.strip(), strict=False)
+    return pack_ip(network.network_address), pack_ip(network.broadcast_address)
+
+
+def classify_ip_filter(value: str):
+    """把筛选输入分为 ('cidr', (lo, hi)) / ('exact', ip) / ('prefix', 前缀)"""
+    value = value.strip()
+    if '/' in value:
+        return 'cidr', cidr_range(value)
+    if pack_ip(value) is not None:
+        return 'exact', value
+    return 'prefix', value
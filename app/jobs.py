@@ -0,0 +1,201 @@
+"""
+后台任务队列（RQ）
+
+队列按优先级排列，worker 总是先取靠前队列中的任务。worker 使用 SimpleWorker 在同一进程中
+执行任务，整个生命周期复用一个应用上下文及其数据库连接池；任务结束后释放 session。
+失败任务按 JOB_RETRY_INTERVAL 起逐次翻倍的间隔重试；周期任务由 scheduler 按 UTC 对齐的
+时间槽入队，同一时间槽用 Redis SET NX 去重，可同时运行多个 scheduler。
+
+    python -m app.jobs worker [队列...] [--burst]
+    python -m app.jobs scheduler [--once]
+    python -m app.jobs enqueue <任务名> [参数...]
+"""
+import time
+from datetime import timedelta
+
+from flask import current_app
+from rq import Queue, Retry, SimpleWorker
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+
+from . import tasks
+from .extensions import db
+
+
+# 优先级从高到低
+QUEUES = ('rollup', 'enrichment', 'report', 'cleanup')
+
+# 任务名 -> (队列, 任务函数)
+JOBS = {
+    'rollup': ('rollup', tasks.flush_buffers),
+    'backfill-rollups': ('rollup', tasks.backfill_rollups),
+    'enrich': ('enrichment', tasks.enrich_attackers),
+    'report': ('report', tasks.generate_report),
+    'cleanup': ('cleanup', tasks.cleanup_old_data),
+    'reconcile': ('cleanup', tasks.reconcile_counters),
+    'count-table': ('report', tasks.count_table),
+}
+
+# 需要参数、不能在任务页面直接一键入队的任务
+ARGUMENT_JOBS = {'count-table'}
+
+REGISTRIES = ('started', 'scheduled', 'deferred', 'failed', 'finished')
+
+
+class AppWorker(SimpleWorker):
+    """不 fork 子进程，复用当前应用上下文；每个任务结束后归还数据库连接"""
+
+    def perform_job(self, job, queue):
+        try:
+            return super().perform_job(job, queue)
+        finally:
+            db.session.remove()
+
+
+def get_queue(name: str) -> Queue:
+    return Queue(name, connection=current_app.rq_redis)
+
+
+def retry_policy() -> Retry | None:
+    config = current_app.config
+    if config['JOB_RETRY_MAX'] <= 0:
+        return None
+    return Retry(
+        max=config['JOB_RETRY_MAX'],
+        interval=[config['JOB_RETRY_INTERVAL'] * 2 ** i for i in range(config['JOB_RETRY_MAX'])],
+    )
+
+
+def _enqueue_options(name: str):
+    if name not in JOBS:
+        raise ValueError(f'unknown job: {name}')
+    queue_name, func = JOBS[name]
+    config = current_app.config
+    options = {
+        'job_timeout': config['JOB_TIMEOUT'],
+        'result_ttl': config['JOB_RESULT_TTL'],
+        'failure_ttl': config['JOB_RESULT_TTL'],
+        'retry': retry_policy(),
+        'description': name,
+    }
+    return get_queue(queue_name), func, options
+
+
+def enqueue(name: str, *args, **kwargs) -> Job:
+    queue, func, options = _enqueue_options(name)
+    return queue.enqueue(func, args=args, kwargs=kwargs, **options)
+
+
+def enqueue_in(seconds: float, name: str, *args, **kwargs) -> Job:
+    """延迟执行，需要至少一个以 scheduler 模式运行的 worker"""
+    queue, func, options = _enqueue_options(name)
+    return queue.enqueue_in(timedelta(seconds=seconds), func, args=args, kwargs=kwargs, **options)
+
+
+def parse_schedule(value: str | None) -> dict:
+    """"rollup:60,report:86400" -> {'rollup': 60, 'report': 86400}"""
+    schedule = {}
+    for item in (value or '').split(','):
+        if ':' in item:
+            name, interval = item.rsplit(':', 1)
+            schedule[name.strip()] = int(interval)
+    return schedule
+
+
+def schedule_periodic(now: float | None = None) -> list:
+    """把进入新时间槽的周期任务入队，返回入队的任务名"""
+    config = current_app.config
+    now = time.time() if now is None else now
+    enqueued = []
+    for name, interval in parse_schedule(config['JOB_SCHEDULE']).items():
+        slot = int(now // interval)
+        key = f"{config['JOB_SCHEDULE_KEY']}:{name}:{slot}"
+        if current_app.redis.set(key, 1, nx=True, ex=interval * 2):
+            enqueue(name)
+            enqueued.append(name)
+    return enqueued
+
+
+def queue_counts() -> dict:
+    """各队列积压数与各状态任务数，不读取任务详情"""
+    counts = {}
+    for name in QUEUES:
+        queue = get_queue(name)
+        counts[name] = {
+            'queued': queue.count,
+            'states': {state: getattr(queue, f'{state}_job_registry').count for state in REGISTRIES},
+        }
+    return counts
+
+
+def job_status(limit: int = 20) -> list:
+    """各队列的积压数与各状态下最近的任务"""
+    status = []
+    for name in QUEUES:
+        queue = get_queue(name)
+        registries = {state: getattr(queue, f'{state}_job_registry') for state in REGISTRIES}
+        recent = []
+        for state, registry in registries.items():
+            ids = registry.get_job_ids(0, limit - 1)
+            for job in Job.fetch_many(ids, connection=current_app.rq_redis):
+                if job is not None:
+                    recent.append((state, job))
+        status.append({
+            'name': name,
+            'queued': queue.count,
+            'counts': {state: registry.count for state, registry in registries.items()},
+            'jobs': [job_info(job, state) for state, job in recent],
+        })
+    return status
+
+
+def job_info(job: Job, state: str | None = None) -> dict:
+    exc_info = job.exc_info
+    return {
+        'id': job.id,
+        'name': job.description,
+        'state': state or job.get_status(refresh=False),
+        'enqueued_at': job.enqueued_at.isoformat() if job.enqueued_at else None,
+        'ended_at': job.ended_at.isoformat() if job.ended_at else None,
+        'retries_left': job.retries_left,
+        'result': job.result if job.is_finished else None,
+        'error': exc_info.strip().splitlines()[-1] if exc_info else None,
+    }
+
+
+def run_worker(queues=None, burst: bool = False) -> None:
+    from . import create_app
+    app = create_app(role='worker')
+    with app.app_context():
+        worker = AppWorker([get_queue(name) for name in queues or QUEUES], connection=app.rq_redis)
+        # scheduler 模式负责把到期的延迟任务与重试任务移回队列
+        worker.work(burst=burst, with_scheduler=True)
+
+
+def run_scheduler(once: bool = False) -> None:
+    from . import create_app
+    app = create_app(role='worker')
+    with app.app_context():
+        while True:
+            for name in schedule_periodic():
+                print(f"已入队周期任务 {name}")
+            if once:
+                break
+            time.sleep(app.config['JOB_SCHEDULER_INTERVAL'])
+
+
+if __name__ == '__main__':
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    args = sys.argv[2:]
+    if command == 'worker':
+        run_worker([a for a in args if not a.startswith('--')], burst='--burst' in args)
+    elif command == 'scheduler':
+        run_scheduler(once='--once' in args)
+    elif command == 'enqueue' and args:
+        from . import create_app
+        with create_app().app_context():
+            job = enqueue(args[0], *args[1:])
+            print(f"已入队 {args[0]}: {job.id}")
+    else:
+        print("用法: python -m app.jobs [worker [队列...] [--burst]|scheduler [--once]|enqueue <任务名> [参数...]]")
@@ -0,0 +1,69 @@
+"""
+仪表盘实时推送
+
+采集路径每落库一批事件向 Redis 频道 LIVE_CHANNEL 发布一条消息（最新事件 + 计数增量），
+/admin/live 以 Server-Sent Events 转发给浏览器，仪表盘就地更新而无需刷新重查。
+每个 SSE 连接占用一个 Redis 订阅连接与一个工作线程（生产环境由 APP_ROLE=live 的 gevent 进程提供，只占一个协程），
+LIVE_MAX_DURATION 秒后主动结束，由浏览器 EventSource 自动重连。
+"""
+import json
+import time
+from collections import Counter
+
+from flask import current_app
+
+
+# 每条消息最多携带的事件数，仪表盘只展示最新 20 条
+MAX_EVENTS = 20
+
+
+def publish(events, countries: dict, created_count: int) -> None:
+    """events 为已落库的规范化事件；countries: ip -> country"""
+    config = current_app.config
+    if not config['LIVE_ENABLED'] or not events:
+        return
+    services, country_counts, severities = Counter(), Counter(), Counter()
+    for event in events:
+        services[event.get('honeypot_service') or ''] += 1
+        country_counts[countries.get(event['ip_address']) or ''] += 1
+        severities[event.get('severity') or ''] += 1
+    latest = sorted(events, key=lambda event: event['timestamp'])[-MAX_EVENTS:]
+    message = {
+        'total_attacks': len(events),
+        'unique_attackers': created_count,
+        'services': services,
+        'countries': country_counts,
+        'severities': severities,
+        'events': [
+            {
+                'timestamp': event['timestamp'].isoformat(),
+                'ip_address': event['ip_address'],
+                'method': event.get('method'),
+                'path': (event.get('path') or '')[:255],
+                'severity': event.get('severity'),
+                'signature': event.get('signature'),
+            }
+            for event in latest
+        ],
+    }
+    current_app.redis.publish(config['LIVE_CHANNEL'], json.dumps(message, ensure_ascii=False))
+
+
+def stream():
+    """SSE 消息生成器，需在 stream_with_context 中使用"""
+    config = current_app.config
+    heartbeat = config['LIVE_HEARTBEAT']
+    deadline = time.monotonic() + config['LIVE_MAX_DURATION']
+    pubsub = current_app.redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(config['LIVE_CHANNEL'])
+    try:
+        # 断线后浏览器在 retry 毫秒后重连
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=heartbeat)
+            if message is None:
+                yield ': keepalive\n\n'
+            elif message['type'] == 'message':
+                yield f"data: {message['data']}\n\n"
+    finally:
+        pubsub.close()
@@ -0,0 +1,233 @@
+"""
+运行指标
+
+以 Prometheus 文本格式在 /metrics 输出：按端点的请求耗时直方图、每请求 SQL 条数与耗时（SQLAlchemy 引擎事件）、
+Redis 命令耗时、缓存命中计数，以及抓取时从 Redis 读取的缓冲写入积压/延迟与 RQ 队列积压。
+多进程部署（gunicorn）需把 PROMETHEUS_MULTIPROC_DIR 设为各 worker 共享的空目录，由 prometheus_client 跨进程汇总。
+
+PROFILE_ENABLED=1 时额外记录每个请求执行的 SQL，耗时超过 PROFILE_MIN_DURATION 秒的请求写入 Redis 有序集合，
+只保留最慢的 PROFILE_KEEP 条，见 /admin/slow-requests。关闭时不记录语句文本。
+"""
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from flask import Response, current_app, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+SQL_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 5)
+REDIS_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_LATENCY = Histogram('honeypot_request_duration_seconds', '请求处理耗时（流式响应为首字节耗时）',
+                            ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+REQUESTS = Counter('honeypot_requests_total', '请求数', ['endpoint', 'method', 'status'])
+REQUEST_SQL_QUERIES = Histogram('honeypot_request_sql_queries', '每个请求执行的 SQL 条数',
+                                ['endpoint'], buckets=QUERY_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('honeypot_request_sql_seconds', '每个请求的 SQL 总耗时',
+                                ['endpoint'], buckets=LATENCY_BUCKETS)
+SQL_SECONDS = Histogram('honeypot_sql_query_duration_seconds', '单条 SQL 耗时', buckets=SQL_BUCKETS)
+REDIS_SECONDS = Histogram('honeypot_redis_command_duration_seconds', 'Redis 命令耗时（pipeline 记为 PIPELINE）',
+                          ['command'], buckets=REDIS_BUCKETS)
+CACHE_LOOKUPS = Counter('honeypot_cache_lookups_total', '缓存查询次数', ['cache', 'result'])
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """单个请求的计时与 SQL 统计，保存在 g 上"""
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'queries')
+
+    def __init__(self, profile: bool):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.queries = [] if profile else None
+
+
+def cache_lookup(cache: str, result: str, count: int = 1) -> None:
+    if count:
+        CACHE_LOOKUPS.labels(cache, result).inc(count)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    SQL_SECONDS.observe(elapsed)
+    if not has_request_context():
+        return
+    stats = g.get('_request_stats')
+    if stats is None:
+        return
+    stats.sql_count += 1
+    stats.sql_seconds += elapsed
+    if stats.queries is not None and len(stats.queries) < current_app.config['PROFILE_MAX_QUERIES']:
+        stats.queries.append({'sql': statement[:1000], 'ms': round(elapsed * 1000, 3), 'many': executemany})
+
+
+def instrument_redis(client) -> None:
+    """为 Redis 客户端的单条命令与 pipeline 计时"""
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+    # 按命令缓存带标签的子指标，省去每次 labels() 的加锁查找
+    children = {}
+
+    def timed_execute_command(*args, **options):
+        started = time.perf_counter()
+        try:
+            return execute_command(*args, **options)
+        finally:
+            child = children.get(args[0])
+            if child is None:
+                child = children[args[0]] = REDIS_SECONDS.labels(args[0])
+            child.observe(time.perf_counter() - started)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def timed_execute(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return execute(*a, **kw)
+            finally:
+                REDIS_SECONDS.labels('PIPELINE').observe(time.perf_counter() - started)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_execute_command
+    client.pipeline = timed_pipeline
+
+
+def _start_request():
+    g._request_stats = RequestStats(current_app.config['PROFILE_ENABLED'])
+
+
+def _finish_request(response):
+    stats = g.pop('_request_stats', None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats.started
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(elapsed)
+    REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    REQUEST_SQL_QUERIES.labels(endpoint).observe(stats.sql_count)
+    REQUEST_SQL_SECONDS.labels(endpoint).observe(stats.sql_seconds)
+    if stats.queries is not None and elapsed >= current_app.config['PROFILE_MIN_DURATION']:
+        try:
+            record_slow_request(stats, elapsed, endpoint, response.status_code)
+        except Exception:
+            logger.exception('记录慢请求失败')
+    return response
+
+
+def record_slow_request(stats: RequestStats, elapsed: float, endpoint: str, status: int) -> None:
+    config = current_app.config
+    entry = {
+        'at': datetime.utcnow().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': endpoint,
+        'status': status,
+        'duration_ms': round(elapsed * 1000, 3),
+        'sql_count': stats.sql_count,
+        'sql_ms': round(stats.sql_seconds * 1000, 3),
+        'queries': stats.queries,
+    }
+    pipe = current_app.redis.pipeline(transaction=False)
+    pipe.zadd(config['PROFILE_KEY'], {json.dumps(entry, ensure_ascii=False): elapsed})
+    pipe.zremrangebyrank(config['PROFILE_KEY'], 0, -config['PROFILE_KEEP'] - 1)
+    pipe.execute()
+
+
+def slow_requests() -> list:
+    """最慢的请求，按耗时从高到低"""
+    raw = current_app.redis.zrevrange(current_app.config['PROFILE_KEY'], 0, -1)
+    return [json.loads(item) for item in raw]
+
+
+class BacklogCollector:
+    """抓取时读取缓冲写入 Stream 与 RQ 队列的积压"""
+
+    def collect(self):
+        from . import ingest, jobs
+
+        try:
+            backlog = ingest.stream_backlog()
+        except Exception:
+            logger.exception('读取缓冲写入积压失败')
+        else:
+            yield GaugeMetricFamily('honeypot_ingest_stream_length', '缓冲写入 Stream 中的条目数（含已确认、未裁剪的）',
+                                    value=backlog['length'])
+            yield GaugeMetricFamily('honeypot_ingest_pending', '已投递给 flusher 但尚未落库确认的条目数',
+                                    value=backlog['pending'])
+            yield GaugeMetricFamily('honeypot_ingest_lag_seconds', '最早一条尚未落库的条目已等待的秒数',
+                                    value=backlog['lag_seconds'])
+
+        try:
+            counts = jobs.queue_counts()
+        except Exception:
+            logger.exception('读取任务队列失败')
+            return
+        depth = GaugeMetricFamily('honeypot_job_queue_depth', '等待执行的后台任务数', labels=['queue'])
+        states = GaugeMetricFamily('honeypot_jobs', '各状态的后台任务数', labels=['queue', 'state'])
+        for name, queue in counts.items():
+            depth.add_metric([name], queue['queued'])
+            for state, count in queue['states'].items():
+                states.add_metric([name, state], count)
+        yield depth
+        yield states
+
+
+def _authorized() -> bool:
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        return True
+    supplied = request.headers.get('Authorization', '')
+    return hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view():
+    if not _authorized():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    backlog = CollectorRegistry()
+    backlog.register(BacklogCollector())
+    return Response(generate_latest(registry) + generate_latest(backlog), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_app(app) -> None:
+    if not app.config['METRICS_ENABLED']:
+        return
+    # 监听 Engine 类：覆盖所有引擎，重复 create_app 时不重复注册
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute)):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+    instrument_redis(app.redis)
+    instrument_redis(app.rq_redis)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -2,9 +2,13 @@ from datetime import datetime
 from typing import Optional
 
 from flask_login import UserMixin
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from .extensions import db
+from .iputil import pack_ip
+from .storage import decode_payload
 
 
 class User(db.Model, UserMixin):
@@ -26,39 +30,94 @@ class User(db.Model, UserMixin):
         return check_password_hash(self.password_hash, password)
 
 
+class SensorKey(db.Model):
+    """传感器独立签名密钥，请求通过 X-API-Key-Id 指定"""
+    __tablename__ = 'sensor_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key_id = db.Column(db.String(64), unique=True, nullable=False)
+    secret = db.Column(db.String(128), nullable=False)
+    description = db.Column(db.String(255))
+    enabled = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
 class AttackerProfile(db.Model):
     __tablename__ = 'attacker_profiles'
+    __table_args__ = (
+        # 攻击者列表按 (排序列, id) 键集分页
+        db.Index('ix_attacker_profiles_last_seen_id', 'last_seen', 'id'),
+        db.Index('ix_attacker_profiles_first_seen_id', 'first_seen', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    ip_address = db.Column(db.String(45), index=True, nullable=False)
+    ip_address = db.Column(db.String(45), index=True, unique=True, nullable=False)
     user_agent = db.Column(db.String(255))
-    asn = db.Column(db.String(32))
+    asn = db.Column(db.String(32), index=True)
     isp = db.Column(db.String(128))
-    country = db.Column(db.String(64))
+    country = db.Column(db.String(64), index=True)
     city = db.Column(db.String(64))
     tags = db.Column(db.JSON, nullable=True)
     first_seen = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     last_seen = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    # Relationship
-    attacks = db.relationship('AttackEvent', backref='attacker', lazy=True)
+    # Relationship（attack_events 为分区表，不声明外键）
+    attacks = db.relationship(
+        'AttackEvent', backref='attacker', lazy=True,
+        primaryjoin='AttackerProfile.id == foreign(AttackEvent.attacker_id)',
+    )
 
 
 class AttackEvent(db.Model):
     __tablename__ = 'attack_events'
+    __table_args__ = (
+        # 列表页键集分页 ORDER BY timestamp DESC, id DESC
+        db.Index('ix_attack_events_timestamp_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     ip_address = db.Column(db.String(45), index=True, nullable=False)
+    # 16 字节打包 IP，用于 CIDR 区间查询
+    ip_packed = db.Column(db.VARBINARY(16), index=True)
     method = db.Column(db.String(16))
     path = db.Column(db.String(255))
-    headers = db.Column(db.JSON)
-    payload = db.Column(db.JSON)
+    # 历史行与 EVENT_STORAGE=json 时使用；compact 模式下请求头存于 header_sets，大载荷压缩存于 payload_blob
+    headers = db.Column(db.JSON(none_as_null=True))
+    payload = db.Column(db.JSON(none_as_null=True))
+    headers_hash = db.Column(db.BINARY(20), index=True)
+    payload_blob = db.Column(db.LargeBinary().with_variant(mysql.MEDIUMBLOB(), 'mysql'))
     honeypot_service = db.Column(db.String(64))
     signature = db.Column(db.String(128))
     severity = db.Column(db.String(16))
-
-    attacker_id = db.Column(db.Integer, db.ForeignKey('attacker_profiles.id'))
+    # 折叠模式下窗口内的重复次数与最后一次出现时间
+    count = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+    last_timestamp = db.Column(db.DateTime)
+
+    # 分区表不支持外键：写入时由 ingest 校验档案仍存在，清理孤立档案时再次确认没有事件引用
+    attacker_id = db.Column(db.Integer, index=True)
+
+    # 分区表不支持外键，按 hash 关联；同一会话内相同 hash 只查询一次
+    header_set = db.relationship(
+        'HeaderSet', primaryjoin='foreign(AttackEvent.headers_hash) == HeaderSet.hash', viewonly=True,
+    )
+
+    @validates('ip_address')
+    def _pack_ip_address(self, key, value):
+        self.ip_packed = pack_ip(value)
+        return value
+
+    @property
+    def event_headers(self):
+        if self.headers_hash is not None:
+            return self.header_set.headers if self.header_set else {}
+        return self.headers if self.headers is not None else {}
+
+    @property
+    def event_payload(self):
+        if self.payload_blob is not None:
+            return decode_payload(self.payload_blob)
+        return self.payload
 
     def to_dict(self):
         return {
@@ -67,12 +126,45 @@ class AttackEvent(db.Model):
             'ip_address': self.ip_address,
             'method': self.method,
             'path': self.path,
-            'headers': self.headers,
-            'payload': self.payload,
+            'headers': self.event_headers,
+            'payload': self.event_payload,
             'honeypot_service': self.honeypot_service,
             'signature': self.signature,
             'severity': self.severity,
             'attacker_id': self.attacker_id,
+            'count': self.count,
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
         }
 
 
+class HeaderSet(db.Model):
+    """按内容去重的请求头集合，hash 为按键排序的 JSON 的 SHA-1；last_used 为最近一次被写入事件引用的时间"""
+    __tablename__ = 'header_sets'
+
+    hash = db.Column(db.BINARY(20), primary_key=True)
+    headers = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class RollupMixin:
+    """按时间桶与维度预聚合的攻击计数，空维度以 '' 存储"""
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    honeypot_service = db.Column(db.String(64), primary_key=True, default='')
+    severity = db.Column(db.String(16), primary_key=True, default='')
+    country = db.Column(db.String(64), primary_key=True, default='')
+    signature = db.Column(db.String(128), primary_key=True, default='')
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class AttackRollupMinute(RollupMixin, db.Model):
+    __tablename__ = 'attack_rollups_minute'
+
+
+class AttackRollupHour(RollupMixin, db.Model):
+    __tablename__ = 'attack_rollups_hour'
+
+
+class AttackRollupDay(RollupMixin, db.Model):
+    __tablename__ = 'attack_rollups_day'
@@ -0,0 +1,90 @@
+"""
+键集（seek）分页
+
+按 (排序列..., id) 定位下一页，避免 OFFSET 扫描与额外的 COUNT 查询。
+游标是最后一行排序键的 base64 编码 JSON。
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from .extensions import db
+
+
+@dataclass
+class Page:
+    items: list
+    per_page: int
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values) -> str:
+    data = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, columns):
+    """解析游标；格式不合法时返回 None（视为第一页）"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(data, list) or len(data) != len(columns):
+            return None
+        return [
+            datetime.fromisoformat(v) if isinstance(col.type, db.DateTime) and v is not None else v
+            for col, v in zip(columns, data)
+        ]
+    except (ValueError, TypeError):
+        return None
+
+
+def _seek(columns, values, descending: bool):
+    # (c1, c2) < (v1, v2) 展开为 c1 < v1 OR (c1 = v1 AND c2 < v2)，便于走复合索引
+    clauses = []
+    for i, (col, val) in enumerate(zip(columns, values)):
+        bound = col < val if descending else col > val
+        clauses.append(db.and_(*[c == v for c, v in zip(columns[:i], values[:i])], bound))
+    return db.or_(*clauses)
+
+
+def _key(row, columns):
+    return [getattr(row, col.key) for col in columns]
+
+
+def keyset_page(query, columns, per_page: int, after: str | None = None,
+                before: str | None = None, descending: bool = True) -> Page:
+    """columns 为排序键（最后一列须唯一，通常为 id）；after 向后翻页，before 向前翻页"""
+    after_key = decode_cursor(after, columns) if after else None
+    before_key = decode_cursor(before, columns) if before else None
+
+    backwards = before_key is not None and after_key is None
+    order_desc = descending != backwards
+    if backwards:
+        query = query.filter(_seek(columns, before_key, not descending))
+    elif after_key is not None:
+        query = query.filter(_seek(columns, after_key, descending))
+    query = query.order_by(*[col.desc() if order_desc else col.asc() for col in columns])
+
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    page = Page(items=rows, per_page=per_page)
+    if rows:
+        if more or backwards:
+            page.next_cursor = encode_cursor(_key(rows[-1], columns))
+        if after_key is not None or (backwards and more):
+            page.prev_cursor = encode_cursor(_key(rows[0], columns))
+    return page
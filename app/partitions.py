@@ -0,0 +1,136 @@
+"""
+attack_events 时间分区管理（仅 MySQL）
+
+表按 RANGE (TO_DAYS(timestamp)) 以月或天分区，末尾保留 MAXVALUE 分区 pfuture。
+ensure_future 提前从 pfuture 中切出未来分区；drop_expired 以 DROP PARTITION
+整块删除过期分区，只改元数据，不逐行删除。
+"""
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+from . import counters, rollups
+from .extensions import db
+from .models import AttackEvent
+
+
+TABLE = 'attack_events'
+FUTURE = 'pfuture'
+# MySQL TO_DAYS 与 Python date.toordinal 的差值
+TO_DAYS_OFFSET = 365
+
+
+def is_supported() -> bool:
+    return db.session.get_bind().dialect.name == 'mysql'
+
+
+def list_partitions() -> list:
+    """返回 [(分区名, 上界日期或 None)]，按顺序排列；未分区时为空"""
+    if not is_supported():
+        return []
+    rows = db.session.execute(db.text("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """), {'table': TABLE}).all()
+    return [
+        (name, None if desc == 'MAXVALUE' else date.fromordinal(int(desc) - TO_DAYS_OFFSET))
+        for name, desc in rows
+    ]
+
+
+def is_partitioned() -> bool:
+    return bool(list_partitions())
+
+
+def next_boundary(day: date, granularity: str) -> date:
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start: date, granularity: str) -> str:
+    return start.strftime('p%Y%m%d' if granularity == 'day' else 'p%Y%m')
+
+
+def partition_clause(start: date, end: date, granularity: str) -> str:
+    return f"PARTITION {partition_name(start, granularity)} VALUES LESS THAN (TO_DAYS('{end.isoformat()}'))"
+
+
+def partition_table() -> list:
+    """把新建的空 attack_events 改为从当前月（或天）开始的分区表（init-db 使用，与分区迁移结果一致），返回分区名"""
+    config = current_app.config
+    granularity = config['PARTITION_GRANULARITY']
+    start = datetime.utcnow().date()
+    if granularity != 'day':
+        start = start.replace(day=1)
+    end = datetime.utcnow().date()
+    for _ in range(config['PARTITION_AHEAD'] + 1):
+        end = next_boundary(end, granularity)
+
+    clauses, names = [], []
+    while start < end:
+        upper = next_boundary(start, granularity)
+        clauses.append(partition_clause(start, upper, granularity))
+        names.append(partition_name(start, granularity))
+        start = upper
+    # 分区表的主键需包含分区列
+    db.session.execute(db.text(f'ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)'))
+    db.session.execute(db.text(
+        f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(timestamp)) "
+        f"({', '.join(clauses)}, PARTITION {FUTURE} VALUES LESS THAN MAXVALUE)"
+    ))
+    return names
+
+
+def ensure_future(ahead: int | None = None) -> list:
+    """保证当前时间之后至少还有 ahead 个分区，返回新建的分区名"""
+    config = current_app.config
+    granularity = config['PARTITION_GRANULARITY']
+    ahead = config['PARTITION_AHEAD'] if ahead is None else ahead
+    bounded = [upper for _, upper in list_partitions() if upper is not None]
+    if not bounded:
+        return []
+
+    target = datetime.utcnow().date()
+    for _ in range(ahead + 1):
+        target = next_boundary(target, granularity)
+
+    clauses, names = [], []
+    start = max(bounded)
+    while start < target:
+        end = next_boundary(start, granularity)
+        clauses.append(partition_clause(start, end, granularity))
+        names.append(partition_name(start, granularity))
+        start = end
+    if clauses:
+        # pfuture 为空时 REORGANIZE 只改元数据
+        db.session.execute(db.text(
+            f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE} INTO "
+            f"({', '.join(clauses)}, PARTITION {FUTURE} VALUES LESS THAN MAXVALUE)"
+        ))
+    return names
+
+
+def drop_expired(cutoff: datetime, dry_run: bool = False) -> dict:
+    """删除上界不晚于 cutoff 的整块分区，返回 {分区名: 攻击次数}"""
+    bounded = [(name, upper) for name, upper in list_partitions() if upper is not None]
+    # 至少保留最后一个有界分区作为 ensure_future 的起点
+    expired = [name for name, upper in bounded[:-1] if upper <= cutoff.date()]
+
+    dropped = {}
+    for name in expired:
+        dropped[name] = int(db.session.execute(
+            db.text(f'SELECT COALESCE(SUM(count), 0) FROM {TABLE} PARTITION ({name})')
+        ).scalar())
+    if expired and not dry_run:
+        # 过期分区是表头部连续的若干分区：先按时间范围统计其中事件的汇总键，DROP 成功后再扣减小时/天级汇总。
+        # DROP PARTITION 失败时汇总不变，下次清理重新统计
+        upper = dict(bounded)[expired[-1]]
+        counts = rollups.event_counts(AttackEvent.timestamp < upper)
+        db.session.execute(db.text(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(expired)}"))
+        rollups.subtract(counts)
+        db.session.commit()
+        counters.incr(total_attacks=-sum(dropped.values()))
+    return dropped
@@ -0,0 +1,179 @@
+"""
+传感器协议
+
+签名计算与时间戳检查、上报事件的解析与规范化、缓冲写入 Stream 的条目编码，以及相关 Redis 键名。
+不依赖 Flask 与数据库，由 API 蓝图、flusher 与独立采集服务（app.capture_service）共用。
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import time
+from datetime import datetime, timezone
+
+from .iputil import pack_ip
+
+
+# 与 AttackEvent / AttackerProfile 的列长度一致：超长值在入队前截断，避免 MySQL 严格模式拒绝整批写入
+MAX_LENGTHS = {
+    'ip_address': 45,
+    'method': 16,
+    'path': 255,
+    'honeypot_service': 64,
+    'signature': 128,
+    'severity': 16,
+    'user_agent': 255,
+}
+
+
+def clip(name: str, value):
+    """转为字符串并截断到 name 列的长度；None 保持不变"""
+    if value is None:
+        return None
+    return str(value)[:MAX_LENGTHS[name]]
+
+
+def user_agent(headers) -> str | None:
+    value = (headers or {}).get('User-Agent')
+    return clip('user_agent', value) if value else None
+
+
+def compute_signature(secret: bytes, timestamp: str, body) -> str:
+    """body 可为 bytes / bytearray / memoryview"""
+    mac = hmac.new(secret, timestamp.encode(), hashlib.sha256)
+    mac.update(body)
+    return mac.hexdigest()
+
+
+def check_timestamp(headers, window: int):
+    """返回 (错误原因, 时间戳, 已过秒数)；通过时错误原因为 None"""
+    signature = headers.get('X-API-Signature')
+    timestamp = headers.get('X-API-Timestamp')
+    if not signature or not timestamp:
+        return 'Missing signature', None, None
+    try:
+        age = time.time() - int(timestamp)
+    except ValueError:
+        return 'Invalid timestamp', None, None
+    if abs(age) > window:
+        return 'Expired timestamp', None, None
+    return None, timestamp, age
+
+
+def signature_matches(secret: bytes, timestamp: str, body, signature: str) -> bool:
+    expected = compute_signature(secret, timestamp, body)
+    return hmac.compare_digest(signature.encode(), expected.encode())
+
+
+def nonce_key(prefix: str, key_id: str | None, signature: str) -> str:
+    return f"{prefix}:{key_id or '-'}:{signature}"
+
+
+def nonce_ttl(window: int, age: float) -> int:
+    """nonce 保留到该时间戳失效为止"""
+    return max(int(window - age) + 1, 1)
+
+
+def ingest_id_key(stream: str, ingest_id: str) -> str:
+    return f'{stream}:id:{ingest_id}'
+
+
+def normalize_event(ip_address: str, method: str, path: str, headers: dict, payload, timestamp=None) -> dict:
+    """将一次捕获整理为 AttackEvent 的列值；非对象的 JSON 载荷（如数组）视为空"""
+    payload = payload if isinstance(payload, dict) else {}
+    return {
+        'timestamp': timestamp or datetime.utcnow(),
+        'ip_address': clip('ip_address', ip_address),
+        'ip_packed': pack_ip(ip_address),
+        'method': clip('method', method),
+        'path': clip('path', path),
+        'headers': headers,
+        'payload': payload,
+        'honeypot_service': clip('honeypot_service', payload.get('service') or 'web'),
+        'signature': clip('signature', payload.get('signature')),
+        'severity': clip('severity', payload.get('severity') or 'low'),
+    }
+
+
+def parse_bulk_body(body: bytes, content_type: str | None) -> list:
+    """解析 NDJSON 或 JSON 数组，返回原始条目列表；无法解析的行保留为 ValueError"""
+    if content_type and 'ndjson' in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(e)
+        return items
+    data = json.loads(body)
+    if not isinstance(data, list):
+        raise ValueError('body must be a JSON array')
+    return data
+
+
+def parse_event_timestamp(value):
+    """返回不带时区的 UTC 时间：Unix 时间戳或 ISO 字符串，带时区偏移（含 Z）时先换算为 UTC"""
+    if value is None:
+        return datetime.utcnow()
+    # bool 是 int 的子类，不能当作时间戳
+    if isinstance(value, bool):
+        raise ValueError('timestamp must be a number or an ISO string')
+    if isinstance(value, (int, float)):
+        parsed = datetime.utcfromtimestamp(value)
+    else:
+        text = str(value)
+        if text[-1:] in ('Z', 'z'):
+            text = text[:-1] + '+00:00'
+        parsed = datetime.fromisoformat(text)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    # MySQL DATETIME 的取值范围
+    if not 1000 <= parsed.year <= 9999:
+        raise ValueError('timestamp out of range')
+    return parsed
+
+
+def normalize_bulk_item(item) -> dict:
+    """校验传感器上报的单条事件并规范化，非法时抛出 ValueError"""
+    if isinstance(item, ValueError):
+        raise ValueError(f'invalid JSON: {item}')
+    if not isinstance(item, dict):
+        raise ValueError('item must be an object')
+    ip_address = item.get('ip_address') or item.get('ip')
+    try:
+        ipaddress.ip_address(ip_address)
+    except (TypeError, ValueError):
+        raise ValueError('invalid ip_address')
+    headers = item.get('headers') or {}
+    payload = item.get('payload') or {}
+    if not isinstance(headers, dict) or not isinstance(payload, dict):
+        raise ValueError('headers and payload must be objects')
+    try:
+        timestamp = parse_event_timestamp(item.get('timestamp'))
+    except (OverflowError, OSError, ValueError):
+        raise ValueError('invalid timestamp')
+    return normalize_event(
+        ip_address,
+        item.get('method') or 'GET',
+        item.get('path') or '/',
+        headers,
+        payload,
+        timestamp=timestamp,
+    )
+
+
+def encode_event(event: dict) -> str:
+    data = dict(event)
+    data['timestamp'] = event['timestamp'].isoformat()
+    # 二进制列不入队，出队时由 ip_address 重新计算
+    data.pop('ip_packed', None)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_event(raw: str) -> dict:
+    event = json.loads(raw)
+    event['timestamp'] = datetime.fromisoformat(event['timestamp'])
+    event['ip_packed'] = pack_ip(event['ip_address'])
+    return event
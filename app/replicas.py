@@ -0,0 +1,135 @@
+"""
+只读副本
+
+DB_REPLICA_URLS 配置一个或多个只读副本（逗号分隔的 SQLAlchemy URL），注册为 SQLALCHEMY_BINDS 中的 replica_0、replica_1 ……。
+在 read_only 装饰的后台视图与报告任务中，会话把 SELECT 路由到一个健康副本（同一作用域内固定为同一个）；
+写语句、flush 以及 read_only 之外的所有查询（采集、设置、登录）仍走主库。
+副本的复制延迟每 REPLICA_CHECK_INTERVAL 秒检查一次（MySQL 读取 SHOW REPLICA STATUS，需 REPLICATION CLIENT 权限），
+延迟超过 REPLICA_MAX_LAG 秒、复制中断或无法连接的副本暂不使用；没有可用副本时回退主库。
+"""
+import contextvars
+import functools
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.elements import TextClause
+
+
+BIND_PREFIX = 'replica_'
+READ_PREFIXES = ('SELECT', 'SHOW')
+
+# read_only 作用域：None 表示不在作用域内，否则为 {'bind': 已选定的副本名}
+_scope = contextvars.ContextVar('replica_scope', default=None)
+
+logger = logging.getLogger(__name__)
+
+
+def binds(config) -> dict:
+    urls = [url.strip() for url in config['DB_REPLICA_URLS'].split(',') if url.strip()]
+    return {f'{BIND_PREFIX}{index}': url for index, url in enumerate(urls)}
+
+
+@contextmanager
+def use_replica():
+    token = _scope.set({'bind': None})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def read_only(func):
+    """被装饰的视图或任务中的查询可以读副本"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def replica_lag(engine):
+    """复制延迟秒数，复制中断时返回 None；非 MySQL（如用两个 SQLite 文件测试）视为没有延迟"""
+    if engine.dialect.name != 'mysql':
+        return 0.0
+    with engine.connect() as conn:
+        # MySQL 8.0.22 起为 REPLICA 语法，旧版本只支持 SLAVE
+        for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                                  ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+            try:
+                row = conn.execute(text(statement)).mappings().first()
+            except DBAPIError:
+                conn.rollback()
+                continue
+            if row is None:
+                # 未配置复制（如云数据库的只读节点由平台保证），视为没有延迟
+                return 0.0
+            return None if row[column] is None else float(row[column])
+    return None
+
+
+def _check(name: str, engine) -> dict:
+    max_lag = current_app.config['REPLICA_MAX_LAG']
+    try:
+        lag = replica_lag(engine)
+    except Exception as e:
+        logger.warning('副本 %s 不可用，回退主库: %s', name, e)
+        return {'ok': False, 'lag': None, 'error': type(e).__name__, 'checked': time.monotonic()}
+    ok = lag is not None and lag <= max_lag
+    if lag is None:
+        logger.warning('副本 %s 复制中断，回退主库', name)
+    elif not ok:
+        logger.warning('副本 %s 延迟 %s 秒（上限 %s），回退主库', name, lag, max_lag)
+    return {'ok': ok, 'lag': lag, 'checked': time.monotonic()}
+
+
+def _states(engines) -> dict:
+    """各副本的检查结果，超过 REPLICA_CHECK_INTERVAL 秒的重新检查"""
+    states = current_app.extensions.setdefault('replica_states', {})
+    interval = current_app.config['REPLICA_CHECK_INTERVAL']
+    now = time.monotonic()
+    for name, engine in engines.items():
+        if not (isinstance(name, str) and name.startswith(BIND_PREFIX)):
+            continue
+        state = states.get(name)
+        if state is None or now - state['checked'] >= interval:
+            states[name] = _check(name, engine)
+    return states
+
+
+def healthy(engines) -> list:
+    return [name for name, state in _states(engines).items() if state['ok']]
+
+
+def status() -> dict:
+    """供就绪检查展示：副本名 -> {ok, lag}"""
+    from .extensions import db
+
+    return {name: {'ok': state['ok'], 'lag': state['lag']} for name, state in _states(db.engines).items()}
+
+
+def _is_read(clause) -> bool:
+    if getattr(clause, 'is_select', False):
+        return True
+    return isinstance(clause, TextClause) and clause.text.lstrip().upper().startswith(READ_PREFIXES)
+
+
+class RoutingSession(Session):
+    """read_only 作用域内的读语句路由到副本，其余沿用 Flask-SQLAlchemy 的选择"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        scope = _scope.get()
+        if bind is None and scope is not None and not self._flushing and _is_read(clause):
+            engines = self._db.engines
+            if scope['bind'] is None:
+                names = healthy(engines)
+                # 没有可用副本时记为主库，本作用域内不再重复检查
+                scope['bind'] = random.choice(names) if names else False
+            if scope['bind']:
+                return engines[scope['bind']]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
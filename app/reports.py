@@ -0,0 +1,150 @@
+"""
+报告生成
+
+所有查询都使用半开时间区间 [start, end)，可命中 timestamp/first_seen 索引并裁剪分区。
+服务、严重级别、国家、签名四个维度在一次 GROUP BY 中得到：范围按小时对齐且汇总表已覆盖时
+读取汇总表，否则扫描原始事件。Top IP 需要原始事件，单独按区间聚合。
+"""
+import csv
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+
+from . import rollups
+from .extensions import db
+from .models import AttackEvent, AttackerProfile, AttackRollupHour, AttackRollupDay
+
+
+FORMATS = ('json', 'csv', 'html')
+SECTIONS = ('services', 'severities', 'countries', 'signatures', 'top_ips')
+
+
+def period_range(period: str, now: datetime | None = None):
+    """daily: 昨天整天；weekly: 截至今天零点的 7 天"""
+    today = rollups.truncate(now or datetime.utcnow(), 'day')
+    if period == 'daily':
+        return today - timedelta(days=1), today
+    if period == 'weekly':
+        return today - timedelta(days=7), today
+    raise ValueError(f'unknown period: {period}')
+
+
+def _rollup_model(start: datetime, end: datetime):
+    """返回可覆盖 [start, end) 的汇总表；未对齐或尚未回填时返回 None"""
+    for model, granularity in ((AttackRollupDay, 'day'), (AttackRollupHour, 'hour')):
+        if rollups.truncate(start, granularity) == start and rollups.truncate(end, granularity) == end:
+            earliest = db.session.query(db.func.min(model.bucket)).scalar()
+            if earliest is not None and earliest <= start:
+                return model
+    return None
+
+
+def _dimension_counts(start: datetime, end: datetime):
+    """一次分组查询得到 (服务, 严重级别, 国家, 签名) 组合计数，返回 (行, 数据来源)"""
+    model = _rollup_model(start, end)
+    if model is not None:
+        rollups.ensure_fresh()
+        rows = (
+            db.session.query(model.honeypot_service, model.severity, model.country, model.signature,
+                             db.func.sum(model.count))
+            .filter(model.bucket >= start, model.bucket < end)
+            .group_by(model.honeypot_service, model.severity, model.country, model.signature)
+            .all()
+        )
+        return rows, 'rollup'
+    rows = (
+        db.session.query(AttackEvent.honeypot_service, AttackEvent.severity, AttackerProfile.country,
+                         AttackEvent.signature, db.func.sum(AttackEvent.count))
+        .outerjoin(AttackerProfile, AttackerProfile.id == AttackEvent.attacker_id)
+        .filter(AttackEvent.timestamp >= start, AttackEvent.timestamp < end)
+        .group_by(AttackEvent.honeypot_service, AttackEvent.severity, AttackerProfile.country,
+                  AttackEvent.signature)
+        .all()
+    )
+    return rows, 'events'
+
+
+def build_report(start: datetime, end: datetime, top_n: int = 10) -> dict:
+    rows, source = _dimension_counts(start, end)
+    dims = {name: Counter() for name in ('services', 'severities', 'countries', 'signatures')}
+    total = 0
+    for service, severity, country, signature, count in rows:
+        count = int(count)
+        total += count
+        dims['services'][service or 'unknown'] += count
+        dims['severities'][severity or 'unknown'] += count
+        dims['countries'][country or 'Unknown'] += count
+        if signature:
+            dims['signatures'][signature] += count
+
+    count_col = db.func.sum(AttackEvent.count)
+    top_ips = (
+        db.session.query(AttackEvent.ip_address, count_col)
+        .filter(AttackEvent.timestamp >= start, AttackEvent.timestamp < end)
+        .group_by(AttackEvent.ip_address)
+        .order_by(count_col.desc())
+        .limit(top_n)
+        .all()
+    )
+    new_attackers = (
+        db.session.query(db.func.count(AttackerProfile.id))
+        .filter(AttackerProfile.first_seen >= start, AttackerProfile.first_seen < end)
+        .scalar()
+    )
+
+    report = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'generated_at': datetime.utcnow().isoformat(),
+        'source': source,
+        'total_events': total,
+        'new_attackers': int(new_attackers or 0),
+        'top_ips': [[ip, int(count)] for ip, count in top_ips],
+    }
+    for name, counter in dims.items():
+        items = counter.most_common(top_n if name == 'signatures' else None)
+        report[name] = [[key, count] for key, count in items]
+    return report
+
+
+def write_report(report: dict, formats=FORMATS, out_dir: str | None = None) -> list:
+    """写出报告文件，返回文件路径列表"""
+    out_dir = out_dir or current_app.config['REPORT_DIR']
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, 'report-{}-{}'.format(
+        report['start'][:10], report['end'][:10]))
+    paths = []
+    for fmt in formats:
+        path = f'{stem}.{fmt}'
+        if fmt == 'json':
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        elif fmt == 'csv':
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['section', 'key', 'count'])
+                writer.writerow(['summary', 'total_events', report['total_events']])
+                writer.writerow(['summary', 'new_attackers', report['new_attackers']])
+                for section in SECTIONS:
+                    for key, count in report[section]:
+                        writer.writerow([section, key, count])
+        elif fmt == 'html':
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(render_template('report.html', report=report, sections=SECTIONS))
+        else:
+            raise ValueError(f'unknown format: {fmt}')
+        paths.append(path)
+    return paths
+
+
+def generate(period: str = 'daily', start: datetime | None = None, end: datetime | None = None,
+             formats=FORMATS, out_dir: str | None = None, top_n: int = 10) -> dict:
+    if start is None or end is None:
+        start, end = period_range(period)
+    report = build_report(start, end, top_n=top_n)
+    report['files'] = write_report(report, formats, out_dir)
+    return report
+
@@ -0,0 +1,183 @@
+"""
+数据保留引擎
+
+按主键区间分块执行集合式 DELETE：每块单独提交、块间限速、进度写入 Redis 检查点，
+中断后可从检查点继续；dry_run 只统计不删除。
+孤立攻击者档案与不再被引用的请求头集合用 LEFT JOIN 反连接分批找出后按主键删除。
+保留策略可按服务配置（RETENTION_POLICIES，如 "ssh:7,web:90"），其余服务使用默认天数。
+attack_events 已分区时，先整块删除所有策略下均已过期的分区。
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from . import attacker_cache, counters, partitions, rollups, touches, view_cache
+from .extensions import db
+from .models import AttackEvent, AttackerProfile, AttackRollupMinute, HeaderSet
+
+
+DEFAULT_POLICY = '*'
+
+
+def parse_policies(value: str | None) -> dict:
+    """"ssh:7,web:90" -> {'ssh': 7, 'web': 90}"""
+    policies = {}
+    for item in (value or '').split(','):
+        if ':' in item:
+            service, days = item.rsplit(':', 1)
+            policies[service.strip()] = int(days)
+    return policies
+
+
+def _checkpoint_key(policy: str) -> str:
+    return f"{current_app.config['RETENTION_CHECKPOINT_KEY']}:{policy}"
+
+
+def _policy_filter(policy: str, policies: dict):
+    if policy == DEFAULT_POLICY:
+        others = [s for s in policies if s != DEFAULT_POLICY]
+        if not others:
+            return db.true()
+        return db.or_(AttackEvent.honeypot_service.notin_(others), AttackEvent.honeypot_service.is_(None))
+    return AttackEvent.honeypot_service == policy
+
+
+def purge_events(cutoff: datetime, condition, policy: str, dry_run: bool = False) -> int:
+    """删除 timestamp < cutoff 且满足 condition 的事件，返回删除（或将删除）的攻击次数"""
+    config = current_app.config
+    chunk_size = config['RETENTION_CHUNK_SIZE']
+    pause = config['RETENTION_PAUSE']
+    table = AttackEvent.__table__
+    expired = db.and_(table.c.timestamp < cutoff, condition)
+
+    upper = db.session.query(db.func.max(AttackEvent.id)).filter(AttackEvent.timestamp < cutoff).scalar()
+    if upper is None:
+        return 0
+    checkpoint = None if dry_run else current_app.redis.get(_checkpoint_key(policy))
+    lower = int(checkpoint) if checkpoint else db.session.query(db.func.min(AttackEvent.id)).scalar()
+
+    total = 0
+    for start in range(lower, upper + 1, chunk_size):
+        in_chunk = db.and_(table.c.id >= start, table.c.id < start + chunk_size, expired)
+        if dry_run:
+            # 折叠行代表 count 次攻击，按次数统计
+            total += int(db.session.execute(
+                db.select(db.func.coalesce(db.func.sum(table.c.count), 0)).where(in_chunk)
+            ).scalar())
+            continue
+        # 小时/天级汇总长期保留，与事件在同一事务内扣减，仪表盘与导出的总数和分项保持一致
+        counts = rollups.event_counts(in_chunk)
+        hits = sum(counts.values())
+        rollups.subtract(counts)
+        deleted = db.session.execute(table.delete().where(in_chunk)).rowcount
+        db.session.commit()
+        current_app.redis.set(_checkpoint_key(policy), start + chunk_size)
+        if deleted:
+            counters.incr(total_attacks=-hits)
+            total += hits
+            time.sleep(pause)
+    if not dry_run:
+        current_app.redis.delete(_checkpoint_key(policy))
+    return total
+
+
+def purge_orphan_profiles(cutoff: datetime, dry_run: bool = False) -> int:
+    """删除 last_seen < cutoff 且已无任何事件的攻击者档案"""
+    config = current_app.config
+    orphans = (
+        db.select(AttackerProfile.id, AttackerProfile.ip_address)
+        .outerjoin(AttackEvent, AttackEvent.attacker_id == AttackerProfile.id)
+        .where(AttackEvent.id.is_(None), AttackerProfile.last_seen < cutoff)
+    )
+    if dry_run:
+        return db.session.execute(db.select(db.func.count()).select_from(orphans.subquery())).scalar()
+
+    total = 0
+    while True:
+        rows = db.session.execute(orphans.limit(config['RETENTION_CHUNK_SIZE'])).all()
+        if not rows:
+            break
+        # attacker_id 没有外键：删除时再次确认条件，跳过期间新写入了事件的档案
+        table = AttackerProfile.__table__
+        referenced = db.select(AttackEvent.id).where(AttackEvent.attacker_id == table.c.id).exists()
+        deleted = db.session.execute(
+            table.delete().where(table.c.id.in_([r.id for r in rows]), table.c.last_seen < cutoff, ~referenced)
+        ).rowcount
+        db.session.commit()
+        attacker_cache.invalidate(*[r.ip_address for r in rows])
+        counters.incr(unique_attackers=-deleted)
+        total += deleted
+        time.sleep(config['RETENTION_PAUSE'])
+    return total
+
+
+def purge_orphan_header_sets(cutoff: datetime, dry_run: bool = False) -> int:
+    """删除 cutoff 之后未再被使用且已无事件引用的请求头集合"""
+    config = current_app.config
+    orphans = (
+        db.select(HeaderSet.hash)
+        .outerjoin(AttackEvent, AttackEvent.headers_hash == HeaderSet.hash)
+        .where(AttackEvent.id.is_(None), HeaderSet.last_used < cutoff)
+    )
+    if dry_run:
+        return db.session.execute(db.select(db.func.count()).select_from(orphans.subquery())).scalar()
+
+    total = 0
+    while True:
+        hashes = db.session.execute(orphans.limit(config['RETENTION_CHUNK_SIZE'])).scalars().all()
+        if not hashes:
+            break
+        # 写入方会刷新 last_used：删除时再次确认条件，跳过期间被新事件引用的集合
+        table = HeaderSet.__table__
+        referenced = db.select(AttackEvent.id).where(AttackEvent.headers_hash == table.c.hash).exists()
+        deleted = db.session.execute(
+            table.delete().where(table.c.hash.in_(hashes), table.c.last_used < cutoff, ~referenced)
+        ).rowcount
+        db.session.commit()
+        total += deleted
+        time.sleep(config['RETENTION_PAUSE'])
+    return total
+
+
+def purge_minute_rollups(now: datetime, dry_run: bool = False) -> int:
+    """分钟级汇总只保留 ROLLUP_MINUTE_RETENTION_DAYS 天；小时/天级汇总长期保留，随事件删除扣减"""
+    cutoff = now - timedelta(days=current_app.config['ROLLUP_MINUTE_RETENTION_DAYS'])
+    query = AttackRollupMinute.query.filter(AttackRollupMinute.bucket < cutoff)
+    if dry_run:
+        return query.count()
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def run(default_days: int | None = None, dry_run: bool = False) -> dict:
+    """按全部保留策略执行一次清理，返回各部分的行数"""
+    config = current_app.config
+    policies = parse_policies(config['RETENTION_POLICIES'])
+    policies[DEFAULT_POLICY] = default_days if default_days is not None else config['RETENTION_DAYS']
+    now = datetime.utcnow()
+
+    # 先写回 Redis 中积压的 last_seen，避免活跃档案被误判为过期
+    if not dry_run:
+        touches.flush_touches()
+
+    result = {'partitions': {}, 'events': {}, 'profiles': 0, 'header_sets': 0, 'minute_rollups': 0}
+    # 分区表：所有策略都已过期的整月/整天直接 DROP PARTITION，其余再逐块删除
+    if partitions.is_partitioned():
+        oldest_cutoff = now - timedelta(days=max(policies.values()))
+        result['partitions'] = partitions.drop_expired(oldest_cutoff, dry_run)
+
+    for policy, days in policies.items():
+        cutoff = now - timedelta(days=days)
+        result['events'][policy] = purge_events(cutoff, _policy_filter(policy, policies), policy, dry_run)
+
+    profile_cutoff = now - timedelta(days=min(policies.values()))
+    result['profiles'] = purge_orphan_profiles(profile_cutoff, dry_run)
+    result['header_sets'] = purge_orphan_header_sets(profile_cutoff, dry_run)
+    result['minute_rollups'] = purge_minute_rollups(now, dry_run)
+    if not dry_run:
+        rollups.prune_empty(now - timedelta(days=min(policies.values())))
+        db.session.commit()
+        view_cache.tick()
+    return result
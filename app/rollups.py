@@ -0,0 +1,266 @@
+"""
+预聚合统计
+
+按 (时间桶, 服务, 严重级别, 国家, 签名) 维护分钟/小时/天三级计数表。
+采集路径在 Redis 中按分钟桶 HINCRBY，flush_rollups 周期性把增量合并进三张表；
+backfill 从历史事件重建。仪表盘、地图、统计与导出只读这些表。
+"""
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import view_cache
+from .extensions import db
+from .models import AttackEvent, AttackerProfile, AttackRollupMinute, AttackRollupHour, AttackRollupDay
+
+
+DIMENSIONS = ('honeypot_service', 'severity', 'country', 'signature')
+SEP = '\x1f'
+
+
+def _keys():
+    prefix = current_app.config['ROLLUP_KEY']
+    return f'{prefix}:pending', f'{prefix}:flushed_at'
+
+
+def truncate(dt: datetime, granularity: str) -> datetime:
+    if granularity == 'minute':
+        return dt.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+TABLES = {
+    'minute': AttackRollupMinute,
+    'hour': AttackRollupHour,
+    'day': AttackRollupDay,
+}
+
+
+def record_events(events, countries: dict) -> None:
+    """把一批已落库事件按分钟桶累加到 Redis；countries: ip -> country"""
+    counts = Counter()
+    for event in events:
+        counts[SEP.join((
+            truncate(event['timestamp'], 'minute').isoformat(),
+            event.get('honeypot_service') or '',
+            event.get('severity') or '',
+            countries.get(event['ip_address']) or '',
+            event.get('signature') or '',
+        ))] += 1
+    if not counts:
+        return
+    pending_key, _ = _keys()
+    pipe = current_app.redis.pipeline(transaction=False)
+    for field, n in counts.items():
+        pipe.hincrby(pending_key, field, n)
+    pipe.execute()
+
+
+def upsert_counts(model, rows) -> None:
+    """rows 中的 count 累加到已有行上（不存在则插入）。
+    以 executemany 执行：语句只编译一次，由驱动合并为多行写入"""
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count)
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key.columns],
+            set_={'count': table.c.count + stmt.excluded.count},
+        )
+    else:
+        raise NotImplementedError(f'rollup upsert is not supported on {dialect}')
+    db.session.execute(stmt, rows)
+
+
+def _merge(counts: Counter) -> None:
+    """counts: (minute_bucket, *dimensions) -> n，合并进三级汇总表"""
+    for granularity, model in TABLES.items():
+        merged = Counter()
+        for (bucket, *dims), n in counts.items():
+            merged[(truncate(bucket, granularity), *dims)] += n
+        rows = [dict(zip(('bucket',) + DIMENSIONS, key), count=n) for key, n in merged.items()]
+        for start in range(0, len(rows), 1000):
+            upsert_counts(model, rows[start:start + 1000])
+
+
+def flush_rollups() -> int:
+    """取出 Redis 中的待合并增量写入汇总表，返回合并的键数"""
+    pending_key, flushed_key = _keys()
+    pipe = current_app.redis.pipeline(transaction=True)
+    pipe.hgetall(pending_key)
+    pipe.delete(pending_key)
+    pipe.set(flushed_key, time.time())
+    pending, *_ = pipe.execute()
+    if not pending:
+        return 0
+
+    counts = Counter()
+    for field, n in pending.items():
+        bucket, *dims = field.split(SEP)
+        counts[(datetime.fromisoformat(bucket), *dims)] += int(n)
+    try:
+        _merge(counts)
+        db.session.commit()
+        view_cache.tick()
+    except Exception:
+        db.session.rollback()
+        # 合并失败时放回 Redis，等待下次刷新
+        pipe = current_app.redis.pipeline(transaction=False)
+        for field, n in pending.items():
+            pipe.hincrby(pending_key, field, int(n))
+        pipe.execute()
+        raise
+    return len(counts)
+
+
+def flush_if_older_than(seconds: float) -> int:
+    _, flushed_key = _keys()
+    if time.time() - float(current_app.redis.get(flushed_key) or 0) < seconds:
+        return 0
+    return flush_rollups()
+
+
+def ensure_fresh() -> int:
+    """读取汇总表前调用：增量滞后超过 ROLLUP_MAX_STALENESS 时先合并"""
+    return flush_if_older_than(current_app.config['ROLLUP_MAX_STALENESS'])
+
+
+def _minute_expr(column):
+    if db.session.get_bind().dialect.name == 'mysql':
+        return db.func.date_format(column, '%Y-%m-%d %H:%i:00')
+    return db.func.strftime('%Y-%m-%d %H:%M:00', column)
+
+
+def event_counts(*criteria) -> Counter:
+    """按 (分钟桶, *维度) 统计满足条件的事件次数，与汇总表的键一致；折叠行的全部次数计入其首次出现的分钟"""
+    minute = _minute_expr(AttackEvent.timestamp).label('minute')
+    rows = (
+        db.session.query(
+            minute,
+            db.func.coalesce(AttackEvent.honeypot_service, ''),
+            db.func.coalesce(AttackEvent.severity, ''),
+            db.func.coalesce(AttackerProfile.country, ''),
+            db.func.coalesce(AttackEvent.signature, ''),
+            db.func.sum(AttackEvent.count),
+        )
+        .outerjoin(AttackerProfile, AttackerProfile.id == AttackEvent.attacker_id)
+        .filter(*criteria)
+        .group_by(minute, AttackEvent.honeypot_service, AttackEvent.severity,
+                  AttackerProfile.country, AttackEvent.signature)
+        .all()
+    )
+    counts = Counter()
+    for bucket, *dims, n in rows:
+        counts[(datetime.fromisoformat(str(bucket)), *dims)] += int(n)
+    return counts
+
+
+def subtract(counts: Counter) -> None:
+    """从三级汇总表中扣减 counts（删除事件时调用，调用方负责提交）。
+    只更新已有行且不低于 0：分钟级汇总可能已先于事件被清理"""
+    keys = ('b_bucket',) + tuple(f'b_{name}' for name in DIMENSIONS)
+    for granularity, model in TABLES.items():
+        merged = Counter()
+        for (bucket, *dims), n in counts.items():
+            merged[(truncate(bucket, granularity), *dims)] += n
+        if not merged:
+            continue
+        table = model.__table__
+        amount = db.bindparam('b_count')
+        stmt = (
+            table.update()
+            .where(*[table.c[column] == db.bindparam(key) for column, key in zip(('bucket',) + DIMENSIONS, keys)])
+            .values(count=db.case((table.c.count > amount, table.c.count - amount), else_=0))
+        )
+        db.session.execute(stmt, [dict(zip(keys, key), b_count=n) for key, n in merged.items()])
+
+
+def prune_empty(before: datetime) -> int:
+    """删除 before 之前计数已减到 0 的汇总行"""
+    deleted = 0
+    for model in TABLES.values():
+        deleted += model.query.filter(model.bucket < before, model.count <= 0).delete(synchronize_session=False)
+    return deleted
+
+
+def backfill(start: datetime | None = None, end: datetime | None = None) -> int:
+    """按天从 attack_events 重建 [start, end) 范围内的汇总表，返回处理的天数。
+    折叠行的全部次数计入其首次出现的分钟"""
+    flush_rollups()
+    if start is None:
+        start = db.session.query(db.func.min(AttackEvent.timestamp)).scalar()
+        if start is None:
+            return 0
+    start = truncate(start, 'day')
+    end = truncate(end, 'day') if end is not None else truncate(datetime.utcnow(), 'day') + timedelta(days=1)
+
+    days = 0
+    day = start
+    while day < end:
+        next_day = day + timedelta(days=1)
+        counts = event_counts(AttackEvent.timestamp >= day, AttackEvent.timestamp < next_day)
+        for model in TABLES.values():
+            db.session.query(model).filter(model.bucket >= day, model.bucket < next_day).delete(
+                synchronize_session=False
+            )
+        _merge(counts)
+        db.session.commit()
+        days += 1
+        day = next_day
+    return days
+
+
+def reattribute(countries: dict, since: datetime) -> int:
+    """把 since 之后、按空国家计入的事件移到 ip -> 新国家 下（调用方负责提交），返回处理的分组数"""
+    minute = _minute_expr(AttackEvent.timestamp).label('minute')
+    rows = (
+        db.session.query(
+            minute,
+            AttackEvent.ip_address,
+            db.func.coalesce(AttackEvent.honeypot_service, ''),
+            db.func.coalesce(AttackEvent.severity, ''),
+            db.func.coalesce(AttackEvent.signature, ''),
+            db.func.sum(AttackEvent.count),
+        )
+        .filter(AttackEvent.ip_address.in_(list(countries)), AttackEvent.timestamp >= since)
+        .group_by(minute, AttackEvent.ip_address, AttackEvent.honeypot_service, AttackEvent.severity,
+                  AttackEvent.signature)
+        .all()
+    )
+    counts = Counter()
+    for bucket, ip, service, severity, signature, n in rows:
+        bucket = datetime.fromisoformat(str(bucket))
+        counts[(bucket, service, severity, '', signature)] -= int(n)
+        counts[(bucket, service, severity, countries[ip], signature)] += int(n)
+    _merge(counts)
+    return len(rows)
+
+
+def totals_by(dimension: str, since: datetime | None = None) -> list:
+    """按维度汇总计数，返回 [(值或 None, 次数)]，按次数降序"""
+    ensure_fresh()
+    column = getattr(AttackRollupDay, dimension)
+    query = db.session.query(column, db.func.sum(AttackRollupDay.count))
+    if since is not None:
+        query = query.filter(AttackRollupDay.bucket >= truncate(since, 'day'))
+    rows = query.group_by(column).order_by(db.func.sum(AttackRollupDay.count).desc()).all()
+    return [(value or None, int(count)) for value, count in rows]
+
+
+def total_events(since: datetime | None = None) -> int:
+    ensure_fresh()
+    query = db.session.query(db.func.sum(AttackRollupDay.count))
+    if since is not None:
+        query = query.filter(AttackRollupDay.bucket >= truncate(since, 'day'))
+    return int(query.scalar() or 0)
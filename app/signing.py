@@ -0,0 +1,69 @@
+"""
+传感器请求签名
+
+签名为 HMAC-SHA256(密钥, 时间戳 + 原始请求体) 的十六进制，放在 X-API-Signature；
+时间戳为 Unix 秒，放在 X-API-Timestamp。使用独立密钥的传感器另带 X-API-Key-Id，否则使用 API_SECRET_KEY。
+HMAC 直接在原始请求体缓冲区上增量计算，不拼接、不复制请求体。
+写请求的签名在有效期内只能使用一次：签名本身作为 nonce 以 SET NX 记入 Redis，
+过期时间覆盖到该时间戳失效为止，重放的请求被拒绝。
+传感器密钥按 key id 缓存在进程内 API_KEY_CACHE_TTL 秒，未知 key id 同样缓存，避免反复查库。
+"""
+from flask import current_app
+
+from .attacker_cache import LRUCache
+from .extensions import db
+from .models import SensorKey
+from .protocol import check_timestamp, nonce_key, nonce_ttl, signature_matches
+
+
+def _key_cache() -> LRUCache:
+    cache = current_app.extensions.get('sensor_keys')
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions['sensor_keys'] = LRUCache(config['API_KEY_CACHE_SIZE'],
+                                                                 config['API_KEY_CACHE_TTL'])
+    return cache
+
+
+def get_secret(key_id: str | None):
+    """key id -> 密钥 bytes；未知、已停用或未配置时返回 None"""
+    if not key_id:
+        return current_app.config['API_SECRET_KEY'].encode() or None
+    cache = _key_cache()
+    secret = cache.get(key_id)
+    if secret is None:
+        value = db.session.execute(
+            db.select(SensorKey.secret).where(SensorKey.key_id == key_id, SensorKey.enabled.is_(True))
+        ).scalar()
+        # 未知 key id 以空值缓存
+        secret = value.encode() if value else b''
+        cache.set(key_id, secret)
+    return secret or None
+
+
+def invalidate(key_id: str) -> None:
+    _key_cache().pop(key_id)
+
+
+def claim_nonce(key_id: str | None, signature: str, ttl: int) -> bool:
+    """签名首次使用返回 True，重放返回 False"""
+    key = nonce_key(current_app.config['API_NONCE_KEY'], key_id, signature)
+    return bool(current_app.redis.set(key, 1, nx=True, ex=ttl))
+
+
+def verify(headers, body, check_replay: bool = True) -> str | None:
+    """校验请求签名，通过时返回 None，否则返回错误原因；按代价从低到高依次检查"""
+    window = current_app.config['API_SIGNATURE_WINDOW']
+    error, timestamp, age = check_timestamp(headers, window)
+    if error:
+        return error
+
+    key_id = headers.get('X-API-Key-Id')
+    secret = get_secret(key_id)
+    signature = headers['X-API-Signature']
+    if secret is None or not signature_matches(secret, timestamp, body, signature):
+        return 'Invalid signature'
+
+    if check_replay and not claim_nonce(key_id, signature, nonce_ttl(window, age)):
+        return 'Replayed request'
+    return None
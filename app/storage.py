@@ -0,0 +1,78 @@
+"""
+事件紧凑存储
+
+EVENT_STORAGE=compact 时，事件落库前：
+- 去掉每次请求都会带上的传输层请求头（STORAGE_DROP_HEADERS，不区分大小写）；
+- 其余请求头按规范化 JSON 的 SHA-1 去重存入 header_sets，事件只保存 20 字节的 headers_hash；
+- 序列化后不小于 STORAGE_COMPRESS_MIN 字节的载荷压缩后存入 payload_blob，首字节标记编码。
+读取时由 AttackEvent.to_dict 按需解码，历史行（headers/payload JSON 列）照常返回。
+"""
+import hashlib
+import json
+import zlib
+
+from flask import current_app
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODEC_ZLIB = b'z'
+CODEC_ZSTD = b's'
+
+
+def _dumps(value, sort_keys: bool = False) -> bytes:
+    return json.dumps(value, ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':')).encode()
+
+
+def header_hash(headers: dict) -> bytes:
+    return hashlib.sha1(_dumps(headers, sort_keys=True)).digest()
+
+
+def compress(data: bytes, level: int = 6) -> bytes:
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=level).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, level)
+
+
+def decompress(blob: bytes) -> bytes:
+    codec, data = blob[:1], blob[1:]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError('payload 以 zstd 压缩，需要安装 zstandard')
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f'unknown payload codec: {codec!r}')
+
+
+def decode_payload(blob: bytes):
+    return json.loads(decompress(bytes(blob)))
+
+
+def compact_rows(rows):
+    """把待插入的事件行转换为紧凑形式，返回 (rows, hash -> 请求头)；后者需与事件在同一事务内写入"""
+    config = current_app.config
+    if config['EVENT_STORAGE'] != 'compact':
+        return rows, {}
+    drop = {name.strip().lower() for name in config['STORAGE_DROP_HEADERS'].split(',') if name.strip()}
+    min_size = config['STORAGE_COMPRESS_MIN']
+    level = config['STORAGE_COMPRESS_LEVEL']
+
+    sets, compacted = {}, []
+    for row in rows:
+        headers = {k: v for k, v in (row.get('headers') or {}).items() if k.lower() not in drop}
+        digest = None
+        if headers:
+            digest = header_hash(headers)
+            sets.setdefault(digest, headers)
+        payload, blob = row.get('payload'), None
+        if payload:
+            raw = _dumps(payload)
+            if len(raw) >= min_size:
+                payload, blob = None, compress(raw, level)
+        # 多行 INSERT 要求每行的列一致
+        compacted.append(dict(row, headers=None, headers_hash=digest, payload=payload, payload_blob=blob))
+    return compacted, sets
@@ -1,64 +1,129 @@
 """
 后台任务模块
+
+任务函数既可由 RQ worker 在其常驻应用上下文中执行（见 app.jobs），
+也可在命令行直接调用；没有应用上下文时才临时创建应用。
 """
-from datetime import datetime, timedelta
+import functools
+from datetime import datetime
+
+from flask import has_app_context
+
 from app import create_app
-from app.extensions import db
-from app.models import AttackEvent, AttackerProfile
-
-
-def cleanup_old_data(days=30):
-    """清理指定天数前的数据"""
-    app = create_app()
-    with app.app_context():
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
-        # 删除旧的攻击事件
-        old_events = AttackEvent.query.filter(AttackEvent.timestamp < cutoff_date).all()
-        for event in old_events:
-            db.session.delete(event)
-        
-        # 删除没有攻击事件的攻击者档案
-        old_profiles = AttackerProfile.query.filter(
-            AttackerProfile.last_seen < cutoff_date,
-            ~AttackerProfile.attacks.any()
-        ).all()
-        for profile in old_profiles:
-            db.session.delete(profile)
-        
-        db.session.commit()
-        print(f"清理了 {len(old_events)} 个攻击事件和 {len(old_profiles)} 个攻击者档案")
+from app import counters, dbstats, enrichment, replicas, reports, retention, rollups, touches
+
+
+def with_app_context(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if has_app_context():
+            return func(*args, **kwargs)
+        with create_app(role='worker').app_context():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@with_app_context
+def cleanup_old_data(days=None, dry_run=False):
+    """按保留策略分块清理过期数据；days 覆盖默认保留天数"""
+    result = retention.run(default_days=int(days) if days is not None else None, dry_run=dry_run)
+    events = sum(result['events'].values())
+    prefix = "[dry-run] 将清理" if dry_run else "清理了"
+    events += sum(result['partitions'].values())
+    print(f"{prefix} {events} 个攻击事件和 {result['profiles']} 个攻击者档案")
+    for name, count in result['partitions'].items():
+        print(f"  分区 {name}: {count} 个事件")
+    for policy, count in result['events'].items():
+        print(f"  策略 {policy}: {count} 个事件")
+    print(f"  请求头集合: {result['header_sets']} 个")
+    print(f"  分钟级汇总: {result['minute_rollups']} 行")
+    return result
+
+
+@with_app_context
+@replicas.read_only
+def generate_report(period='daily', start=None, end=None, formats=reports.FORMATS):
+    """生成 [start, end) 区间报告；未指定区间时按 period（daily/weekly）取最近的整天。
+    start/end 可为 datetime 或 ISO 字符串（便于入队）"""
+    if isinstance(start, str):
+        start = datetime.fromisoformat(start)
+    if isinstance(end, str):
+        end = datetime.fromisoformat(end)
+    report = reports.generate(period, start, end, formats)
+    print(f"攻击报告 - {report['start']} ~ {report['end']}:")
+    print(f"  攻击事件: {report['total_events']}")
+    print(f"  新攻击者: {report['new_attackers']}")
+    for path in report['files']:
+        print(f"  已写入 {path}")
+    return {key: report[key] for key in ('start', 'end', 'total_events', 'new_attackers', 'files')}
 
 
 def generate_daily_report():
     """生成每日报告"""
-    app = create_app()
-    with app.app_context():
-        today = datetime.utcnow().date()
-        yesterday = today - timedelta(days=1)
-        
-        # 统计昨天的数据
-        events_count = AttackEvent.query.filter(
-            db.func.date(AttackEvent.timestamp) == yesterday
-        ).count()
-        
-        new_attackers = AttackerProfile.query.filter(
-            db.func.date(AttackerProfile.first_seen) == yesterday
-        ).count()
-        
-        # 这里可以添加邮件发送或其他通知逻辑
-        print(f"每日报告 - {yesterday}:")
-        print(f"  攻击事件: {events_count}")
-        print(f"  新攻击者: {new_attackers}")
+    return generate_report('daily')
+
+
+@with_app_context
+def reconcile_counters():
+    """校对 Redis 计数器与数据库行数，发现漂移时修正"""
+    drift = counters.reconcile()
+    if any(drift.values()):
+        print(f"计数器漂移已修正: {drift}")
+    else:
+        print("计数器与数据库一致")
+    return drift
+
+
+@with_app_context
+def flush_buffers():
+    """把 Redis 中积压的汇总增量与 last_seen 写回数据库"""
+    return {'rollups': rollups.flush_rollups(), 'touches': touches.flush_touches()}
+
+
+@with_app_context
+def enrich_attackers(rescan=False):
+    """用本地 GeoIP 数据库补全攻击者的国家、城市、ASN 与运营商"""
+    updated = enrichment.run(rescan=rescan)
+    print(f"补全了 {updated} 个攻击者档案")
+    return updated
+
+
+@with_app_context
+@replicas.read_only
+def count_table(name):
+    """精确统计一张表的行数并缓存，供数据库页面展示"""
+    return dbstats.count_table(name)
+
+
+@with_app_context
+def backfill_rollups(since=None):
+    if isinstance(since, str):
+        since = datetime.fromisoformat(since)
+    return rollups.backfill(since)
 
 
 if __name__ == '__main__':
     import sys
     if len(sys.argv) > 1:
         if sys.argv[1] == 'cleanup':
-            days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
-            cleanup_old_data(days)
+            args = [a for a in sys.argv[2:] if a != '--dry-run']
+            days = int(args[0]) if args else None
+            cleanup_old_data(days, dry_run='--dry-run' in sys.argv)
         elif sys.argv[1] == 'report':
-            generate_daily_report()
+            args = sys.argv[2:]
+
+            def option(name):
+                return args[args.index(name) + 1] if name in args else None
+
+            generate_report(
+                args[0] if args and not args[0].startswith('--') else 'daily',
+                option('--start'),
+                option('--end'),
+                (option('--format') or ','.join(reports.FORMATS)).split(','),
+            )
+        elif sys.argv[1] == 'reconcile-counters':
+            reconcile_counters()
+        elif sys.argv[1] == 'enrich':
+            enrich_attackers(rescan='--rescan' in sys.argv)
     else:
-        print("用法: python tasks.py [cleanup|report] [days]")
+        print("用法: python tasks.py [cleanup [days] [--dry-run]|report [daily|weekly] [--start D --end D] [--format json,csv,html]|reconcile-counters|enrich [--rescan]]")
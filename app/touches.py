@@ -0,0 +1,90 @@
+"""
+攻击者活跃时间合并写入
+
+已知 IP 的 last_seen / user_agent 变更先记入 Redis（ZSET 保留最大 last_seen，
+HASH 保留最新 UA），再周期性地以批量 UPDATE 写回 MySQL，
+避免高频扫描器让所有 worker 争抢同一行的行锁。
+"""
+import calendar
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from .extensions import db
+from .models import AttackerProfile
+
+
+def _keys():
+    prefix = current_app.config['ATTACKER_TOUCH_KEY']
+    return f'{prefix}:last_seen', f'{prefix}:ua', f'{prefix}:flushed_at'
+
+
+def _to_epoch(dt: datetime) -> float:
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def record_touches(latest: dict) -> None:
+    """latest: ip -> (last_seen, user_agent)"""
+    if not latest:
+        return
+    seen_key, ua_key, _ = _keys()
+    pipe = current_app.redis.pipeline(transaction=False)
+    pipe.zadd(seen_key, {ip: _to_epoch(seen) for ip, (seen, _) in latest.items()}, gt=True)
+    agents = {ip: ua for ip, (_, ua) in latest.items() if ua}
+    if agents:
+        pipe.hset(ua_key, mapping=agents)
+    pipe.execute()
+
+
+def flush_touches() -> int:
+    """取出全部待写回的变更并批量 UPDATE，返回更新的 IP 数"""
+    seen_key, ua_key, flushed_key = _keys()
+    pipe = current_app.redis.pipeline(transaction=True)
+    pipe.zrange(seen_key, 0, -1, withscores=True)
+    pipe.hgetall(ua_key)
+    pipe.delete(seen_key, ua_key)
+    pipe.set(flushed_key, time.time())
+    seen, agents, *_ = pipe.execute()
+    if not seen:
+        return 0
+
+    latest = {ip: (datetime.utcfromtimestamp(score), agents.get(ip)) for ip, score in seen}
+    table = AttackerProfile.__table__
+    last_seen = db.bindparam('b_last_seen')
+    try:
+        db.session.execute(
+            table.update()
+            .where(table.c.ip_address == db.bindparam('b_ip'))
+            .values(
+                last_seen=db.case((table.c.last_seen < last_seen, last_seen), else_=table.c.last_seen),
+                user_agent=db.func.coalesce(db.bindparam('b_user_agent'), table.c.user_agent),
+            ),
+            [
+                {'b_ip': ip, 'b_last_seen': seen_at, 'b_user_agent': ua}
+                for ip, (seen_at, ua) in latest.items()
+            ],
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # 写回失败时放回 Redis，等待下次刷新
+        record_touches(latest)
+        raise
+    return len(latest)
+
+
+def last_flushed_at() -> float:
+    _, _, flushed_key = _keys()
+    return float(current_app.redis.get(flushed_key) or 0)
+
+
+def flush_if_older_than(seconds: float) -> int:
+    if time.time() - last_flushed_at() < seconds:
+        return 0
+    return flush_touches()
+
+
+def ensure_fresh() -> int:
+    """管理页读取 last_seen 前调用：数据滞后超过 ATTACKER_TOUCH_MAX_STALENESS 时先写回"""
+    return flush_if_older_than(current_app.config['ATTACKER_TOUCH_MAX_STALENESS'])
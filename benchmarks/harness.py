@@ -0,0 +1,115 @@
+"""
+基准测试公共部分
+
+create_bench_app 按给定的数据库与 Redis 创建应用：数据库可为 SQLite 或本地 MySQL，
+Redis 可为本地 redis-server 或 fakeredis（需 pip install fakeredis），便于离线运行。
+基准测试关闭限流与 CSRF，其余配置与线上一致。
+"""
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _redis_factory(url: str):
+    """返回替换 create_redis_client 的工厂；url 为 fake 时所有连接共享同一个 fakeredis 实例"""
+    if url == 'fake':
+        try:
+            import fakeredis
+        except ImportError:
+            raise SystemExit('使用 --redis fake 需要先安装 fakeredis')
+        server = fakeredis.FakeServer()
+        return lambda app, decode_responses=True: fakeredis.FakeRedis(server=server,
+                                                                     decode_responses=decode_responses)
+    import redis
+    return lambda app, decode_responses=True: redis.Redis.from_url(url, decode_responses=decode_responses)
+
+
+def create_bench_app(database_url: str | None = None, redis_url: str | None = None, **overrides):
+    """database_url / redis_url 为 None 时使用 config 中的配置；overrides 覆盖其余配置项"""
+    import config
+
+    if database_url:
+        config.Config.SQLALCHEMY_DATABASE_URI = database_url
+    config.Config.RATELIMIT_ENABLED = False
+    config.Config.RATELIMIT_STORAGE_URI = 'memory://'
+    config.Config.WTF_CSRF_ENABLED = False
+    for name, value in overrides.items():
+        setattr(config.Config, name, value)
+
+    import app.extensions as extensions
+    from app import create_app
+    if redis_url:
+        extensions.create_redis_client = _redis_factory(redis_url)
+
+    app = create_app()
+    with app.app_context():
+        extensions.db.create_all()
+    return app
+
+
+def reset_database(app) -> None:
+    from app.extensions import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        app.redis.flushdb()
+
+
+def login_client(app, username: str = 'bench', password: str = 'bench'):
+    """返回已登录后台的测试客户端"""
+    from app.extensions import db
+    from app.models import User
+
+    with app.app_context():
+        if User.query.filter_by(username=username).first() is None:
+            user = User(username=username)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+def summarize(timings: list) -> dict:
+    """秒 -> 毫秒统计"""
+    ordered = sorted(timings)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]  # noqa: E731
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(pick(0.5) * 1000, 3),
+        'p95_ms': round(pick(0.95) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def environment(app) -> dict:
+    """结果中附带的运行环境，便于跨提交比较"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    with app.app_context():
+        from app.extensions import db
+        dialect = db.engine.dialect.name
+    return {
+        'commit': commit,
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': dialect,
+        'redis': type(app.redis).__module__.split('.')[0],
+        'ingest_mode': app.config['INGEST_MODE'],
+        'event_storage': app.config['EVENT_STORAGE'],
+    }
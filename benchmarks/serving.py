@@ -0,0 +1,160 @@
+"""
+服务方式基准测试
+
+分别启动开发服务器（与 run.py 相同：Werkzeug、debug=True）和 gunicorn（gunicorn.conf.py），
+用 -c 个并发客户端对同一组端点发送请求，比较每秒请求数与延迟。
+服务进程与客户端在同一台机器上会争抢 CPU，绝对数值偏低，只用于两者对比。
+
+    python -m benchmarks.serving --database sqlite:////tmp/bench.db --redis fake
+    python -m benchmarks.serving --servers gunicorn --endpoints capture -n 20000 -c 64 --role ingest
+    python -m benchmarks.serving --worker-class gevent --json
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import ROOT, create_bench_app, environment, login_client, reset_database, summarize  # noqa: E402
+from benchmarks.ingest import signed_headers  # noqa: E402
+from benchmarks.seed import Generator  # noqa: E402
+
+
+ENDPOINTS = ('capture', 'dashboard', 'healthz')
+
+
+def bench_app():
+    """服务进程中的应用工厂：数据库与 Redis 取自 BENCH_DATABASE / BENCH_REDIS"""
+    return create_bench_app(os.getenv('BENCH_DATABASE') or None, os.getenv('BENCH_REDIS') or None)
+
+
+def start_server(kind: str, port: int, env: dict) -> subprocess.Popen:
+    if kind == 'dev':
+        code = ('from benchmarks.serving import bench_app; '
+                f"bench_app().run(host='127.0.0.1', port={port}, debug=True, use_reloader=False)")
+        command = [sys.executable, '-c', code]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.serving:bench_app()']
+        env = dict(env, GUNICORN_BIND=f'127.0.0.1:{port}')
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'服务进程已退出（{process.returncode}）')
+        try:
+            if requests.get(f'{url}/healthz', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f'{url} 在 {timeout}s 内未就绪')
+
+
+def drive(url: str, endpoint: str, total: int, concurrency: int, secret: bytes) -> dict:
+    """concurrency 个线程各用一个长连接会话，共发送 total 个请求"""
+    import requests
+
+    generator = Generator(2000, days=1)
+    counter = itertools.count()
+
+    def client():
+        session = requests.Session()
+        if endpoint == 'dashboard':
+            session.post(f'{url}/login', data={'username': 'bench', 'password': 'bench'})
+        timings, errors = [], 0
+        while (seq := next(counter)) < total:
+            if endpoint == 'capture':
+                item = generator.event()
+                body = json.dumps(dict(item['payload'], seq=seq)).encode()
+                headers = dict(signed_headers(secret, body), **{'X-Forwarded-For': item['ip']})
+                send = lambda: session.post(f'{url}/api/capture', data=body, headers=headers)  # noqa: E731
+            else:
+                path = '/admin/dashboard' if endpoint == 'dashboard' else '/healthz'
+                send = lambda: session.get(url + path, allow_redirects=False)  # noqa: E731
+            t0 = time.perf_counter()
+            try:
+                ok = send().status_code in (200, 202)
+            except requests.RequestException:
+                ok = False
+            timings.append(time.perf_counter() - t0)
+            errors += not ok
+        return timings, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+    timings = [t for result in results for t in result[0]]
+    return {
+        'endpoint': endpoint,
+        'requests': len(timings),
+        'errors': sum(result[1] for result in results),
+        'requests_per_sec': round(len(timings) / elapsed, 1),
+        'latency': summarize(timings),
+    }
+
+
+def run(app, servers, endpoints, total: int, concurrency: int, env: dict, port: int = 5055) -> list:
+    secret = app.config['API_SECRET_KEY'].encode()
+    url = f'http://127.0.0.1:{port}'
+    results = []
+    for kind in servers:
+        reset_database(app)
+        login_client(app)
+        process = start_server(kind, port, env)
+        try:
+            wait_ready(url, process)
+            for endpoint in endpoints:
+                results.append(dict(drive(url, endpoint, total, concurrency, secret), server=kind))
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='开发服务器与 gunicorn 吞吐对比')
+    parser.add_argument('--servers', default='dev,gunicorn', help='逗号分隔：dev, gunicorn')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='逗号分隔：' + ', '.join(ENDPOINTS))
+    parser.add_argument('-n', '--requests', type=int, default=3000, help='每个端点的请求数')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--role', default='web', help='gunicorn 的 APP_ROLE（决定默认进程/线程数）')
+    parser.add_argument('--workers', help='覆盖 GUNICORN_WORKERS')
+    parser.add_argument('--threads', help='覆盖 GUNICORN_THREADS')
+    parser.add_argument('--worker-class', help='覆盖 GUNICORN_WORKER_CLASS，如 gevent')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--database', help='SQLAlchemy URL，默认使用 config 中的 MySQL（会清空数据）')
+    parser.add_argument('--redis', help='redis:// URL 或 fake（每个服务进程各自一个 fakeredis）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    app = create_bench_app(args.database, args.redis)
+    env = dict(os.environ, APP_ROLE=args.role, BENCH_DATABASE=args.database or '', BENCH_REDIS=args.redis or '')
+    for name, value in (('GUNICORN_WORKERS', args.workers), ('GUNICORN_THREADS', args.threads),
+                        ('GUNICORN_WORKER_CLASS', args.worker_class)):
+        if value:
+            env[name] = value
+    results = run(app, args.servers.split(','), args.endpoints.split(','), args.requests, args.concurrency,
+                  env, args.port)
+    if args.json:
+        print(json.dumps({'environment': environment(app), 'serving': results}, ensure_ascii=False, indent=2))
+        return 0
+    for row in results:
+        latency = row['latency']
+        print(f"{row['server']:<9} {row['endpoint']:<10} {row['requests_per_sec']:>8} 请求/秒  "
+              f"p50 {latency['p50_ms']:>8} ms  p99 {latency['p99_ms']:>8} ms  错误 {row['errors']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
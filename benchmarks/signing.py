@@ -0,0 +1,84 @@
+"""
+请求签名基准测试
+
+对不同大小的请求体比较旧写法（f"{timestamp}{body}" 先格式化 bytes 的 repr 再编码，整体复制两次）
+与 app.protocol.compute_signature（在原始缓冲区上增量 HMAC）的耗时与吞吐。
+
+    python -m benchmarks.signing                    # 默认 1KB ~ 16MB
+    python -m benchmarks.signing --sizes 4096,1048576 -r 50
+    python -m benchmarks.signing --json
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.protocol import compute_signature  # noqa: E402
+
+
+SECRET = b'benchmark-secret'
+DEFAULT_SIZES = '1024,65536,1048576,16777216'
+
+
+def legacy_signature(secret: bytes, timestamp: str, body: bytes) -> str:
+    """重构前的写法，仅用于对比"""
+    return hmac.new(secret, f"{timestamp}{body}".encode(), hashlib.sha256).hexdigest()
+
+
+def make_body(size: int) -> bytes:
+    line = b'{"ip":"203.0.113.7","method":"GET","path":"/wp-login.php","payload":{"service":"web"}}\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def measure(func, body: bytes, rounds: int) -> dict:
+    timestamp = str(int(time.time()))
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        func(SECRET, timestamp, body)
+        timings.append(time.perf_counter() - t0)
+    mean = statistics.fmean(timings)
+    return {
+        'mean_ms': round(mean * 1000, 3),
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'mb_per_sec': round(len(body) / mean / 1e6, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='请求签名基准测试')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='逗号分隔的请求体字节数')
+    parser.add_argument('-r', '--rounds', type=int, default=20, help='每种大小的重复次数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        body = make_body(size)
+        legacy = measure(legacy_signature, body, args.rounds)
+        current = measure(compute_signature, body, args.rounds)
+        results.append({
+            'bytes': size,
+            'legacy': legacy,
+            'incremental': current,
+            'speedup': round(legacy['mean_ms'] / current['mean_ms'], 2) if current['mean_ms'] else None,
+        })
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for row in results:
+            print(f"{row['bytes']:>10} B  旧 {row['legacy']['mean_ms']:>9} ms  "
+                  f"增量 {row['incremental']['mean_ms']:>9} ms  "
+                  f"({row['incremental']['mb_per_sec']} MB/s)  加速比 {row['speedup']}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
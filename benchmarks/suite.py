@@ -0,0 +1,101 @@
+"""
+基准测试套件
+
+依次运行采集吞吐（单条与批量）与后台页面计时，结果连同提交号、数据库与 Redis 类型写入一个 JSON 文件；
+--compare 与之前的结果逐项比较，变慢超过 --threshold 倍的指标视为回归，退出码为 1。
+
+    python -m benchmarks.suite --database sqlite:////tmp/bench.db --redis fake -o bench.json
+    python -m benchmarks.suite --sizes 100000,1000000 -o after.json --compare before.json
+    python -m benchmarks.suite --compare before.json --against after.json   # 只比较两份结果
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import admin, ingest  # noqa: E402
+from benchmarks.harness import create_bench_app, environment, reset_database  # noqa: E402
+
+
+def run_suite(app, sizes, attackers: int, rounds: int, ingest_events: int, batch: int) -> dict:
+    reset_database(app)
+    results = {'environment': environment(app), 'ingest': [], 'admin': []}
+    results['ingest'].append(ingest.run(app, 'single', ingest_events))
+    results['ingest'].append(ingest.run(app, 'bulk', ingest_events * 10, batch))
+    results['admin'] = admin.run(app, sizes, attackers, rounds)
+    return results
+
+
+def metrics(results: dict) -> dict:
+    """展开为 指标名 -> (数值, 越大越好)"""
+    flat = {}
+    for row in results.get('ingest', []):
+        flat[f"ingest.{row['mode']}.events_per_sec"] = (row['events_per_sec'], True)
+        flat[f"ingest.{row['mode']}.p99_ms"] = (row['request_latency']['p99_ms'], False)
+    for level in results.get('admin', []):
+        for name, timing in level['views'].items():
+            for phase in ('cold', 'warm'):
+                flat[f"admin.{level['events']}.{name}.{phase}.p50_ms"] = (timing[phase]['p50_ms'], False)
+    return flat
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """返回 [(指标, 之前, 之后, 变慢倍数, 是否回归)]，只比较两份结果共有的指标"""
+    old, new = metrics(before), metrics(after)
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        (a, higher_is_better), (b, _) = old[name], new[name]
+        if not a or not b:
+            continue
+        slowdown = a / b if higher_is_better else b / a
+        rows.append((name, a, b, round(slowdown, 2), slowdown > threshold))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='采集与后台页面基准测试套件')
+    parser.add_argument('--sizes', default='10000,100000', help='后台页面测试的事件总数，逐级递增')
+    parser.add_argument('--attackers', type=int, default=20000, help='攻击者池大小')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='每个页面 cold/warm 各请求次数')
+    parser.add_argument('--ingest-events', type=int, default=2000, help='单条采集请求数（批量为其 10 倍条数）')
+    parser.add_argument('--batch', type=int, default=500, help='批量采集每请求条数')
+    parser.add_argument('--database', help='SQLAlchemy URL，默认使用 config 中的 MySQL（会清空数据）')
+    parser.add_argument('--redis', help='redis:// URL 或 fake（fakeredis），默认使用 config 中的 Redis')
+    parser.add_argument('-o', '--output', help='结果写入该 JSON 文件，默认输出到标准输出')
+    parser.add_argument('--compare', help='与之前的结果文件比较')
+    parser.add_argument('--against', help='与 --compare 一起使用：不运行测试，直接比较该结果文件')
+    parser.add_argument('--threshold', type=float, default=1.2, help='变慢超过该倍数视为回归')
+    args = parser.parse_args(argv)
+
+    if args.against:
+        with open(args.against, encoding='utf-8') as f:
+            results = json.load(f)
+    else:
+        app = create_bench_app(args.database, args.redis)
+        sizes = [int(s) for s in args.sizes.split(',')]
+        results = run_suite(app, sizes, args.attackers, args.rounds, args.ingest_events, args.batch)
+        text = json.dumps(results, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+            print(f'结果已写入 {args.output}', file=sys.stderr)
+        elif not args.compare:
+            print(text)
+
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(baseline, results, args.threshold)
+    print(f"对比 {baseline['environment'].get('commit')} -> {results['environment'].get('commit')}")
+    for name, a, b, slowdown, regressed in rows:
+        print(f"{'!!' if regressed else '  '} {name:<55} {a:>12} -> {b:>12}  x{slowdown}")
+    regressions = sum(1 for row in rows if row[4])
+    print(f'{len(rows)} 项指标，回归 {regressions} 项（阈值 x{args.threshold}）')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,18 @@
 import os
 
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-change-me')
     API_SECRET_KEY = os.getenv('API_SECRET_KEY', 'api-secret-change-me')
+    # 签名时间戳有效期（秒），有效期内同一签名只能使用一次
+    API_SIGNATURE_WINDOW = int(os.getenv('API_SIGNATURE_WINDOW', '300'))
+    API_NONCE_KEY = os.getenv('API_NONCE_KEY', 'honeypot:nonce')
+    # 传感器密钥进程内缓存：停用密钥最多 API_KEY_CACHE_TTL 秒后生效
+    API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', '1000'))
+    API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', '60'))
 
     MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
     MYSQL_PORT = int(os.getenv('MYSQL_PORT', '3306'))
@@ -16,10 +25,155 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # 进程角色：web（后台页面）、ingest（传感器采集接口）、live（仪表盘推送）、worker（flusher / RQ / 命令行），决定连接池大小
+    APP_ROLE = os.getenv('APP_ROLE', 'web')
+    # 每个进程的连接池，"角色:连接数"；池满后最多再临时建立 DB_MAX_OVERFLOW 个，需不少于 gunicorn 每进程线程数
+    DB_POOL_SIZE = os.getenv('DB_POOL_SIZE', 'web:5,ingest:10,worker:2,live:2')
+    DB_MAX_OVERFLOW = os.getenv('DB_MAX_OVERFLOW', 'web:5,ingest:20,worker:2,live:8')
+    # 取连接的最长等待秒数；连接存活超过 DB_POOL_RECYCLE 秒后重建（需小于 MySQL wait_timeout），取出前 ping 检测断线
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '10'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+    DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+    # 只读副本，逗号分隔的 SQLAlchemy URL；后台统计页面与报告任务读副本，延迟超过 REPLICA_MAX_LAG 秒时回退主库
+    DB_REPLICA_URLS = os.getenv('DB_REPLICA_URLS', '')
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '10'))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', '5'))
+
     REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
     REDIS_DB = int(os.getenv('REDIS_DB', '0'))
     REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
+    REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', '5'))
+
+    # Ingestion: sync 直接写库；buffered 先入 Redis Stream，由 flusher 批量落库
+    INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+    INGEST_STREAM = os.getenv('INGEST_STREAM', 'honeypot:ingest')
+    # 落库确认后即从 Stream 删除，不按长度截断；积压超过该条数时 flusher 记录警告
+    INGEST_BACKLOG_ALERT = int(os.getenv('INGEST_BACKLOG_ALERT', '100000'))
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+    INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', '1.0'))
+    INGEST_ID_TTL = int(os.getenv('INGEST_ID_TTL', '3600'))
+    # 数据库拒绝写入（超长、非法值等）的条目移入死信 Stream，不阻塞后续批次
+    INGEST_DEAD_STREAM = os.getenv('INGEST_DEAD_STREAM', 'honeypot:ingest:dead')
+    INGEST_DEAD_MAXLEN = int(os.getenv('INGEST_DEAD_MAXLEN', '10000'))
+    BULK_CAPTURE_MAX_ITEMS = int(os.getenv('BULK_CAPTURE_MAX_ITEMS', '10000'))
+    # 独立采集服务（python -m app.capture_service）：监听地址、请求体上限（字节）、MySQL 连接数（只用于查询传感器密钥）
+    CAPTURE_SERVICE_HOST = os.getenv('CAPTURE_SERVICE_HOST', '0.0.0.0')
+    CAPTURE_SERVICE_PORT = int(os.getenv('CAPTURE_SERVICE_PORT', '5002'))
+    CAPTURE_MAX_BODY = int(os.getenv('CAPTURE_MAX_BODY', str(16 * 1024 * 1024)))
+    CAPTURE_DB_POOL_SIZE = int(os.getenv('CAPTURE_DB_POOL_SIZE', '2'))
+
+    # 重复事件折叠：同一 IP/方法/路径/载荷/服务在窗口（秒）内只保留一行并累加 count
+    FOLD_ENABLED = os.getenv('FOLD_ENABLED', '0') == '1'
+    FOLD_WINDOW = int(os.getenv('FOLD_WINDOW', '300'))
+    FOLD_KEY = os.getenv('FOLD_KEY', 'honeypot:fold')
+
+    # 事件存储：compact 去掉传输层请求头、请求头按内容去重、大载荷压缩；json 按原样写入 JSON 列
+    EVENT_STORAGE = os.getenv('EVENT_STORAGE', 'compact')
+    STORAGE_DROP_HEADERS = os.getenv(
+        'STORAGE_DROP_HEADERS',
+        'Content-Length,Connection,Keep-Alive,Accept-Encoding,X-API-Signature,X-API-Timestamp,X-API-Key-Id',
+    )
+    # 序列化后超过该字节数的载荷压缩存入 payload_blob；有 zstandard 时用 zstd，否则用 zlib
+    STORAGE_COMPRESS_MIN = int(os.getenv('STORAGE_COMPRESS_MIN', '512'))
+    STORAGE_COMPRESS_LEVEL = int(os.getenv('STORAGE_COMPRESS_LEVEL', '6'))
+
+    # 攻击者 IP -> 档案ID 缓存：进程内 LRU + Redis Hash
+    ATTACKER_CACHE_SIZE = int(os.getenv('ATTACKER_CACHE_SIZE', '10000'))
+    ATTACKER_CACHE_TTL = int(os.getenv('ATTACKER_CACHE_TTL', '60'))
+    ATTACKER_CACHE_KEY = os.getenv('ATTACKER_CACHE_KEY', 'honeypot:attacker_ids')
+    # 失效时递增 Redis 中的版本号，各进程最多每隔该秒数检查一次，版本变化时清空本地缓存（0 为每次查询都检查）
+    ATTACKER_CACHE_SYNC_INTERVAL = float(os.getenv('ATTACKER_CACHE_SYNC_INTERVAL', '1'))
+
+    # 已知攻击者 last_seen/UA 合并写入：先记入 Redis，再批量 UPDATE
+    ATTACKER_TOUCH_COALESCE = os.getenv('ATTACKER_TOUCH_COALESCE', '1') == '1'
+    ATTACKER_TOUCH_KEY = os.getenv('ATTACKER_TOUCH_KEY', 'honeypot:touch')
+    ATTACKER_TOUCH_FLUSH_INTERVAL = float(os.getenv('ATTACKER_TOUCH_FLUSH_INTERVAL', '5'))
+    # 管理页可接受的 last_seen 最大滞后秒数
+    ATTACKER_TOUCH_MAX_STALENESS = float(os.getenv('ATTACKER_TOUCH_MAX_STALENESS', '30'))
+
+    # 预聚合计数：采集时在 Redis 中累加，周期性合并进分钟/小时/天汇总表
+    ROLLUP_KEY = os.getenv('ROLLUP_KEY', 'honeypot:rollup')
+    ROLLUP_FLUSH_INTERVAL = float(os.getenv('ROLLUP_FLUSH_INTERVAL', '5'))
+    ROLLUP_MAX_STALENESS = float(os.getenv('ROLLUP_MAX_STALENESS', '10'))
+
+    # total_attacks / unique_attackers 计数器
+    COUNTERS_KEY = os.getenv('COUNTERS_KEY', 'honeypot:counters')
+
+    # 攻击事件列表：带筛选时的计数上限与缓存秒数
+    ATTACKS_COUNT_CAP = int(os.getenv('ATTACKS_COUNT_CAP', '10000'))
+    ATTACKS_COUNT_TTL = int(os.getenv('ATTACKS_COUNT_TTL', '60'))
+    ATTACKS_COUNT_KEY = os.getenv('ATTACKS_COUNT_KEY', 'honeypot:attacks:hits')
+
+    # 数据保留：默认天数、按服务覆盖（如 "ssh:7,web:90"）、分块大小与块间暂停秒数
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '30'))
+    RETENTION_POLICIES = os.getenv('RETENTION_POLICIES', '')
+    RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', '5000'))
+    RETENTION_PAUSE = float(os.getenv('RETENTION_PAUSE', '0.1'))
+    RETENTION_CHECKPOINT_KEY = os.getenv('RETENTION_CHECKPOINT_KEY', 'honeypot:retention:checkpoint')
+    ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv('ROLLUP_MINUTE_RETENTION_DAYS', '7'))
+
+    # attack_events 时间分区：month / day，提前创建的分区数
+    PARTITION_GRANULARITY = os.getenv('PARTITION_GRANULARITY', 'month')
+    PARTITION_AHEAD = int(os.getenv('PARTITION_AHEAD', '3'))
+    # 仪表盘“最近事件”先在该时间窗口内查找，分区表上只需扫描最新分区
+    RECENT_EVENTS_WINDOW_DAYS = int(os.getenv('RECENT_EVENTS_WINDOW_DAYS', '7'))
+
+    # 报告输出目录
+    REPORT_DIR = os.getenv('REPORT_DIR', os.path.join(BASE_DIR, 'reports'))
+
+    # GeoIP / ASN 补全：本地 GeoLite2 数据库路径，文件替换后 GEOIP_RELOAD_INTERVAL 秒内自动重新加载
+    GEOIP_CITY_DB = os.getenv('GEOIP_CITY_DB', os.path.join(BASE_DIR, 'data', 'GeoLite2-City.mmdb'))
+    GEOIP_ASN_DB = os.getenv('GEOIP_ASN_DB', os.path.join(BASE_DIR, 'data', 'GeoLite2-ASN.mmdb'))
+    GEOIP_RELOAD_INTERVAL = float(os.getenv('GEOIP_RELOAD_INTERVAL', '60'))
+    GEOIP_CACHE_KEY = os.getenv('GEOIP_CACHE_KEY', 'honeypot:geoip')
+    GEOIP_CACHE_TTL = int(os.getenv('GEOIP_CACHE_TTL', '604800'))
+    ENRICH_BATCH_SIZE = int(os.getenv('ENRICH_BATCH_SIZE', '500'))
+    ENRICH_CHECKPOINT_KEY = os.getenv('ENRICH_CHECKPOINT_KEY', 'honeypot:enrich:checkpoint')
+
+    # 服务端特征检测：规则文件（修改后 DETECTION_RELOAD_INTERVAL 秒内自动重新编译）与统计合并间隔
+    DETECTION_ENABLED = os.getenv('DETECTION_ENABLED', '1') == '1'
+    DETECTION_RULES = os.getenv('DETECTION_RULES', os.path.join(BASE_DIR, 'rules', 'detection.json'))
+    DETECTION_RELOAD_INTERVAL = float(os.getenv('DETECTION_RELOAD_INTERVAL', '10'))
+    DETECTION_STATS_KEY = os.getenv('DETECTION_STATS_KEY', 'honeypot:detection:stats')
+    DETECTION_STATS_INTERVAL = float(os.getenv('DETECTION_STATS_INTERVAL', '5'))
+
+    # 仪表盘实时推送：Redis 频道、心跳间隔与单个 SSE 连接的最长时长（秒）
+    LIVE_ENABLED = os.getenv('LIVE_ENABLED', '1') == '1'
+    LIVE_CHANNEL = os.getenv('LIVE_CHANNEL', 'honeypot:live')
+    LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', '15'))
+    LIVE_MAX_DURATION = float(os.getenv('LIVE_MAX_DURATION', '300'))
+
+    # 后台视图缓存：条目硬上限、数据变化后仍可复用的最短时间、单飞重算锁与等待时长（秒）
+    VIEW_CACHE_KEY = os.getenv('VIEW_CACHE_KEY', 'honeypot:view')
+    VIEW_CACHE_TTL = int(os.getenv('VIEW_CACHE_TTL', '30'))
+    VIEW_CACHE_MIN_AGE = float(os.getenv('VIEW_CACHE_MIN_AGE', '2'))
+    VIEW_CACHE_LOCK_TTL = int(os.getenv('VIEW_CACHE_LOCK_TTL', '30'))
+    VIEW_CACHE_WAIT = float(os.getenv('VIEW_CACHE_WAIT', '5'))
+
+    # 数据库页面：精确行数缓存
+    DBSTATS_COUNTS_KEY = os.getenv('DBSTATS_COUNTS_KEY', 'honeypot:dbstats:counts')
+
+    # 后台任务（RQ）：超时、失败重试次数与首次重试间隔（之后逐次翻倍）、结果保留时间
+    JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', '1800'))
+    JOB_RETRY_MAX = int(os.getenv('JOB_RETRY_MAX', '3'))
+    JOB_RETRY_INTERVAL = int(os.getenv('JOB_RETRY_INTERVAL', '30'))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '86400'))
+    # 周期任务，"任务名:间隔秒数"，按 UTC 间隔对齐（86400 即每天零点）
+    JOB_SCHEDULE = os.getenv('JOB_SCHEDULE', 'rollup:60,enrich:60,report:86400,cleanup:86400,reconcile:86400')
+    JOB_SCHEDULE_KEY = os.getenv('JOB_SCHEDULE_KEY', 'honeypot:jobs:schedule')
+    JOB_SCHEDULER_INTERVAL = float(os.getenv('JOB_SCHEDULER_INTERVAL', '10'))
+
+    # 运行指标：/metrics（设置 METRICS_TOKEN 时需 Authorization: Bearer <token>）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    # 慢请求剖析：记录每个请求的 SQL，超过 PROFILE_MIN_DURATION 秒的请求保留最慢的 PROFILE_KEEP 条
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', '0') == '1'
+    PROFILE_MIN_DURATION = float(os.getenv('PROFILE_MIN_DURATION', '0.5'))
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+    PROFILE_MAX_QUERIES = int(os.getenv('PROFILE_MAX_QUERIES', '200'))
+    PROFILE_KEY = os.getenv('PROFILE_KEY', 'honeypot:profile:slow')
 
     # Flask-Login
     REMEMBER_COOKIE_DURATION_DAYS = int(os.getenv('REMEMBER_COOKIE_DURATION_DAYS', '7'))
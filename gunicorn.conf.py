@@ -0,0 +1,64 @@
+"""
+gunicorn 配置（生产环境）
+
+后台页面与传感器采集接口分别以两组进程运行，互不争抢线程与数据库连接，由 nginx 按路径转发：
+
+    APP_ROLE=web    gunicorn -c gunicorn.conf.py wsgi:app    # 后台，默认 0.0.0.0:5000
+    APP_ROLE=ingest gunicorn -c gunicorn.conf.py wsgi:app    # /api 采集接口，默认 0.0.0.0:5001
+    APP_ROLE=live   gunicorn -c gunicorn.conf.py wsgi:app    # /admin/live 仪表盘推送，默认 0.0.0.0:5003
+
+web 与 ingest 默认使用 gthread（每进程多线程），GUNICORN_WORKER_CLASS=gevent 时改用协程（需 pip install gevent）。
+live 默认使用 gevent：每个 SSE 连接只占一个协程，长连接不会占满 web 的工作线程。
+每个进程处理约 GUNICORN_MAX_REQUESTS 个请求后平滑重启，kill -HUP 主进程可滚动重启全部 worker。
+"""
+import os
+
+
+role = os.getenv('APP_ROLE', 'web')
+
+# 角色 -> (默认端口, 进程数, 每进程线程数, worker 类型)；线程数不应超过该角色的 DB_POOL_SIZE + DB_MAX_OVERFLOW
+ROLE_DEFAULTS = {
+    'web': (5000, 2, 8, 'gthread'),
+    'ingest': (5001, 4, 16, 'gthread'),
+    # SSE 连接只在登录校验时短暂使用数据库，随后归还连接
+    'live': (5003, 1, 1, 'gevent'),
+}
+port, default_workers, default_threads, default_worker_class = ROLE_DEFAULTS.get(role, ROLE_DEFAULTS['web'])
+
+bind = os.getenv('GUNICORN_BIND', f'0.0.0.0:{port}')
+workers = int(os.getenv('GUNICORN_WORKERS', str(default_workers)))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', default_worker_class)
+threads = int(os.getenv('GUNICORN_THREADS', str(default_threads)))
+# gevent 每进程的并发连接上限（live 角色即每进程可同时打开的仪表盘数）
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# 平滑回收：处理一定请求数后重启，加随机抖动避免同时重启；停止时给进行中的请求留出时间
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# 各 worker 自行创建数据库与 Redis 连接池，不在主进程中预加载应用
+preload_app = False
+proc_name = f'honeypot-{role}'
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # 多进程指标目录中残留的旧进程文件会被计入汇总，启动前清空
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.db'):
+            os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -9,10 +9,27 @@ from app.models import User
 
 
 def init_db():
+    """全新数据库：按当前模型建表（MySQL 上同时分区）并标记为最新迁移版本；已有数据库改用迁移升级"""
+    from flask_migrate import stamp
+    from app import partitions
+
     app = create_app()
     with app.app_context():
+        inspector = db.inspect(db.engine)
+        if inspector.has_table('alembic_version'):
+            print('Database is managed by migrations; run `python migrate.py db upgrade` instead.')
+            return
+        if inspector.has_table('attack_events'):
+            print('Existing database without migration history; run `python migrate.py db upgrade` '
+                  'to migrate it from the baseline schema.')
+            return
         db.create_all()
-        print('Database tables created (or already exist).')
+        if partitions.is_supported():
+            names = partitions.partition_table()
+            db.session.commit()
+            print(f"Partitioned attack_events: {', '.join(names)}")
+        stamp()
+        print('Database tables created and stamped at the latest migration.')
 
 
 def create_admin():
@@ -32,18 +49,88 @@ def create_admin():
         print('Admin user created.')
 
 
+def backfill_rollups(since=None):
+    from datetime import datetime
+    from app import rollups
+
+    app = create_app()
+    with app.app_context():
+        start = datetime.strptime(since, '%Y-%m-%d') if since else None
+        days = rollups.backfill(start)
+        print(f'Rebuilt rollups for {days} day(s).')
+
+
+def maintain_partitions(ahead=None, drop_expired=False, dry_run=False):
+    from datetime import datetime, timedelta
+    from app import partitions, retention
+
+    app = create_app()
+    with app.app_context():
+        if not partitions.is_partitioned():
+            print('attack_events is not partitioned; run the partition migration first.')
+            return
+        created = [] if dry_run else partitions.ensure_future(ahead)
+        print(f"Created partitions: {', '.join(created) or 'none'}")
+        if drop_expired:
+            policies = retention.parse_policies(app.config['RETENTION_POLICIES'])
+            days = max([app.config['RETENTION_DAYS'], *policies.values()])
+            dropped = partitions.drop_expired(datetime.utcnow() - timedelta(days=days), dry_run)
+            for name, rows in dropped.items():
+                print(f"{'Would drop' if dry_run else 'Dropped'} partition {name} ({rows} rows)")
+
+
+def sensor_key(key_id, description=None, disable=False):
+    import secrets
+    from app.models import SensorKey
+
+    app = create_app()
+    with app.app_context():
+        key = SensorKey.query.filter_by(key_id=key_id).first()
+        if disable:
+            if key is None:
+                print(f'Sensor key {key_id} not found.')
+                return
+            key.enabled = False
+            db.session.commit()
+            print(f"Sensor key {key_id} disabled (takes effect within {app.config['API_KEY_CACHE_TTL']:g}s).")
+            return
+        if key is not None:
+            print(f'Sensor key {key_id} already exists.')
+            return
+        key = SensorKey(key_id=key_id, secret=secrets.token_hex(32), description=description)
+        db.session.add(key)
+        db.session.commit()
+        print(f'Sensor key {key_id} created, secret: {key.secret}')
+
+
 def main():
     load_dotenv()
     import argparse
 
     parser = argparse.ArgumentParser(description='Honeypot management')
-    parser.add_argument('command', choices=['init-db', 'create-admin', 'all'])
+    parser.add_argument('command', choices=['init-db', 'create-admin', 'all', 'backfill-rollups', 'partitions',
+                                            'sensor-key'])
+    parser.add_argument('--since', help='backfill-rollups: first day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--ahead', type=int, help='partitions: future partitions to keep (default PARTITION_AHEAD)')
+    parser.add_argument('--drop-expired', action='store_true', help='partitions: drop partitions past retention')
+    parser.add_argument('--dry-run', action='store_true', help='partitions: only report what would change')
+    parser.add_argument('--key-id', help='sensor-key: key id sent as X-API-Key-Id')
+    parser.add_argument('--description', help='sensor-key: note for a new key')
+    parser.add_argument('--disable', action='store_true', help='sensor-key: disable the key instead of creating it')
     args = parser.parse_args()
 
     if args.command == 'init-db':
         init_db()
     elif args.command == 'create-admin':
         create_admin()
+    elif args.command == 'backfill-rollups':
+        backfill_rollups(args.since)
+    elif args.command == 'partitions':
+        maintain_partitions(args.ahead, args.drop_expired, args.dry_run)
+    elif args.command == 'sensor-key':
+        if not args.key_id:
+            parser.error('sensor-key requires --key-id')
+        sensor_key(args.key_id, args.description, args.disable)
     elif args.command == 'all':
         init_db()
         create_admin()
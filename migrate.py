@@ -1,18 +1,12 @@
 #!/usr/bin/env python3
 """
-数据库迁移管理脚本
+数据库迁移管理脚本（Flask-Migrate 的 db 命令，等同 flask --app run db ...）
 """
-import os
-from flask_migrate import Migrate, MigrateCommand
-from flask_script import Manager
-from app import create_app
-from app.extensions import db
+from flask.cli import FlaskGroup
 
-app = create_app()
-migrate = Migrate(app, db)
-manager = Manager(app)
+from app import create_app
 
-manager.add_command('db', MigrateCommand)
+cli = FlaskGroup(create_app=create_app)
 
 if __name__ == '__main__':
-    manager.run()
+    cli()
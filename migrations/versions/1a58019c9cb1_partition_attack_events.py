@@ -0,0 +1,73 @@
+"""partition attack_events by month
+
+将 attack_events 改为按 RANGE (TO_DAYS(timestamp)) 的月分区表：
+- InnoDB 分区表不支持外键，删除 attacker_id 外键（保留其索引）；
+- 主键需包含分区列，改为 (id, timestamp)；
+- 从最早事件所在月份建到当前月之后 3 个月，末尾为 MAXVALUE 分区 pfuture。
+之后用 python manage.py partitions 维护未来分区并删除过期分区。
+该操作会重建整表，大表请在维护窗口内执行。
+
+Revision ID: 1a58019c9cb1
+Revises: 4e806902a9fe
+Create Date: 2026-10-18 13:40:52.000000
+
+"""
+from datetime import date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a58019c9cb1'
+down_revision = '4e806902a9fe'
+branch_labels = None
+depends_on = None
+
+
+AHEAD_MONTHS = 3
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    fk_names = conn.execute(sa.text("""
+        SELECT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attack_events'
+          AND COLUMN_NAME = 'attacker_id' AND REFERENCED_TABLE_NAME IS NOT NULL
+    """)).scalars().all()
+    for name in fk_names:
+        op.drop_constraint(name, 'attack_events', type_='foreignkey')
+    has_index = conn.execute(sa.text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attack_events'
+          AND COLUMN_NAME = 'attacker_id' AND SEQ_IN_INDEX = 1
+    """)).scalar()
+    if not has_index:
+        op.create_index('ix_attack_events_attacker_id', 'attack_events', ['attacker_id'], unique=False)
+
+    op.execute('ALTER TABLE attack_events DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)')
+
+    oldest = conn.execute(sa.text('SELECT MIN(timestamp) FROM attack_events')).scalar()
+    start = (oldest.date() if oldest else date.today()).replace(day=1)
+    end = date.today().replace(day=1)
+    for _ in range(AHEAD_MONTHS + 1):
+        end = _next_month(end)
+
+    clauses = []
+    while start < end:
+        upper = _next_month(start)
+        clauses.append(f"PARTITION {start.strftime('p%Y%m')} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))")
+        start = upper
+    clauses.append('PARTITION pfuture VALUES LESS THAN MAXVALUE')
+    op.execute(f"ALTER TABLE attack_events PARTITION BY RANGE (TO_DAYS(timestamp)) ({', '.join(clauses)})")
+
+
+def downgrade():
+    op.execute('ALTER TABLE attack_events REMOVE PARTITIONING')
+    op.execute('ALTER TABLE attack_events DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
+    op.create_foreign_key(None, 'attack_events', 'attacker_profiles', ['attacker_id'], ['id'])
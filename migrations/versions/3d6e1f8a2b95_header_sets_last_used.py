@@ -0,0 +1,31 @@
+"""header_sets last_used
+
+header_sets 增加 last_used：写入事件时刷新，清理任务只删除 last_used 早于保留期且已无事件引用的集合。
+已有行以 created_at 初始化。
+
+Revision ID: 3d6e1f8a2b95
+Revises: 9f3b6a2d1c47
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d6e1f8a2b95'
+down_revision = '9f3b6a2d1c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('header_sets', sa.Column('last_used', sa.DateTime(), nullable=True))
+    op.execute('UPDATE header_sets SET last_used = created_at')
+    op.alter_column('header_sets', 'last_used', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_header_sets_last_used', 'header_sets', ['last_used'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_header_sets_last_used', table_name='header_sets')
+    op.drop_column('header_sets', 'last_used')
@@ -0,0 +1,32 @@
+"""attacker profile list indexes
+
+攻击者列表的键集分页与国家/ASN 筛选所需索引。
+
+Revision ID: 4e806902a9fe
+Revises: 842ef7c8b9c8
+Create Date: 2026-10-18 12:05:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e806902a9fe'
+down_revision = '842ef7c8b9c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_attacker_profiles_last_seen_id', 'attacker_profiles', ['last_seen', 'id'], unique=False)
+    op.create_index('ix_attacker_profiles_first_seen_id', 'attacker_profiles', ['first_seen', 'id'], unique=False)
+    op.create_index('ix_attacker_profiles_country', 'attacker_profiles', ['country'], unique=False)
+    op.create_index('ix_attacker_profiles_asn', 'attacker_profiles', ['asn'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_attacker_profiles_asn', table_name='attacker_profiles')
+    op.drop_index('ix_attacker_profiles_country', table_name='attacker_profiles')
+    op.drop_index('ix_attacker_profiles_first_seen_id', table_name='attacker_profiles')
+    op.drop_index('ix_attacker_profiles_last_seen_id', table_name='attacker_profiles')
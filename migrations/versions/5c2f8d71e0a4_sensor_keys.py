@@ -0,0 +1,36 @@
+"""sensor keys
+
+传感器独立签名密钥表，请求头 X-API-Key-Id 对应 key_id。
+
+Revision ID: 5c2f8d71e0a4
+Revises: e4a1c7f09b36
+Create Date: 2026-10-18 18:40:09.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2f8d71e0a4'
+down_revision = 'e4a1c7f09b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sensor_keys',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key_id', sa.String(length=64), nullable=False),
+        sa.Column('secret', sa.String(length=128), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('enabled', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('sensor_keys')
@@ -0,0 +1,40 @@
+"""attack rollups
+
+分钟/小时/天三级预聚合计数表。建表后执行 python manage.py backfill-rollups 从历史事件回填。
+
+Revision ID: 76988f3e0024
+Revises: d8bf5e5ac752
+Create Date: 2026-10-18 10:02:17.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '76988f3e0024'
+down_revision = 'd8bf5e5ac752'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('attack_rollups_minute', 'attack_rollups_hour', 'attack_rollups_day')
+
+
+def upgrade():
+    for name in TABLES:
+        op.create_table(
+            name,
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('honeypot_service', sa.String(length=64), nullable=False),
+            sa.Column('severity', sa.String(length=16), nullable=False),
+            sa.Column('country', sa.String(length=64), nullable=False),
+            sa.Column('signature', sa.String(length=128), nullable=False),
+            sa.Column('count', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('bucket', 'honeypot_service', 'severity', 'country', 'signature'),
+        )
+
+
+def downgrade():
+    for name in reversed(TABLES):
+        op.drop_table(name)
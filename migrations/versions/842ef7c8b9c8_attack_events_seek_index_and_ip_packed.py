@@ -0,0 +1,47 @@
+"""attack events seek index and ip_packed
+
+为键集分页添加 (timestamp, id) 复合索引；新增 16 字节 ip_packed 列用于 CIDR 区间筛选，
+并按主键区间分批回填历史数据（IPv4 存为 ::ffff:a.b.c.d）。
+
+Revision ID: 842ef7c8b9c8
+Revises: 76988f3e0024
+Create Date: 2026-10-18 11:20:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '842ef7c8b9c8'
+down_revision = '76988f3e0024'
+branch_labels = None
+depends_on = None
+
+
+BATCH = 50000
+
+
+def upgrade():
+    op.add_column('attack_events', sa.Column('ip_packed', sa.VARBINARY(length=16), nullable=True))
+    op.create_index('ix_attack_events_timestamp_id', 'attack_events', ['timestamp', 'id'], unique=False)
+
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text('SELECT MAX(id) FROM attack_events')).scalar() or 0
+    for start in range(0, max_id + 1, BATCH):
+        conn.execute(sa.text("""
+            UPDATE attack_events
+            SET ip_packed = CASE
+                WHEN IS_IPV4(ip_address) THEN CONCAT(UNHEX('00000000000000000000FFFF'), INET6_ATON(ip_address))
+                WHEN IS_IPV6(ip_address) THEN INET6_ATON(ip_address)
+            END
+            WHERE id >= :start AND id < :end
+        """), {'start': start, 'end': start + BATCH})
+
+    op.create_index('ix_attack_events_ip_packed', 'attack_events', ['ip_packed'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_attack_events_ip_packed', table_name='attack_events')
+    op.drop_index('ix_attack_events_timestamp_id', table_name='attack_events')
+    op.drop_column('attack_events', 'ip_packed')
@@ -0,0 +1,46 @@
+"""attack_events attacker_id index name
+
+attack_events 分区后不再有 attacker_id 外键，模型改为普通索引 ix_attack_events_attacker_id。
+由外键自动创建的索引（MySQL 中名为 attacker_id）改名为该名称，使模型与数据库一致。
+
+Revision ID: 9f3b6a2d1c47
+Revises: 5c2f8d71e0a4
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3b6a2d1c47'
+down_revision = '5c2f8d71e0a4'
+branch_labels = None
+depends_on = None
+
+
+INDEX = 'ix_attack_events_attacker_id'
+
+
+def _attacker_id_indexes(conn):
+    return conn.execute(sa.text("""
+        SELECT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attack_events'
+          AND COLUMN_NAME = 'attacker_id' AND SEQ_IN_INDEX = 1
+    """)).scalars().all()
+
+
+def upgrade():
+    conn = op.get_bind()
+    names = _attacker_id_indexes(conn)
+    if INDEX in names:
+        return
+    if names:
+        op.execute(f'ALTER TABLE attack_events RENAME INDEX `{names[0]}` TO {INDEX}')
+    else:
+        op.create_index(INDEX, 'attack_events', ['attacker_id'], unique=False)
+
+
+def downgrade():
+    # 索引名不影响功能，保留
+    pass
@@ -0,0 +1,40 @@
+"""compact event storage
+
+新增按内容去重的请求头集合表 header_sets；attack_events 增加 headers_hash（引用 header_sets.hash）
+与压缩载荷列 payload_blob。历史行保持原有 JSON 列不变，读取时两种形式均可解码。
+
+Revision ID: b7d3e9a41c52
+Revises: 1a58019c9cb1
+Create Date: 2026-10-18 16:05:31.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e9a41c52'
+down_revision = '1a58019c9cb1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'header_sets',
+        sa.Column('hash', sa.BINARY(length=20), nullable=False),
+        sa.Column('headers', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+    op.add_column('attack_events', sa.Column('headers_hash', sa.BINARY(length=20), nullable=True))
+    op.add_column('attack_events', sa.Column('payload_blob', mysql.MEDIUMBLOB(), nullable=True))
+    op.create_index('ix_attack_events_headers_hash', 'attack_events', ['headers_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_attack_events_headers_hash', table_name='attack_events')
+    op.drop_column('attack_events', 'payload_blob')
+    op.drop_column('attack_events', 'headers_hash')
+    op.drop_table('header_sets')
@@ -0,0 +1,51 @@
+"""unique attacker ip
+
+合并重复的攻击者档案后，将 attacker_profiles.ip_address 上的普通索引改为唯一索引，
+使并发首次命中时的档案创建幂等。基线表结构由 manage.py init-db 创建。
+
+Revision ID: d8bf5e5ac752
+Revises: 
+Create Date: 2026-10-18 09:12:41.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8bf5e5ac752'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+DUPLICATES = """
+    SELECT ip_address, MIN(id) AS keep_id, MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen
+    FROM attacker_profiles GROUP BY ip_address HAVING COUNT(*) > 1
+"""
+
+
+def upgrade():
+    op.execute(f"""
+        UPDATE attacker_profiles p JOIN ({DUPLICATES}) k ON k.keep_id = p.id
+        SET p.first_seen = k.first_seen, p.last_seen = k.last_seen
+    """)
+    op.execute(f"""
+        UPDATE attack_events e
+        JOIN attacker_profiles p ON p.id = e.attacker_id
+        JOIN ({DUPLICATES}) k ON k.ip_address = p.ip_address
+        SET e.attacker_id = k.keep_id
+        WHERE p.id <> k.keep_id
+    """)
+    op.execute(f"""
+        DELETE p FROM attacker_profiles p
+        JOIN ({DUPLICATES}) k ON k.ip_address = p.ip_address
+        WHERE p.id <> k.keep_id
+    """)
+    op.drop_index('ix_attacker_profiles_ip_address', table_name='attacker_profiles')
+    op.create_index('ix_attacker_profiles_ip_address', 'attacker_profiles', ['ip_address'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_attacker_profiles_ip_address', table_name='attacker_profiles')
+    op.create_index('ix_attacker_profiles_ip_address', 'attacker_profiles', ['ip_address'], unique=False)
@@ -0,0 +1,28 @@
+"""attack event folding
+
+attack_events 增加 count（折叠的重复次数，历史行为 1）与 last_timestamp（最后一次出现时间）。
+
+Revision ID: e4a1c7f09b36
+Revises: b7d3e9a41c52
+Create Date: 2026-10-18 17:12:48.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1c7f09b36'
+down_revision = 'b7d3e9a41c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('attack_events', sa.Column('count', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('attack_events', sa.Column('last_timestamp', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('attack_events', 'last_timestamp')
+    op.drop_column('attack_events', 'count')
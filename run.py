@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""蜜罐系统启动脚本"""
+"""蜜罐系统启动脚本（开发调试用；生产环境使用 gunicorn -c gunicorn.conf.py wsgi:app）"""
 import os
 from app import create_app
 